@@ -0,0 +1,137 @@
+"""
+LOLCODE Batch Module
+Runs many programs across a pool of reusable worker processes
+"""
+
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from cache import ProgramCache, DEFAULT_CACHE_DIR
+from lolcode import run_source
+
+
+class FileResult:
+    """Outcome of running one file in a batch; plain values only, so it can
+    travel back from a worker process."""
+
+    def __init__(self, path, transcript='', errors=(), elapsed=0.0, timings=None):
+        self.path = path
+        self.transcript = transcript
+        self.errors = list(errors)
+        self.elapsed = elapsed
+        self.timings = timings or {}
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def __repr__(self):
+        return f"FileResult({self.path!r}, ok={self.ok}, elapsed={self.elapsed:.3f})"
+
+
+class BatchTask:
+    """Settings shared by every file in a batch. Calling it runs one file."""
+
+    def __init__(self, engine='tree', use_cache=True, cache_dir=None, inputs='', limits=None, memo_size=None):
+        self.engine = engine
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self.inputs = inputs
+        self.limits = limits
+        self.memo_size = memo_size
+
+    def __call__(self, path):
+        start = time.perf_counter()
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                source_code = file.read()
+        except OSError as e:
+            return FileResult(path, errors=[f"Error: {e}"], elapsed=time.perf_counter() - start)
+
+        cache = None
+        if self.use_cache:
+            cache_dir = self.cache_dir or os.path.join(os.path.dirname(os.path.abspath(path)), DEFAULT_CACHE_DIR)
+            cache = ProgramCache(cache_dir)
+
+        # Every program gets its own copy of the preset answers; nothing is
+        # ever read from the terminal
+        result = run_source(source_code, stdin=self.inputs, engine=self.engine, cache=cache, limits=self.limits,
+                            memo_size=self.memo_size)
+        return FileResult(
+            path,
+            transcript=result.transcript,
+            errors=[str(error) for error in result.errors],
+            elapsed=time.perf_counter() - start,
+            timings=result.timings,
+        )
+
+
+def expand_paths(patterns):
+    """Expand files, directories (every .lol file below them) and glob
+    patterns into a list of files, keeping the order given."""
+    paths = []
+    seen = set()
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            matches = sorted(glob.glob(os.path.join(pattern, '**', '*.lol'), recursive=True))
+        elif glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        for path in matches:
+            if path not in seen:
+                seen.add(path)
+                paths.append(path)
+    return paths
+
+
+def run_files(paths, task, jobs=None):
+    """Yield a FileResult for every path, in the order given.
+
+    With more than one job the files are spread over a process pool whose
+    workers each run many files, so process startup is paid once per worker
+    rather than once per file."""
+    jobs = jobs or os.cpu_count() or 1
+    if jobs == 1 or len(paths) <= 1:
+        for path in paths:
+            yield task(path)
+        return
+
+    # Hand out files in small chunks to cut inter-process traffic while
+    # keeping the workers evenly loaded
+    chunksize = max(1, min(32, len(paths) // (jobs * 4)))
+    with ProcessPoolExecutor(max_workers=min(jobs, len(paths))) as executor:
+        yield from executor.map(task, paths, chunksize=chunksize)
+
+
+def run_batch(patterns, task, jobs=None, stdout=None, stderr=None):
+    """Run every matching file and print each one's output under a header,
+    followed by a per-file status and timing summary on stderr.
+
+    Returns the number of files that failed."""
+    stdout = stdout if stdout is not None else sys.stdout
+    stderr = stderr if stderr is not None else sys.stderr
+    paths = expand_paths(patterns)
+    if not paths:
+        stderr.write("Error: no .lol files matched.\n")
+        return 1
+
+    start = time.perf_counter()
+    results = []
+    for file_result in run_files(paths, task, jobs):
+        stdout.write(f"==> {file_result.path} <==\n")
+        stdout.write(file_result.transcript)
+        results.append(file_result)
+    stdout.flush()
+    elapsed = time.perf_counter() - start
+
+    failed = 0
+    for file_result in results:
+        status = "ok" if file_result.ok else "FAIL"
+        failed += not file_result.ok
+        stderr.write(f"{status:<5} {file_result.elapsed:8.3f}s  {file_result.path}\n")
+    stderr.write(f"{len(results)} files, {failed} failed in {elapsed:.3f}s\n")
+    return failed
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+IT store benchmark
+Counts and times the IT writes the tree-walking interpreter performs on
+deeply nested arithmetic, with and without the Optimizer's IT liveness pass
+
+Usage: python bench/bench_it_stores.py [--depth 30] [--statements 2000] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+from optimizer import Optimizer
+from interpreter import Interpreter
+from bench_lexer import best_time
+
+OPERATORS = ['SUM OF', 'DIFF OF', 'PRODUKT OF', 'BIGGR OF', 'SMALLR OF']
+
+
+def generate_source(depth, statements):
+    expr = "x"
+    for level in range(depth):
+        expr = f"{OPERATORS[level % len(OPERATORS)]} {expr} AN {level % 3 + 1}"
+    lines = ['HAI', 'I HAS A x ITZ 1', 'I HAS A y']
+    for _ in range(statements):
+        lines.append(f"y R {expr}")
+    lines.append('VISIBLE y')
+    lines.append('KTHXBYE')
+    return '\n'.join(lines) + '\n'
+
+
+class CountingSlots(list):
+    """Slot list that counts writes to IT (slot 0)."""
+
+    def __init__(self, values):
+        super().__init__(values)
+        self.it_writes = 0
+
+    def __setitem__(self, index, value):
+        if index == 0:
+            self.it_writes += 1
+        super().__setitem__(index, value)
+
+
+class CountingInterpreter(Interpreter):
+    def initialize_variables(self):
+        super().initialize_variables()
+        self.slots = CountingSlots(self.slots)
+
+
+def build_ast(source, optimize):
+    ast = SemanticAnalyzer(Parser(Lexer(source).tokenize()).parse()).analyze()
+    if optimize:
+        Optimizer(ast).optimize()
+    return ast
+
+
+def run(ast, interpreter_class):
+    interpreter = interpreter_class(ast)
+    with open(os.devnull, 'w') as devnull:
+        stdout = sys.stdout
+        sys.stdout = devnull
+        try:
+            interpreter.interpret()
+        finally:
+            sys.stdout = stdout
+    return interpreter
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark dead IT-store elimination.")
+    arg_parser.add_argument('--depth', type=int, default=30, help="operators per expression")
+    arg_parser.add_argument('--statements', type=int, default=2000, help="assignments in the program")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per variant; the best is reported")
+    args = arg_parser.parse_args()
+
+    source = generate_source(args.depth, args.statements)
+    print(f"{args.statements} assignments of {args.depth}-deep arithmetic")
+
+    baseline = None
+    for name, optimize in [("every IT store", False), ("live IT stores only", True)]:
+        ast = build_ast(source, optimize)
+        writes = run(ast, CountingInterpreter).slots.it_writes
+        elapsed, _ = best_time(lambda: run(ast, Interpreter), args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<20} {writes:9d} IT writes  {elapsed:8.3f}s  {baseline / elapsed:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Lexer benchmark
+Compares the regex scanner with the legacy whitespace-splitting lexer
+on generated multi-megabyte LOLCODE sources
+
+Usage: python bench/bench_lexer.py [--mb 4] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import Lexer
+from legacy_lexer import LegacyLexer
+
+STATEMENTS = [
+    'I HAS A var{n} ITZ SUM OF {n} AN PRODUKT OF 3 AN 4',
+    'var{n} R DIFF OF var{n} AN BIGGR OF 2 AN 7   BTW keep it small',
+    'VISIBLE SMOOSH "value  of " AN var{n} AN "!" MKAY',
+    'BOTH SAEM var{n} AN 10',
+    'O RLY?',
+    '  YA RLY',
+    '    VISIBLE "TEN"',
+    '  NO WAI',
+    '    VISIBLE "NOT TEN"',
+    'OIC',
+]
+
+
+def generate_source(megabytes):
+    target = megabytes * 1024 * 1024
+    lines = ['HAI']
+    size = 0
+    n = 0
+    while size < target:
+        for template in STATEMENTS:
+            line = template.format(n=n)
+            lines.append(line)
+            size += len(line) + 1
+        n += 1
+    lines.append('KTHXBYE')
+    return '\n'.join(lines) + '\n'
+
+
+def best_time(function, repeat):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark the LOLCODE lexer.")
+    arg_parser.add_argument('--mb', type=int, default=4, help="size of the generated source in MB")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per lexer; the best is reported")
+    args = arg_parser.parse_args()
+
+    source = generate_source(args.mb)
+    size_mb = len(source) / (1024 * 1024)
+    print(f"Source: {size_mb:.1f} MB, {source.count(chr(10))} lines")
+
+    runs = [
+        ("legacy tokenize()", lambda: LegacyLexer(source).tokenize()),
+        ("regex tokenize()", lambda: Lexer(source).tokenize()),
+        ("regex iter_tokens()", lambda: sum(1 for _ in Lexer(source).iter_tokens())),
+    ]
+    baseline = None
+    for name, function in runs:
+        elapsed, result = best_time(function, args.repeat)
+        count = result if isinstance(result, int) else len(result)
+        baseline = baseline or elapsed
+        print(f"{name:<22} {elapsed:8.3f}s  {size_mb / elapsed:7.2f} MB/s  "
+              f"{count} tokens  {baseline / elapsed:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
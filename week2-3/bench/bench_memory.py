@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Token and AST memory benchmark
+Measures bytes per token and per AST node for the slotted classes and the
+columnar token store against dict-based objects with per-leaf child lists
+
+Usage: python bench/bench_memory.py [--mb 2]
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import Lexer, Token, TokenColumns
+from parser import Parser, ASTNode, NO_CHILDREN
+from semantic_analyzer import SemanticAnalyzer
+from bench_lexer import generate_source
+
+
+class DictToken:
+    """Token as it was before __slots__"""
+    def __init__(self, token_type, value=None, line=None, position=None):
+        self.type = token_type
+        self.value = value
+        self.line = line
+        self.position = position
+
+
+class DictASTNode:
+    """ASTNode as it was before __slots__, with a list for every node's children"""
+    def __init__(self, node_type, children=None, value=None):
+        self.type = node_type
+        self.children = children if children is not None else []
+        self.value = value
+        self.slot = None
+        self.static_type = None
+        self.operand_type = None
+
+
+def measure(build):
+    """Return (result, bytes still allocated by build())"""
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, after - before
+
+
+def copy_tree(node, node_class, use_tuples):
+    children = [copy_tree(child, node_class, use_tuples) for child in node.children]
+    if use_tuples and isinstance(node.children, tuple):
+        children = tuple(children) if children else NO_CHILDREN
+    copy = node_class(node.type, children, node.value)
+    copy.slot = node.slot
+    copy.static_type = node.static_type
+    copy.operand_type = node.operand_type
+    return copy
+
+
+def count_nodes(node):
+    return 1 + sum(count_nodes(child) for child in node.children)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure token and AST memory use.")
+    arg_parser.add_argument('--mb', type=int, default=2, help="size of the generated source in MB")
+    args = arg_parser.parse_args()
+
+    source = generate_source(args.mb)
+    tokens = Lexer(source).tokenize()
+    count = len(tokens)
+    print(f"Source: {len(source) / (1024 * 1024):.1f} MB, {count} tokens")
+
+    # Values are shared with the already built tokens, so only the cost of
+    # the token containers themselves is measured
+    _, dict_bytes = measure(lambda: [DictToken(t.type, t.value, t.line, t.position) for t in tokens])
+    _, slot_bytes = measure(lambda: [Token(t.type, t.value, t.line, t.position) for t in tokens])
+    _, column_bytes = measure(lambda: TokenColumns(tokens))
+    print(f"{'dict Token':<24} {dict_bytes / count:7.1f} bytes/token")
+    print(f"{'slotted Token':<24} {slot_bytes / count:7.1f} bytes/token")
+    print(f"{'TokenColumns':<24} {column_bytes / count:7.1f} bytes/token")
+
+    ast = SemanticAnalyzer(Parser(tokens).parse()).analyze()
+    nodes = count_nodes(ast)
+    print(f"AST: {nodes} nodes")
+    _, dict_node_bytes = measure(lambda: copy_tree(ast, DictASTNode, False))
+    _, slot_node_bytes = measure(lambda: copy_tree(ast, ASTNode, True))
+    print(f"{'dict ASTNode':<24} {dict_node_bytes / nodes:7.1f} bytes/node")
+    print(f"{'slotted ASTNode':<24} {slot_node_bytes / nodes:7.1f} bytes/node")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Source loading memory benchmark
+Compares peak traced memory of lexing a generated source file read into a
+str with lexing the same file memory-mapped, for both token stores
+
+Usage: python bench/bench_mmap.py [--mb 64]
+
+tracemalloc sees Python allocations only. Mapped pages belong to the page
+cache and are shared with every other reader of the file, so they do not
+show up here.
+"""
+
+import argparse
+import gc
+import mmap
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lexer import Lexer
+from bench_lexer import STATEMENTS
+
+
+def write_source(path, megabytes):
+    """Write a generated program of about megabytes MB to path a line at a
+    time, so that the benchmark itself never holds the whole source."""
+    target = megabytes * 1024 * 1024
+    size = 0
+    n = 0
+    with open(path, 'w', encoding='utf-8') as source_file:
+        source_file.write('HAI\n')
+        while size < target:
+            for template in STATEMENTS:
+                line = template.format(n=n) + '\n'
+                source_file.write(line)
+                size += len(line)
+            n += 1
+        source_file.write('KTHXBYE\n')
+
+
+def read_text(path, tokenize):
+    with open(path, 'r', encoding='utf-8') as source_file:
+        source = source_file.read()
+    return tokenize(Lexer(source))
+
+
+def read_mapped(path, tokenize):
+    with open(path, 'rb') as source_file:
+        with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as source:
+            return tokenize(Lexer(source))
+
+
+def measure(load, path, tokenize):
+    """Peak traced bytes while loading and lexing, bytes still held by the
+    tokens afterwards, seconds and the token count."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    tokens = load(path, tokenize)
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak, current, elapsed, len(tokens)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure peak memory of str and mmap source loading.")
+    arg_parser.add_argument('--mb', type=int, default=64, help="size of the generated source in MB")
+    args = arg_parser.parse_args()
+
+    stores = [
+        ('Token list', Lexer.tokenize),
+        ('TokenColumns', Lexer.tokenize_columnar),
+    ]
+    loads = [('read() str', read_text), ('mmap bytes', read_mapped)]
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, 'source.lol')
+        write_source(path, args.mb)
+        file_size = os.path.getsize(path)
+        print(f"Source: {file_size / (1024 * 1024):.1f} MB")
+        print(f"{'Tokens':<14} {'Source':<12} {'peak MB':>9} {'x file':>7} {'held MB':>9} "
+              f"{'B/token':>8} {'seconds':>8}")
+        for store_name, tokenize in stores:
+            for load_name, load in loads:
+                peak, held, elapsed, count = measure(load, path, tokenize)
+                print(f"{store_name:<14} {load_name:<12} {peak / 1e6:9.1f} {peak / file_size:7.2f} "
+                      f"{held / 1e6:9.1f} {peak / count:8.1f} {elapsed:8.2f}")
+
+
+if __name__ == '__main__':
+    main()
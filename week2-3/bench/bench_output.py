@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Output benchmark
+Times a program of many VISIBLE statements written through the old
+print()-per-line path and through the buffered output sink, into a pipe
+
+Usage: python bench/bench_output.py [--lines 1000000] [--repeat 3]
+"""
+
+import argparse
+import io
+import os
+import subprocess
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lolcode import build_ast
+from interpreter import Interpreter
+from output import BufferedSink
+from bench_lexer import best_time
+
+
+class PrintInterpreter(Interpreter):
+    """The tree-walking interpreter as it wrote output before output sinks."""
+
+    def execute_output(self, node):
+        value = self.evaluate_expression(node.children[0])
+        print(self.to_string(value))
+
+
+def generate_source(lines):
+    statements = ['HAI', 'I HAS A n ITZ 7']
+    templates = ['VISIBLE "HAI WORLD!"', 'VISIBLE n', 'VISIBLE SMOOSH "n IZ " AN n MKAY']
+    for i in range(lines):
+        statements.append(templates[i % len(templates)])
+    statements.append('KTHXBYE')
+    return '\n'.join(statements) + '\n'
+
+
+def run_into_pipe(run):
+    """Run with sys.stdout replaced by a pipe drained by another process,
+    like `python main.py program.lol | cat`."""
+    reader = subprocess.Popen(['cat'], stdin=subprocess.PIPE, stdout=subprocess.DEVNULL)
+    stdout = sys.stdout
+    sys.stdout = io.TextIOWrapper(reader.stdin, encoding='utf-8')
+    try:
+        run()
+        sys.stdout.flush()
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+        reader.wait()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark VISIBLE output paths.")
+    arg_parser.add_argument('--lines', type=int, default=1000000, help="VISIBLE statements in the program")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per output path; the best is reported")
+    args = arg_parser.parse_args()
+
+    ast = build_ast(generate_source(args.lines))
+    print(f"{args.lines} VISIBLE lines into a pipe")
+
+    runs = [
+        ("print() per line", lambda: PrintInterpreter(ast).interpret()),
+        ("BufferedSink", lambda: Interpreter(ast, stdout=BufferedSink()).interpret()),
+    ]
+    baseline = None
+    for name, run in runs:
+        elapsed, _ = best_time(lambda: run_into_pipe(run), args.repeat)
+        baseline = baseline or elapsed
+        print(f"{name:<18} {elapsed:8.3f}s  {args.lines / elapsed / 1e6:6.2f} M lines/s  {baseline / elapsed:5.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Benchmark suite
+Times every phase of the generated workloads on each engine, saves the
+results as JSON and compares them with a saved baseline
+
+Usage: python bench/bench_suite.py [--scale 1.0] [--repeat 3] [--engines tree,vm,python]
+                                   [--workloads NAME,...] [--output results.json]
+                                   [--baseline baseline.json] [--threshold 0.10]
+
+Exits with status 1 when any phase is slower than the baseline by more than
+the threshold, or when a workload fails.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lolcode import ENGINES, RunResult, build_program, run_program
+from output import BufferedSink
+from generators import WORKLOADS, generate
+
+# Phases faster than this in the baseline are too noisy to compare
+NOISE_FLOOR = 0.001
+
+
+def time_workload(source, engine, repeat):
+    """Best time of each phase over repeat runs, plus the best total."""
+    best = {}
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        for _ in range(repeat):
+            result = RunResult()
+            program = build_program(source, engine, result)
+            if program is not None:
+                run_program(engine, program, BufferedSink(devnull), io.StringIO(), result)
+            if result.errors:
+                raise RuntimeError(f"{engine}: {result.errors[0]}")
+            timings = dict(result.timings, total=sum(result.timings.values()))
+            for phase, elapsed in timings.items():
+                best[phase] = min(elapsed, best.get(phase, elapsed))
+    return best
+
+
+def run_suite(workloads, engines, scale, repeat):
+    results = {}
+    for name in workloads:
+        source = generate(name, scale)
+        print(f"{name}: {len(source) / 1024:.0f} KB, {source.count(chr(10))} lines")
+        results[name] = {}
+        for engine in engines:
+            timings = time_workload(source, engine, repeat)
+            results[name][engine] = timings
+            phases = '  '.join(f"{phase} {elapsed * 1000:.1f}" for phase, elapsed in timings.items())
+            print(f"  {engine:<7} {phases} ms")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Print the change of every phase found in both runs and return the
+    regressions as (workload, engine, phase, ratio) tuples."""
+    regressions = []
+    print(f"\nAgainst baseline (threshold {threshold:.0%}):")
+    for name, engines in results.items():
+        for engine, timings in engines.items():
+            old_timings = baseline.get(name, {}).get(engine)
+            if not old_timings:
+                continue
+            for phase, elapsed in timings.items():
+                old = old_timings.get(phase)
+                if old is None or old < NOISE_FLOOR:
+                    continue
+                ratio = elapsed / old
+                marker = ""
+                if ratio > 1 + threshold:
+                    marker = "  REGRESSION"
+                    regressions.append((name, engine, phase, ratio))
+                print(f"  {name:<20} {engine:<7} {phase:<9} {old * 1000:9.1f} -> {elapsed * 1000:9.1f} ms"
+                      f"  {ratio:5.2f}x{marker}")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark LOLCODE phases across engines.")
+    arg_parser.add_argument('--scale', type=float, default=1.0, help="workload size multiplier")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per workload; the best is reported")
+    arg_parser.add_argument('--engines', default=','.join(ENGINES), help="comma-separated engines to time")
+    arg_parser.add_argument('--workloads', default=','.join(WORKLOADS),
+                            help=f"comma-separated workloads (default: all of {', '.join(WORKLOADS)})")
+    arg_parser.add_argument('--output', help="write the results to this JSON file")
+    arg_parser.add_argument('--baseline', help="compare against results saved by an earlier --output")
+    arg_parser.add_argument('--threshold', type=float, default=0.10,
+                            help="slowdown that counts as a regression (default: 0.10 = 10%%)")
+    args = arg_parser.parse_args()
+
+    engines = args.engines.split(',')
+    workloads = args.workloads.split(',')
+    for engine in engines:
+        if engine not in ENGINES:
+            arg_parser.error(f"unknown engine '{engine}'")
+    for name in workloads:
+        if name not in WORKLOADS:
+            arg_parser.error(f"unknown workload '{name}'")
+
+    try:
+        results = run_suite(workloads, engines, args.scale, args.repeat)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'scale': args.scale,
+        'repeat': args.repeat,
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(report, output_file, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+        if baseline.get('scale') != args.scale:
+            print(f"Warning: baseline was recorded at scale {baseline.get('scale')}, not {args.scale}")
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%}")
+            sys.exit(1)
+        print("\nNo regressions")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Switch benchmark
+Times a loop dispatching on IT through a WTF? of many OMG cases against the
+same dispatch written as a chain of O RLY? blocks, on every engine
+
+Usage: python bench/bench_switch.py [--cases 500] [--passes 5000] [--repeat 3]
+"""
+
+import argparse
+import io
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lolcode import ENGINES, build_program, run_program
+from bench_lexer import best_time
+
+
+def switch_source(cases, passes):
+    lines = [
+        'HAI',
+        'I HAS A total ITZ 0',
+        f'IM IN YR dispatching UPPIN YR i TIL BOTH SAEM i AN {passes}',
+        f'  MOD OF PRODUKT OF i AN 7 AN {cases}',
+        '  WTF?',
+    ]
+    for case in range(cases):
+        lines.extend([
+            f'    OMG {case}',
+            f'      total R SUM OF total AN {case}',
+            '      GTFO',
+        ])
+    lines.extend(['  OIC', 'IM OUTTA YR dispatching', 'VISIBLE total', 'KTHXBYE'])
+    return '\n'.join(lines) + '\n'
+
+
+def chain_source(cases, passes):
+    lines = [
+        'HAI',
+        'I HAS A total ITZ 0',
+        f'IM IN YR dispatching UPPIN YR i TIL BOTH SAEM i AN {passes}',
+        f'  I HAS A x ITZ MOD OF PRODUKT OF i AN 7 AN {cases}',
+    ]
+    for case in range(cases):
+        lines.extend([
+            f'  BOTH SAEM x AN {case}',
+            '  O RLY?',
+            '    YA RLY',
+            f'      total R SUM OF total AN {case}',
+            '  OIC',
+        ])
+    lines.extend(['IM OUTTA YR dispatching', 'VISIBLE total', 'KTHXBYE'])
+    return '\n'.join(lines) + '\n'
+
+
+def run(engine, program):
+    stdout = io.StringIO()
+    result = run_program(engine, program, stdout=stdout)
+    if not result.ok:
+        raise SystemExit(result.transcript)
+    return stdout.getvalue()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark WTF? dispatch against an O RLY? chain.")
+    arg_parser.add_argument('--cases', type=int, default=500, help="OMG cases, and O RLY? blocks in the chain")
+    arg_parser.add_argument('--passes', type=int, default=5000, help="dispatches per run")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per variant; the best is reported")
+    args = arg_parser.parse_args()
+
+    print(f"{args.passes} dispatches over {args.cases} cases")
+    for engine in ENGINES:
+        baseline = None
+        outputs = set()
+        for name, generate in [("O RLY? chain", chain_source), ("WTF? switch", switch_source)]:
+            program = build_program(generate(args.cases, args.passes), engine)
+            elapsed, output = best_time(lambda: run(engine, program), args.repeat)
+            outputs.add(output)
+            baseline = baseline or elapsed
+            print(f"{engine:<7} {name:<13} {elapsed:8.3f}s  {baseline / elapsed:6.2f}x")
+        if len(outputs) != 1:
+            raise SystemExit(f"{engine}: the switch and the chain printed different totals")
+
+
+if __name__ == '__main__':
+    main()
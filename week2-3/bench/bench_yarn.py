@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+YARN building benchmark
+Times a loop that builds a report with out R SMOOSH out AN ... and prints
+it once, with SMOOSH copying the whole YARN every pass and with the rope
+that extends it in place, and reports the peak memory of each
+
+Usage: python bench/bench_yarn.py [--lines 10000,20000,40000] [--repeat 3]
+"""
+
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import runtime
+from lolcode import build_ast
+from interpreter import Interpreter
+from bench_lexer import best_time
+
+
+def flat_smoosh(parts):
+    """SMOOSH as it was before ropes."""
+    return ''.join(map(runtime.to_string, parts))
+
+
+class FlatInterpreter(Interpreter):
+    """The tree-walking interpreter copying the YARN on every SMOOSH."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.smoosh = flat_smoosh
+
+
+def generate_source(lines):
+    return (
+        'HAI\nI HAS A out ITZ ""\n'
+        f'IM IN YR building UPPIN YR i TIL BOTH SAEM i AN {lines}\n'
+        '  out R SMOOSH out AN "line " AN i AN " of the report:)" MKAY\n'
+        'IM OUTTA YR building\nVISIBLE out\nKTHXBYE\n'
+    )
+
+
+def run(ast, interpreter_class):
+    with open(os.devnull, 'w') as devnull:
+        interpreter_class(ast, stdout=devnull).interpret()
+
+
+def peak_memory(ast, interpreter_class):
+    tracemalloc.start()
+    run(ast, interpreter_class)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark building a YARN by repeated SMOOSH.")
+    arg_parser.add_argument('--lines', default='10000,20000,40000', help="comma-separated lines per report")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per variant; the best is reported")
+    args = arg_parser.parse_args()
+
+    for lines in map(int, args.lines.split(',')):
+        ast = build_ast(generate_source(lines))
+        final_size = sum(len(f"line {i} of the report\n") for i in range(lines))
+        print(f"{lines} lines, {final_size / 1e6:.1f} MB of text")
+        baseline = None
+        for name, interpreter_class in [("copying SMOOSH", FlatInterpreter), ("rope", Interpreter)]:
+            elapsed, _ = best_time(lambda: run(ast, interpreter_class), args.repeat)
+            peak = peak_memory(ast, interpreter_class)
+            baseline = baseline or elapsed
+            print(f"  {name:<15} {elapsed:8.3f}s  {baseline / elapsed:6.2f}x  peak {peak / final_size:5.2f}x the text")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+Synthetic program generators
+Build large LOLCODE programs that stress one part of the interpreter each.
+Every generator is deterministic, so the same size always gives the same
+source and timings stay comparable between runs.
+"""
+
+
+def program(statements):
+    return 'HAI\n' + '\n'.join(statements) + '\nKTHXBYE\n'
+
+
+def declarations(count=100000):
+    """Many declarations with small arithmetic initializers: lexer, parser
+    and analyzer throughput, and slot allocation."""
+    statements = ['I HAS A seed ITZ 3']
+    for n in range(count):
+        statements.append(f'I HAS A var{n} ITZ SUM OF seed AN {n}')
+    return program(statements)
+
+
+def nested_expressions(depth=200, count=200):
+    """Statements made of one deeply nested arithmetic expression each. The
+    operands are variables, so the optimizer cannot fold them away."""
+    statements = ['I HAS A x ITZ 1', 'I HAS A total ITZ 0']
+    operators = ['SUM', 'DIFF', 'BIGGR', 'SMALLR']
+    for n in range(count):
+        expression = 'x'
+        for level in range(depth):
+            expression = f'{operators[(n + level) % len(operators)]} OF x AN {expression}'
+        statements.append(f'total R SUM OF total AN {expression}')
+    statements.append('VISIBLE total')
+    return program(statements)
+
+
+def smoosh_chains(length=1000, count=100):
+    """Long SMOOSH concatenations of strings and numbers."""
+    statements = ['I HAS A n ITZ 7', 'I HAS A text ITZ ""']
+    parts = ' AN '.join('n' if i % 2 else f'"part{i}"' for i in range(length))
+    for _ in range(count):
+        statements.append(f'text R SMOOSH {parts} MKAY')
+    statements.append('VISIBLE text')
+    return program(statements)
+
+
+def conditionals(count=20000):
+    """Chains of comparisons feeding O RLY? blocks with both branches live."""
+    statements = ['I HAS A x ITZ 0', 'I HAS A hits ITZ 0', 'I HAS A misses ITZ 0']
+    for n in range(count):
+        statements.extend([
+            f'x R MOD OF SUM OF x AN {n} AN 10',
+            f'BOTH SAEM x AN {n % 10}',
+            'O RLY?',
+            '  YA RLY',
+            '    hits R SUM OF hits AN 1',
+            '  NO WAI',
+            '    misses R SUM OF misses AN 1',
+            'OIC',
+        ])
+    statements.extend(['VISIBLE hits', 'VISIBLE misses'])
+    return program(statements)
+
+
+def output_bound(lines=200000):
+    """Mostly VISIBLE statements, so the run is dominated by output."""
+    statements = ['I HAS A n ITZ 7']
+    templates = ['VISIBLE "HAI WORLD!"', 'VISIBLE n', 'VISIBLE SMOOSH "n IZ " AN n MKAY']
+    for i in range(lines):
+        statements.append(templates[i % len(templates)])
+    return program(statements)
+
+
+def loops(iterations=200000):
+    """A counting loop with arithmetic in its body, which engines run with
+    the count kept in a local, and a WILE loop whose body changes its own
+    variable, which takes the general path."""
+    statements = [
+        'I HAS A total ITZ 0',
+        f'IM IN YR counting UPPIN YR i TIL BOTH SAEM i AN {iterations}',
+        '  total R SUM OF total AN MOD OF i AN 7',
+        'IM OUTTA YR counting',
+        'I HAS A n ITZ 0',
+        f'IM IN YR general WILE DIFFRINT BIGGR OF n AN {iterations} AN n',
+        '  n R SUM OF n AN 2',
+        'IM OUTTA YR general',
+        'VISIBLE total',
+        'VISIBLE n',
+    ]
+    return program(statements)
+
+
+def functions(calls=50000):
+    """A counting loop that calls a small two-argument function on every
+    pass, measuring what a call costs: a new frame, the arguments and the
+    return."""
+    statements = [
+        'HOW IZ I mix YR x AN YR y',
+        '  FOUND YR MOD OF SUM OF PRODUKT OF x AN 31 AN y AN 1000003',
+        'IF U SAY SO',
+        'I HAS A total ITZ 0',
+        f'IM IN YR calling UPPIN YR i TIL BOTH SAEM i AN {calls}',
+        '  total R I IZ mix YR total AN YR i MKAY',
+        'IM OUTTA YR calling',
+        'VISIBLE total',
+    ]
+    return program(statements)
+
+
+def bukkits(length=100000, passes=20):
+    """A BUKKIT filled one element per pass of a loop, then reduced and
+    mapped over many times with bulk operations that each run as one call
+    over its compact storage."""
+    statements = [
+        'I HAS A nums ITZ A BUKKIT',
+        f'IM IN YR filling UPPIN YR i TIL BOTH SAEM i AN {length}',
+        '  nums HAS A MOD OF PRODUKT OF i AN 7919 AN 1000',
+        'IM OUTTA YR filling',
+        'I HAS A total ITZ 0',
+        f'IM IN YR reducing UPPIN YR pass TIL BOTH SAEM pass AN {passes}',
+        '  I HAS A shifted ITZ SUM OF EACH nums AN pass',
+        '  total R SUM OF total AN TOTAL OF shifted',
+        '  total R SUM OF total AN BIGGEST OF PRODUKT OF EACH shifted AN 2',
+        'IM OUTTA YR reducing',
+        'VISIBLE total',
+        'VISIBLE LENGZ OF nums',
+    ]
+    return program(statements)
+
+
+def report_building(lines=200000):
+    """A YARN built up one line per pass of a loop with SMOOSH and printed
+    once, which stays linear in its length because SMOOSH extends the YARN
+    instead of copying it."""
+    statements = [
+        'I HAS A report ITZ ""',
+        f'IM IN YR building UPPIN YR i TIL BOTH SAEM i AN {lines}',
+        '  report R SMOOSH report AN "line " AN i AN ":)" MKAY',
+        'IM OUTTA YR building',
+        'VISIBLE report',
+    ]
+    return program(statements)
+
+
+# Workload name -> (generator, keyword arguments at scale 1.0)
+WORKLOADS = {
+    'declarations': (declarations, {'count': 100000}),
+    'nested_expressions': (nested_expressions, {'count': 200}),
+    'smoosh_chains': (smoosh_chains, {'count': 100}),
+    'conditionals': (conditionals, {'count': 20000}),
+    'output_bound': (output_bound, {'lines': 200000}),
+    'loops': (loops, {'iterations': 200000}),
+    'functions': (functions, {'calls': 50000}),
+    'bukkits': (bukkits, {'length': 100000, 'passes': 20}),
+    'report_building': (report_building, {'lines': 200000}),
+}
+
+
+def generate(name, scale=1.0):
+    """Source of the named workload with its size arguments scaled."""
+    generator, arguments = WORKLOADS[name]
+    return generator(**{key: max(1, int(value * scale)) for key, value in arguments.items()})
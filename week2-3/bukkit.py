@@ -0,0 +1,349 @@
+"""
+LOLCODE Bukkit Module
+BUKKIT arrays, stored compactly while their elements share a numeric type
+"""
+
+import functools
+import math
+import operator
+from array import array
+from itertools import repeat
+
+import runtime
+
+try:
+    import numpy
+except ImportError:
+    # NumPy only speeds up bulk operations on large BUKKITs
+    numpy = None
+
+# array typecodes of BUKKITs holding only NUMBRs or only NUMBARs
+TYPECODES = {int: 'q', float: 'd'}
+INT64_MIN = -2 ** 63
+INT64_MAX = 2 ** 63 - 1
+
+# Below this many elements NumPy's per-call overhead outweighs its speed
+NUMPY_THRESHOLD = 4096
+
+# Operators whose result on two NUMBRs is the native Python one, so EACH can
+# run them over 64-bit storage without calling the runtime per element
+INT_EACH_OPERATORS = {
+    'OP_ADD': operator.add,
+    'OP_SUB': operator.sub,
+    'OP_MUL': operator.mul,
+    'OP_MAX': max,
+    'OP_MIN': min,
+}
+
+# Operators whose result on a NUMBAR and a number is the native float one
+# before normalize
+FLOAT_EACH_OPERATORS = {
+    'OP_ADD': operator.add,
+    'OP_SUB': operator.sub,
+    'OP_MUL': operator.mul,
+    'OP_DIV': operator.truediv,
+    'OP_MAX': max,
+    'OP_MIN': min,
+}
+
+
+class Bukkit:
+    """A LOLCODE array, indexed from 0.
+
+    Elements live in an array.array of 64-bit ints while every one is a
+    NUMBR that fits, in an array.array of doubles while every one is a
+    NUMBAR, and in a list otherwise. Storage only widens: once a BUKKIT
+    holds a mix of types it stays a list. Two BUKKITs are BOTH SAEM when
+    they hold equal elements, and assigning one to another variable shares
+    it rather than copying it."""
+
+    __slots__ = ('items',)
+
+    def __init__(self, items=None):
+        self.items = items if items is not None else array('q')
+
+    @classmethod
+    def of(cls, values):
+        """A BUKKIT of values in the most compact storage that holds them."""
+        values = list(values)
+        types = set(map(type, values))
+        if len(types) == 1:
+            typecode = TYPECODES.get(types.pop())
+            if typecode is not None:
+                try:
+                    return cls(array(typecode, values))
+                except OverflowError:
+                    pass
+        return cls(values)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __eq__(self, other):
+        if not isinstance(other, Bukkit):
+            return NotImplemented
+        return len(self.items) == len(other.items) and all(map(operator.eq, self.items, other.items))
+
+    __hash__ = None
+
+    def __str__(self):
+        return ' '.join(map(runtime.to_string, self.items))
+
+    def __repr__(self):
+        return f"Bukkit({list(self.items)!r})"
+
+    @property
+    def typecode(self):
+        """The array typecode of the storage, or None for a list."""
+        return getattr(self.items, 'typecode', None)
+
+    def make_room(self, value):
+        """Widen the storage, if needed, so that it can hold value."""
+        items = self.items
+        typecode = getattr(items, 'typecode', None)
+        if typecode is None:
+            return
+        value_type = type(value)
+        fits_int = value_type is int and INT64_MIN <= value <= INT64_MAX
+        if (typecode == 'q' and fits_int) or (typecode == 'd' and value_type is float):
+            return
+        if not items and (fits_int or value_type is float):
+            self.items = array(TYPECODES[value_type])
+            return
+        self.items = list(items)
+
+    def position(self, index):
+        try:
+            number = runtime.to_number(index)
+        except (ValueError, TypeError):
+            raise TypeError(f"BUKKIT index must be a NUMBR, not {runtime.to_string(index)!r}")
+        if type(number) is float:
+            if not number.is_integer():
+                raise TypeError(f"BUKKIT index must be a NUMBR, not {number!r}")
+            number = int(number)
+        if not 0 <= number < len(self.items):
+            raise IndexError(f"Index {number} out of range for a BUKKIT of {len(self.items)} items")
+        return number
+
+    def get(self, index):
+        return self.items[self.position(index)]
+
+    def put(self, index, value):
+        position = self.position(index)
+        self.make_room(value)
+        self.items[position] = value
+
+    def append(self, value):
+        self.make_room(value)
+        self.items.append(value)
+
+
+def as_bukkit(value, keyword):
+    if type(value) is not Bukkit:
+        raise TypeError(f"{keyword} needs a BUKKIT, not {runtime.to_string(value)!r}")
+    return value
+
+
+def numpy_view(bukkit):
+    """The storage of a large typed BUKKIT as a NumPy array sharing its
+    memory, or None when NumPy is missing or would not pay off."""
+    items = bukkit.items
+    typecode = getattr(items, 'typecode', None)
+    if numpy is None or typecode is None or len(items) < NUMPY_THRESHOLD:
+        return None
+    return numpy.frombuffer(items, dtype=numpy.int64 if typecode == 'q' else numpy.float64)
+
+
+# Operations on BUKKITs, each taking its operands' values
+
+def new_bukkit():
+    return Bukkit()
+
+
+def item(bukkit, index):
+    return as_bukkit(bukkit, "ITEM OF").get(index)
+
+
+def put(bukkit, index, value):
+    as_bukkit(bukkit, "ITEM OF").put(index, value)
+
+
+def append(bukkit, value):
+    as_bukkit(bukkit, "HAS A").append(value)
+
+
+def length(bukkit):
+    return len(as_bukkit(bukkit, "LENGZ OF"))
+
+
+def total(bukkit):
+    """The SUM OF every element, left to right; 0 for an empty BUKKIT."""
+    items = as_bukkit(bukkit, "TOTAL OF").items
+    typecode = getattr(items, 'typecode', None)
+    if typecode == 'q':
+        view = numpy_view(bukkit)
+        # NumPy sums in 64 bits, so only when no partial sum can overflow
+        if view is not None and len(view) * max(-int(view.min()), int(view.max())) <= INT64_MAX:
+            return int(view.sum())
+        return sum(items)
+    if typecode == 'd':
+        # Added left to right like a loop of SUM OF; NumPy's pairwise sum
+        # and the compensated sum() of Python 3.12 round differently
+        return runtime.normalize(functools.reduce(operator.add, items, 0.0))
+    if not items:
+        return 0
+    return functools.reduce(runtime.add, items)
+
+
+def extreme(bukkit, keyword, pick, numpy_pick, runtime_pick):
+    items = as_bukkit(bukkit, keyword).items
+    if not items:
+        return None
+    typecode = getattr(items, 'typecode', None)
+    if typecode is None:
+        return functools.reduce(runtime_pick, items)
+    view = numpy_view(bukkit)
+    if view is not None and (typecode == 'q' or not numpy.isnan(view).any()):
+        result = numpy_pick(view).item()
+    else:
+        result = pick(items)
+    return runtime.normalize(result)
+
+
+def biggest(bukkit):
+    return extreme(bukkit, "BIGGEST OF", max, numpy.max if numpy else None, runtime.biggr)
+
+
+def smallest(bukkit):
+    return extreme(bukkit, "SMALLEST OF", min, numpy.min if numpy else None, runtime.smallr)
+
+
+def each(op_type, bukkit, scalar):
+    """A new BUKKIT of op_type applied to every element and scalar, each
+    result exactly what the operator gives on that element alone.
+
+    Typed storage with a matching scalar runs as one native map over the
+    array, or one NumPy call on large BUKKITs; anything else calls the
+    runtime's operator per element."""
+    items = as_bukkit(bukkit, "EACH").items
+    typecode = getattr(items, 'typecode', None)
+    scalar_type = type(scalar)
+
+    if typecode == 'q' and scalar_type is int:
+        result = each_int(op_type, bukkit, scalar)
+        if result is not None:
+            return result
+    elif typecode == 'd' and scalar_type in TYPECODES:
+        result = each_float(op_type, bukkit, scalar)
+        if result is not None:
+            return result
+
+    return Bukkit.of(map(runtime.BINARY_OPERATORS[op_type], items, repeat(scalar)))
+
+
+def each_int(op_type, bukkit, scalar):
+    if op_type == 'OP_MOD' and scalar != 0:
+        # Python's and NumPy's integer modulo both take the divisor's sign
+        function = operator.mod
+    else:
+        function = INT_EACH_OPERATORS.get(op_type)
+    if function is None:
+        return None
+
+    view = numpy_view(bukkit)
+    if view is not None and INT64_MIN <= scalar <= INT64_MAX:
+        low, high = int(view.min()), int(view.max())
+        # The results are extremes of the operator on the extreme elements
+        # (modulo is bounded by the scalar), so this checks for overflow
+        bounds = [function(low, scalar), function(high, scalar)]
+        if all(INT64_MIN <= bound <= INT64_MAX for bound in bounds) or op_type == 'OP_MOD':
+            result = numpy_int_each(op_type, view, scalar)
+            items = array('q')
+            items.frombytes(result.tobytes())
+            return Bukkit(items)
+
+    results = map(function, bukkit.items, repeat(scalar))
+    try:
+        return Bukkit(array('q', results))
+    except OverflowError:
+        # NUMBRs are unbounded; results past 64 bits go to a list
+        return Bukkit(list(map(function, bukkit.items, repeat(scalar))))
+
+
+def numpy_int_each(op_type, view, scalar):
+    if op_type == 'OP_ADD':
+        return view + scalar
+    if op_type == 'OP_SUB':
+        return view - scalar
+    if op_type == 'OP_MUL':
+        return view * scalar
+    if op_type == 'OP_MOD':
+        return numpy.mod(view, scalar)
+    if op_type == 'OP_MAX':
+        return numpy.maximum(view, scalar)
+    return numpy.minimum(view, scalar)
+
+
+def each_float(op_type, bukkit, scalar):
+    function = FLOAT_EACH_OPERATORS.get(op_type)
+    if function is None or (op_type == 'OP_DIV' and scalar == 0):
+        return None
+    if op_type in ('OP_MAX', 'OP_MIN') and math.isnan(scalar):
+        # max and min treat NaN by argument order, NumPy propagates it
+        return None
+
+    view = numpy_view(bukkit)
+    if view is not None:
+        result = numpy_float_each(op_type, view, float(scalar))
+        if not (numpy.isfinite(result) & (numpy.floor(result) == result)).any():
+            items = array('d')
+            items.frombytes(result.tobytes())
+            return Bukkit(items)
+        return Bukkit.of(map(runtime.normalize, result.tolist()))
+
+    results = array('d', map(function, bukkit.items, repeat(scalar)))
+    if not any(map(float.is_integer, results)):
+        return Bukkit(results)
+    # The runtime turns whole-number NUMBAR results into NUMBRs
+    return Bukkit.of(map(runtime.normalize, results))
+
+
+def numpy_float_each(op_type, view, scalar):
+    if op_type == 'OP_ADD':
+        return view + scalar
+    if op_type == 'OP_SUB':
+        return view - scalar
+    if op_type == 'OP_MUL':
+        return view * scalar
+    if op_type == 'OP_DIV':
+        return view / scalar
+    if op_type == 'OP_MAX':
+        return numpy.maximum(view, scalar)
+    return numpy.minimum(view, scalar)
+
+
+# Arithmetic operators that EACH maps over a BUKKIT, by the node type of
+# the mapped operation
+EACH_OPERATORS = {
+    'EACH_ADD': 'OP_ADD',
+    'EACH_SUB': 'OP_SUB',
+    'EACH_MUL': 'OP_MUL',
+    'EACH_DIV': 'OP_DIV',
+    'EACH_MOD': 'OP_MOD',
+    'EACH_MAX': 'OP_MAX',
+    'EACH_MIN': 'OP_MIN',
+}
+
+# Expression node types of BUKKIT operations mapped to their implementation
+# and operand count. Like other operators, each one stores its result in IT.
+BUKKIT_OPERATIONS = {
+    'NEW_BUKKIT': (new_bukkit, 0),
+    'OP_ITEM': (item, 2),
+    'OP_LENGTH': (length, 1),
+    'OP_TOTAL': (total, 1),
+    'OP_BIGGEST': (biggest, 1),
+    'OP_SMALLEST': (smallest, 1),
+}
+BUKKIT_OPERATIONS.update(
+    (each_type, (functools.partial(each, op_type), 2)) for each_type, op_type in EACH_OPERATORS.items()
+)
@@ -0,0 +1,202 @@
+"""
+LOLCODE Program Cache Module
+Stores analyzed and compiled programs on disk, keyed by source hash
+"""
+
+import gc
+import hashlib
+import marshal
+import os
+import sys
+import tempfile
+
+from compiler import CodeObject
+from parser import ASTNode, NO_CHILDREN
+
+DEFAULT_CACHE_DIR = '__lolcache__'
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+CACHE_SUFFIX = '.lolc'
+
+# Any change to these modules can change what gets cached, so their source
+# is part of the interpreter version that every cache key includes
+VERSIONED_MODULES = [
+    'lexer.py', 'parser.py', 'semantic_analyzer.py', 'runtime.py',
+    'optimizer.py', 'compiler.py', 'transpiler.py', 'cache.py', 'bukkit.py', 'yarn.py',
+]
+
+
+def interpreter_version():
+    digest = hashlib.sha256(sys.version.encode('utf-8'))
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for name in VERSIONED_MODULES:
+        with open(os.path.join(base_dir, name), 'rb') as module_file:
+            digest.update(module_file.read())
+    return digest.hexdigest()
+
+
+INTERPRETER_VERSION = interpreter_version()
+
+
+def dump_ast(ast):
+    """Flatten an AST into post-order columns of plain values for marshal.
+
+    A flat layout keeps arbitrarily deep expressions within marshal's
+    nesting limit and is faster to load than nested tuples."""
+    types, values, lines, deep, slots, static_types, operand_types, stores_it, child_counts = [], [], [], [], [], [], [], [], []
+    stack = [(ast, False)]
+    while stack:
+        node, children_done = stack.pop()
+        if not children_done:
+            stack.append((node, True))
+            for child in reversed(node.children):
+                stack.append((child, False))
+            continue
+        types.append(node.type)
+        values.append(node.value)
+        lines.append(node.line)
+        deep.append(node.deep)
+        slots.append(node.slot)
+        static_types.append(node.static_type)
+        operand_types.append(node.operand_type)
+        stores_it.append(node.stores_it)
+        # Negative counts mark block nodes whose children are a list
+        count = len(node.children)
+        child_counts.append(-count - 1 if isinstance(node.children, list) else count)
+    return (types, values, lines, deep, slots, static_types, operand_types, stores_it, child_counts)
+
+
+def load_ast(data):
+    # Nodes never form reference cycles, so skip cyclic GC passes while
+    # allocating them
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        return build_ast(*data)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+
+def build_ast(types, values, lines, deep, slots, static_types, operand_types, stores_it, child_counts):
+    stack = []
+    for i, node_type in enumerate(types):
+        count = child_counts[i]
+        if count < 0:
+            count = -count - 1
+            children = stack[len(stack) - count:]
+        else:
+            children = tuple(stack[len(stack) - count:]) if count else NO_CHILDREN
+        if count:
+            del stack[len(stack) - count:]
+        node = ASTNode(node_type, children, values[i], lines[i])
+        node.deep = deep[i]
+        node.slot = slots[i]
+        node.static_type = static_types[i]
+        node.operand_type = operand_types[i]
+        node.stores_it = stores_it[i]
+        stack.append(node)
+    return stack[0]
+
+
+def dump_program(engine, program):
+    if engine == 'vm':
+        return (program.code, program.consts, program.names)
+    if engine == 'python':
+        return marshal.dumps(program)
+    return dump_ast(program)
+
+
+def load_program(engine, data):
+    if engine == 'vm':
+        return CodeObject(*data)
+    if engine == 'python':
+        return marshal.loads(data)
+    return load_ast(data)
+
+
+class ProgramCache:
+    """On-disk cache of analyzed ASTs and compiled programs.
+
+    Entries are keyed by a hash of the source, the engine and the interpreter
+    version. They are written atomically and the least recently used ones
+    are evicted once the directory grows past max_bytes. Cache problems
+    never stop a program from running; they only cost a cache miss."""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def key(self, source_code, engine):
+        digest = hashlib.sha256()
+        digest.update(INTERPRETER_VERSION.encode('ascii'))
+        digest.update(engine.encode('ascii'))
+        digest.update(b'\0')
+        # A source mapped from its file is already UTF-8 bytes, and hashes
+        # the same as the decoded text
+        digest.update(source_code.encode('utf-8') if isinstance(source_code, str) else source_code)
+        return digest.hexdigest()
+
+    def path(self, source_code, engine):
+        return os.path.join(self.cache_dir, self.key(source_code, engine) + CACHE_SUFFIX)
+
+    def load(self, source_code, engine):
+        path = self.path(source_code, engine)
+        try:
+            # marshal.loads on the whole buffer is far faster than
+            # marshal.load, which reads the file in small pieces
+            with open(path, 'rb') as cache_file:
+                data = marshal.loads(cache_file.read())
+            program = load_program(engine, data)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            # Truncated or otherwise unreadable entry: drop it and recompile
+            self.remove(path)
+            return None
+        try:
+            # Refresh the modification time so eviction sees this entry as recently used
+            os.utime(path)
+        except OSError:
+            pass
+        return program
+
+    def store(self, source_code, engine, program):
+        path = self.path(source_code, engine)
+        try:
+            data = marshal.dumps(dump_program(engine, program))
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as temp_file:
+                    temp_file.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                self.remove(temp_path)
+                raise
+            self.evict()
+        except (OSError, ValueError):
+            # An unwritable cache directory or an unmarshallable value only
+            # means this program is not cached
+            pass
+
+    def evict(self):
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as scan:
+            for entry in scan:
+                if entry.name.endswith(CACHE_SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+
+    def remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
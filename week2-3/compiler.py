@@ -0,0 +1,490 @@
+"""
+LOLCODE Bytecode Compiler Module
+Compiles the semantically analyzed AST into bytecode for the VM
+"""
+
+from bukkit import BUKKIT_OPERATIONS
+from parser import counting_bound, function_parts, loop_parts, postorder
+from runtime import BINARY_OPERATORS, OPERATOR_TABLES
+
+# Opcodes. Every instruction is two ints: opcode followed by its argument.
+LOAD_CONST = 0
+LOAD_NAME = 1
+STORE_NAME = 2
+ASSIGN = 3
+DECLARE = 4
+BINARY_OP = 5
+NOT = 6
+SMOOSH = 7
+PRINT = 8
+INPUT = 9
+JUMP = 10
+JUMP_IF_IT_FALSE = 11
+LOAD_FOLDED = 12
+BINARY_OP_NO_IT = 13
+POP_JUMP_IF_TRUE = 14
+POP_JUMP_IF_FALSE = 15
+UPPIN = 16
+NERFIN = 17
+COUNT_START = 18
+COUNT_NEXT = 19
+DEFINE = 20
+CALL = 21
+CALL_NO_IT = 22
+RETURN = 23
+BUKKIT_OP = 24
+BUKKIT_OP_NO_IT = 25
+APPEND = 26
+PUT_ITEM = 27
+SWITCH = 28
+LOAD_BINARY_OP = 29
+STORE_BINARY_OP = 30
+
+OPCODE_NAMES = {
+    LOAD_CONST: 'LOAD_CONST',
+    LOAD_NAME: 'LOAD_NAME',
+    STORE_NAME: 'STORE_NAME',
+    ASSIGN: 'ASSIGN',
+    DECLARE: 'DECLARE',
+    BINARY_OP: 'BINARY_OP',
+    NOT: 'NOT',
+    SMOOSH: 'SMOOSH',
+    PRINT: 'PRINT',
+    INPUT: 'INPUT',
+    JUMP: 'JUMP',
+    JUMP_IF_IT_FALSE: 'JUMP_IF_IT_FALSE',
+    LOAD_FOLDED: 'LOAD_FOLDED',
+    BINARY_OP_NO_IT: 'BINARY_OP_NO_IT',
+    POP_JUMP_IF_TRUE: 'POP_JUMP_IF_TRUE',
+    POP_JUMP_IF_FALSE: 'POP_JUMP_IF_FALSE',
+    UPPIN: 'UPPIN',
+    NERFIN: 'NERFIN',
+    COUNT_START: 'COUNT_START',
+    COUNT_NEXT: 'COUNT_NEXT',
+    DEFINE: 'DEFINE',
+    CALL: 'CALL',
+    CALL_NO_IT: 'CALL_NO_IT',
+    RETURN: 'RETURN',
+    BUKKIT_OP: 'BUKKIT_OP',
+    BUKKIT_OP_NO_IT: 'BUKKIT_OP_NO_IT',
+    APPEND: 'APPEND',
+    PUT_ITEM: 'PUT_ITEM',
+    SWITCH: 'SWITCH',
+    LOAD_BINARY_OP: 'LOAD_BINARY_OP',
+    STORE_BINARY_OP: 'STORE_BINARY_OP',
+}
+
+# Where a LOAD_BINARY_OP takes each operand from: the stack, a slot or its
+# constant. At most one of the two comes from the stack.
+FROM_STACK, FROM_SLOT, FROM_CONST = range(3)
+
+LOOP_STEP_OPCODES = {
+    'LOOP_UPPIN': UPPIN,
+    'LOOP_NERFIN': NERFIN,
+}
+
+# BINARY_OP arguments index into this tuple of (operand type, operator node
+# type) pairs, so type-specialized evaluators cost nothing extra at run time
+BINARY_OP_KEYS = tuple(
+    (operand_type, op_type) for operand_type in OPERATOR_TABLES for op_type in BINARY_OPERATORS
+)
+BINARY_OP_INDEX = {key: index for index, key in enumerate(BINARY_OP_KEYS)}
+
+# BUKKIT_OP arguments index into this tuple of BUKKIT operation node types
+BUKKIT_OP_KEYS = tuple(BUKKIT_OPERATIONS)
+BUKKIT_OP_INDEX = {op_type: index for index, op_type in enumerate(BUKKIT_OP_KEYS)}
+
+
+def leaf_operand(node):
+    """(FROM_SLOT, slot) for a variable, (FROM_CONST, value) for a constant
+    that leaves IT alone and None for any other expression."""
+    if node.type == 'VARIABLE':
+        return FROM_SLOT, node.slot
+    if node.type == 'LITERAL' or (node.type == 'FOLDED' and not node.stores_it):
+        return FROM_CONST, node.value
+    return None
+
+
+def reads_slot(node, slot):
+    """Whether the expression node reads the variable in slot."""
+    if node.type == 'VARIABLE':
+        return node.slot == slot
+    if node.deep:
+        return any(expr.type == 'VARIABLE' and expr.slot == slot for expr in postorder(node))
+    for child in node.children:
+        if reads_slot(child, slot):
+            return True
+    return False
+
+
+class CodeObject:
+    def __init__(self, code, consts, names):
+        self.code = code
+        self.consts = consts
+        self.names = names
+
+    def __repr__(self):
+        return f"CodeObject(instructions={len(self.code) // 2}, consts={len(self.consts)}, names={len(self.names)})"
+
+    def disassemble(self):
+        lines = []
+        for pc in range(0, len(self.code), 2):
+            op, arg = self.code[pc], self.code[pc + 1]
+            if op in (LOAD_CONST, LOAD_FOLDED):
+                detail = repr(self.consts[arg])
+            elif op in (LOAD_NAME, STORE_NAME, ASSIGN, DECLARE, INPUT, UPPIN, NERFIN):
+                detail = self.names[arg]
+            elif op in (COUNT_START, COUNT_NEXT):
+                slot, delta, bound, equal, until, stores_it, body, end = self.consts[arg]
+                detail = f"{self.names[slot]} {'+' if delta > 0 else '-'}1 to {bound!r}"
+            elif op == DEFINE:
+                name, number, parameter_count = self.consts[arg][:3]
+                detail = f"{name} #{number} ({parameter_count} arguments)"
+            elif op in (BINARY_OP, BINARY_OP_NO_IT):
+                operand_type, op_type = BINARY_OP_KEYS[arg]
+                detail = f"{op_type} ({operand_type})" if operand_type else op_type
+            elif op in (BUKKIT_OP, BUKKIT_OP_NO_IT):
+                detail = BUKKIT_OP_KEYS[arg]
+            elif op == SWITCH:
+                table, default = self.consts[arg]
+                detail = f"{len(table)} cases, otherwise {default}"
+            elif op == LOAD_BINARY_OP:
+                detail = self.describe_binary(self.consts[arg])
+            elif op == STORE_BINARY_OP:
+                slot, assigns_it, *binary = self.consts[arg]
+                detail = f"{self.describe_binary(binary)} -> {self.names[slot]}{' and IT' if assigns_it else ''}"
+            else:
+                detail = str(arg)
+            lines.append(f"{pc:6d} {OPCODE_NAMES[op]:<18} {detail}")
+        return '\n'.join(lines)
+
+    def describe_binary(self, binary):
+        key, stores_it, left_kind, left, right_kind, right = binary
+        operand_type, op_type = BINARY_OP_KEYS[key]
+        operator = f"{op_type} ({operand_type})" if operand_type else op_type
+        operands = [
+            'stack' if kind == FROM_STACK else self.names[value] if kind == FROM_SLOT else repr(value)
+            for kind, value in ((left_kind, left), (right_kind, right))
+        ]
+        return f"{operator} {', '.join(operands)}{'' if stores_it else ' (no IT)'}"
+
+
+class Compiler:
+    def __init__(self, ast):
+        self.ast = ast
+        self.code = []
+        self.consts = []
+        self.const_index = {}
+        self.names = []
+        # Positions of the GTFO jumps of every loop or WTF? being compiled,
+        # innermost last, patched to the end of their loop or WTF?
+        self.loop_breaks = []
+
+    def compile(self):
+        if not self.ast or self.ast.type != 'PROGRAM':
+            raise ValueError("Invalid AST: Root node must be a PROGRAM")
+        if self.ast.value is None:
+            raise ValueError("Invalid AST: run SemanticAnalyzer first to assign variable slots")
+
+        # Name arguments are the variable slots assigned by the SemanticAnalyzer
+        self.names = list(self.ast.value)
+
+        for statement in self.ast.children:
+            self.compile_statement(statement)
+
+        return CodeObject(self.code, self.consts, self.names)
+
+    def emit(self, opcode, arg=0):
+        self.code.append(opcode)
+        self.code.append(arg)
+        return len(self.code) - 2
+
+    def patch(self, position, target):
+        self.code[position + 1] = target
+
+    def add_const(self, value):
+        # Key on the type too so that 1, 1.0 and True stay distinct constants
+        key = (type(value), value)
+        if key not in self.const_index:
+            self.const_index[key] = len(self.consts)
+            self.consts.append(value)
+        return self.const_index[key]
+
+    def compile_statement(self, node):
+        if not node:
+            return
+
+        if node.type == 'VAR_DECLARATION':
+            # The variable is reset to NOOB first only if its initializer
+            # reads it; otherwise the store makes the reset unobservable
+            if not node.children or reads_slot(node.children[0], node.slot):
+                self.emit(DECLARE, node.slot)
+            if node.children:
+                self.compile_expression(node.children[0])
+                self.emit_store(node.slot, False)
+        elif node.type == 'VAR_ASSIGNMENT':
+            self.compile_expression(node.children[0])
+            self.emit_store(node.slot, node.stores_it)
+        elif node.type == 'OUTPUT':
+            self.compile_expression(node.children[0])
+            self.emit(PRINT)
+        elif node.type == 'INPUT':
+            self.emit(INPUT, node.slot)
+        elif node.type == 'APPEND':
+            self.emit(LOAD_NAME, node.slot)
+            self.compile_expression(node.children[0])
+            self.emit(APPEND)
+        elif node.type == 'ITEM_ASSIGNMENT':
+            for child in node.children:
+                self.compile_expression(child)
+            self.emit(PUT_ITEM)
+        elif node.type == 'CONDITIONAL':
+            self.compile_conditional(node)
+        elif node.type == 'SWITCH':
+            self.compile_switch(node)
+        elif node.type == 'LOOP':
+            self.compile_loop(node)
+        elif node.type == 'BREAK':
+            if self.loop_breaks:
+                self.loop_breaks[-1].append(self.emit(JUMP))
+            else:
+                # GTFO outside any loop returns NOOB from the function
+                self.emit(LOAD_CONST, self.add_const(None))
+                self.emit(RETURN)
+        elif node.type == 'RETURN':
+            self.compile_expression(node.children[0])
+            self.emit(RETURN)
+        elif node.type == 'FUNCTION':
+            self.compile_function(node)
+
+    def compile_conditional(self, node):
+        true_branch = None
+        false_branch = None
+        for branch in node.children:
+            if branch.type == 'TRUE_BRANCH' and true_branch is None:
+                true_branch = branch
+            elif branch.type == 'FALSE_BRANCH' and false_branch is None:
+                false_branch = branch
+
+        jump_to_false = self.emit(JUMP_IF_IT_FALSE)
+        if true_branch:
+            for statement in true_branch.children:
+                self.compile_statement(statement)
+
+        if false_branch:
+            jump_to_end = self.emit(JUMP)
+            self.patch(jump_to_false, len(self.code))
+            for statement in false_branch.children:
+                self.compile_statement(statement)
+            self.patch(jump_to_end, len(self.code))
+        else:
+            self.patch(jump_to_false, len(self.code))
+
+    def compile_switch(self, node):
+        """Compile the cases back to back, so each one falls through into
+        the next. SWITCH takes a constant mapping every case literal to the
+        start of its case, and where to go when no literal equals IT."""
+        dispatch = self.emit(SWITCH)
+        starts = []
+        self.loop_breaks.append([])
+        for case in node.children:
+            starts.append(len(self.code))
+            for statement in case.children:
+                self.compile_statement(statement)
+        self.patch_breaks()
+
+        default = starts[-1] if node.children[-1].type == 'DEFAULT_CASE' else len(self.code)
+        table = {literal: starts[index] for literal, index in node.value.items()}
+        self.consts.append((table, default))
+        self.patch(dispatch, len(self.consts) - 1)
+
+    def compile_loop(self, node):
+        update, condition, body = loop_parts(node)
+        if update is not None and update.children:
+            # The loop declared its own variable
+            self.emit(LOAD_CONST, self.add_const(update.children[0].value))
+            self.emit(STORE_NAME, update.slot)
+
+        bound = counting_bound(node)
+        if bound is not None:
+            self.compile_counting_loop(update, condition, body, bound)
+            return
+
+        start = len(self.code)
+        exit_jump = None
+        if condition is not None:
+            self.compile_expression(condition.children[0])
+            opcode = POP_JUMP_IF_TRUE if condition.type == 'LOOP_TIL' else POP_JUMP_IF_FALSE
+            exit_jump = self.emit(opcode)
+
+        self.loop_breaks.append([])
+        self.compile_loop_body(body)
+        if update is not None:
+            self.emit(LOOP_STEP_OPCODES[update.type], update.slot)
+        self.emit(JUMP, start)
+
+        self.patch_breaks()
+        if exit_jump is not None:
+            self.patch(exit_jump, len(self.code))
+
+    def compile_counting_loop(self, update, condition, body, bound):
+        """Compile a loop that counts to a constant (see counting_bound) so
+        that each pass costs the body plus one COUNT_NEXT, which steps the
+        variable, tests it and jumps back.
+
+        Both COUNT instructions take a constant describing the loop: the
+        variable's slot, the step, the bound, whether the test is BOTH SAEM,
+        whether it ends the loop when true, whether it stores IT and where
+        the body and the loop end."""
+        descriptor = len(self.consts)
+        self.consts.append(None)
+        self.emit(COUNT_START, descriptor)
+        body_start = len(self.code)
+
+        self.loop_breaks.append([])
+        self.compile_loop_body(body)
+        self.emit(COUNT_NEXT, descriptor)
+
+        self.consts[descriptor] = (
+            update.slot,
+            1 if update.type == 'LOOP_UPPIN' else -1,
+            bound,
+            condition.children[0].type == 'OP_EQUAL',
+            condition.type == 'LOOP_TIL',
+            condition.children[0].stores_it,
+            body_start,
+            len(self.code),
+        )
+        self.patch_breaks()
+
+    def compile_function(self, node):
+        """Compile a function body into code of its own, run by the VM in a
+        fresh frame on every call.
+
+        DEFINE takes a constant describing the function: its name, number,
+        parameter count, whether it is pure and its code, constants and
+        slot names."""
+        parameters, body = function_parts(node)
+        function = Compiler(node)
+        function.names = list(body.value)
+        for statement in body.children:
+            function.compile_statement(statement)
+        # Running off the end returns the function's IT
+        function.emit(LOAD_NAME, 0)
+        function.emit(RETURN)
+
+        self.consts.append((
+            node.value,
+            node.slot,
+            len(parameters),
+            node.static_type == 'PURE',
+            function.code,
+            function.consts,
+            function.names,
+        ))
+        self.emit(DEFINE, len(self.consts) - 1)
+
+    def binary_operands(self, node):
+        """How the LOAD_BINARY_OP running node takes each operand, as a
+        (FROM_SLOT, slot) or (FROM_CONST, value) pair for a variable or
+        constant it reads itself and (FROM_STACK, None) for one computed
+        beforehand, or None when node is not a binary operator or both its
+        operands are computed.
+
+        A left variable is read after the right operand is computed, which
+        reads the same value unless it is IT, the only slot an expression
+        can change."""
+        if node.type not in BINARY_OPERATORS:
+            return None
+        left, right = map(leaf_operand, node.children)
+        if right is None and left == (FROM_SLOT, 0):
+            left = None
+        if left is None and right is None:
+            return None
+        return left or (FROM_STACK, None), right or (FROM_STACK, None)
+
+    def emit_binary(self, node, operands):
+        """Emit a binary operator, fused into one LOAD_BINARY_OP with the
+        loads of its operands that are variables or constants, which are
+        then not compiled on their own. Its constant holds the operator,
+        whether it stores IT and each of its operands."""
+        key = BINARY_OP_INDEX[(node.operand_type, node.type)]
+        if operands is None:
+            # Operators whose IT store the Optimizer found dead skip it
+            self.emit(BINARY_OP if node.stores_it else BINARY_OP_NO_IT, key)
+        else:
+            (left_kind, left), (right_kind, right) = operands
+            self.consts.append((key, node.stores_it, left_kind, left, right_kind, right))
+            self.emit(LOAD_BINARY_OP, len(self.consts) - 1)
+
+    def emit_store(self, slot, assigns_it):
+        """Emit ASSIGN, which also stores IT, or STORE_NAME. Storing the
+        result of a LOAD_BINARY_OP fuses both into one STORE_BINARY_OP,
+        whose constant holds the slot and whether IT is assigned, followed
+        by the LOAD_BINARY_OP's constant."""
+        if self.code and self.code[-2] == LOAD_BINARY_OP:
+            index = self.code[-1]
+            self.consts[index] = (slot, assigns_it, *self.consts[index])
+            self.code[-2] = STORE_BINARY_OP
+        else:
+            self.emit(ASSIGN if assigns_it else STORE_NAME, slot)
+
+    def compile_loop_body(self, body):
+        for statement in body.children:
+            self.compile_statement(statement)
+
+    def patch_breaks(self):
+        for position in self.loop_breaks.pop():
+            self.patch(position, len(self.code))
+
+    def compile_expression(self, node):
+        if not node:
+            self.emit(LOAD_CONST, self.add_const(None))
+            return
+        if node.deep:
+            # Postorder is exactly stack-machine order: operands, then
+            # operator. Deep expressions skip the fusing, as threading runs
+            # them through the handlers anyway
+            for expr in postorder(node):
+                self.compile_node(expr, None)
+            return
+        operands = self.binary_operands(node)
+        if operands is None:
+            for child in node.children:
+                self.compile_expression(child)
+        else:
+            # Operands the LOAD_BINARY_OP reads itself are not compiled
+            for child, (kind, _) in zip(node.children, operands):
+                if kind == FROM_STACK:
+                    self.compile_expression(child)
+        self.compile_node(node, operands)
+
+    def compile_node(self, node, operands):
+        """Emit node's own instructions, taking a binary operator's
+        operands as binary_operands gives them, or None to pop both."""
+        if node.type == 'LITERAL':
+            self.emit(LOAD_CONST, self.add_const(node.value))
+
+        elif node.type == 'VARIABLE':
+            self.emit(LOAD_NAME, node.slot)
+
+        elif node.type == 'FOLDED':
+            self.emit(LOAD_FOLDED if node.stores_it else LOAD_CONST, self.add_const(node.value))
+
+        elif node.type in BINARY_OPERATORS:
+            self.emit_binary(node, operands)
+
+        elif node.type == 'OP_NOT':
+            self.emit(NOT)
+
+        elif node.type == 'OP_SMOOSH':
+            self.emit(SMOOSH, len(node.children))
+
+        elif node.type == 'CALL':
+            self.emit(CALL if node.stores_it else CALL_NO_IT, node.slot)
+
+        elif node.type in BUKKIT_OPERATIONS:
+            self.emit(BUKKIT_OP if node.stores_it else BUKKIT_OP_NO_IT, BUKKIT_OP_INDEX[node.type])
+
+        else:
+            self.emit(LOAD_CONST, self.add_const(None))
@@ -0,0 +1,356 @@
+"""
+LOLCODE Daemon Module
+Serves program runs from a pool of pre-warmed worker processes over a
+Unix-domain socket
+"""
+
+import json
+import multiprocessing
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+
+from lolcode import ENGINES, run_source
+from limits import ResourceLimits, LIMIT_DESCRIPTIONS
+from output import OutputSink, DEFAULT_FLUSH_SIZE
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_MAX_RUNS = 1000
+DEFAULT_TIMEOUT = 30.0
+# Latencies of this many recent runs feed the stats percentiles
+LATENCY_WINDOW = 1000
+
+
+def is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+class PipeSink(OutputSink):
+    """Sends a worker's output to the daemon in chunks as the program runs."""
+
+    def __init__(self, connection, flush_size=DEFAULT_FLUSH_SIZE):
+        self.connection = connection
+        self.flush_size = flush_size
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.size >= self.flush_size:
+            self.flush()
+
+    def flush(self):
+        if self.parts:
+            self.connection.send(('output', ''.join(self.parts)))
+            self.parts.clear()
+            self.size = 0
+
+
+def worker_main(connection):
+    """Worker process loop. Importing this module already loaded the whole
+    interpreter, so every request runs without any startup cost."""
+    while True:
+        try:
+            request = connection.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            limits = request.get('limits')
+            result = run_source(request['source'], stdin=request.get('stdin', ''),
+                                stdout=PipeSink(connection), engine=request.get('engine', 'tree'),
+                                limits=ResourceLimits.from_dict(limits) if limits else None)
+            connection.send(('done', [str(error) for error in result.errors], result.timings))
+        except Exception as e:
+            connection.send(('done', [f"Error: {e}"], {}))
+
+
+class Worker:
+    def __init__(self, context):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=worker_main, args=(child_connection,), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.runs = 0
+
+    @property
+    def pid(self):
+        return self.process.pid
+
+    def stop(self, kill=False):
+        self.connection.close()
+        if kill:
+            self.process.kill()
+        self.process.join(timeout=5)
+
+
+class WorkerPool:
+    """Fixed-size pool of worker processes. A worker is replaced after
+    max_runs requests, after a timeout and whenever it dies."""
+
+    def __init__(self, size, max_runs):
+        # Spawned workers start from a clean interpreter rather than a fork
+        # of the threaded daemon
+        self.context = multiprocessing.get_context('spawn')
+        self.size = size
+        self.max_runs = max_runs
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        self.workers = set()
+        self.recycled = 0
+        self.closed = False
+
+    def start(self):
+        for _ in range(self.size):
+            self.add_worker()
+
+    def add_worker(self):
+        worker = Worker(self.context)
+        with self.lock:
+            self.workers.add(worker)
+        self.idle.put(worker)
+
+    def acquire(self):
+        return self.idle.get()
+
+    def release(self, worker):
+        worker.runs += 1
+        if worker.runs >= self.max_runs:
+            self.replace(worker)
+            with self.lock:
+                self.recycled += 1
+        else:
+            self.idle.put(worker)
+
+    def replace(self, worker, kill=False):
+        with self.lock:
+            self.workers.discard(worker)
+        # Stop the old worker in the background so the request that retired
+        # it is not held up
+        threading.Thread(target=worker.stop, args=(kill,), daemon=True).start()
+        if not self.closed:
+            self.add_worker()
+
+    def close(self):
+        self.closed = True
+        with self.lock:
+            workers = list(self.workers)
+            self.workers.clear()
+        for worker in workers:
+            worker.stop()
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    """One JSON request line in, one or more JSON response lines out."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+        self.client_gone = False
+        try:
+            request = json.loads(line)
+        except ValueError:
+            self.send({'type': 'error', 'message': "Malformed request"})
+            return
+        self.server.lol_daemon.handle(request, self.send)
+
+    def send(self, message):
+        # A client that went away must not stop the worker's output from
+        # being drained, so write failures are only remembered
+        if self.client_gone:
+            return
+        try:
+            self.wfile.write(json.dumps(message).encode('utf-8') + b'\n')
+            self.wfile.flush()
+        except OSError:
+            self.client_gone = True
+
+
+class DaemonServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class LolDaemon:
+    """Pool of warm workers serving run, stats and shutdown requests.
+
+    A run request carries source, stdin, engine, an optional timeout in
+    seconds and optional limits, a dict of ResourceLimits fields enforced
+    inside the worker. The reply streams {'type': 'output'} messages followed by one
+    {'type': 'done'} message with the errors and phase timings, or is one
+    {'type': 'error'} message when a field is malformed."""
+
+    def __init__(self, socket_path, workers=DEFAULT_WORKERS, max_runs=DEFAULT_MAX_RUNS, timeout=DEFAULT_TIMEOUT):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self.pool = WorkerPool(workers, max_runs)
+        self.server = None
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.active = 0
+        self.runs = 0
+        self.timeouts = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.started = None
+
+    def start(self):
+        self.remove_stale_socket()
+        self.pool.start()
+        self.server = DaemonServer(self.socket_path, RequestHandler)
+        self.server.lol_daemon = self
+        self.started = time.time()
+
+    def serve_forever(self):
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        # serve_forever() returns and closes everything
+        threading.Thread(target=self.server.shutdown, daemon=True).start()
+
+    def close(self):
+        self.server.server_close()
+        self.pool.close()
+        try:
+            os.remove(self.socket_path)
+        except OSError:
+            pass
+
+    def remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except OSError:
+            # Left behind by a daemon that did not shut down cleanly
+            os.remove(self.socket_path)
+            return
+        finally:
+            probe.close()
+        raise OSError(f"A daemon is already listening on {self.socket_path}")
+
+    def handle(self, request, send):
+        op = request.get('op')
+        if op == 'run':
+            self.handle_run(request, send)
+        elif op == 'stats':
+            send({'type': 'stats', **self.stats()})
+        elif op == 'shutdown':
+            send({'type': 'shutdown'})
+            self.shutdown()
+        else:
+            send({'type': 'error', 'message': f"Unknown op {op!r}"})
+
+    def run_job(self, request):
+        """The job a run request sends to a worker and its timeout, checked
+        before any worker is involved. Raises ValueError naming the first
+        malformed field."""
+        job = {
+            'source': request.get('source', ''),
+            'stdin': request.get('stdin', ''),
+            'engine': request.get('engine', 'tree'),
+            'limits': request.get('limits'),
+        }
+        for field in ('source', 'stdin'):
+            if not isinstance(job[field], str):
+                raise ValueError(f"'{field}' must be a string")
+        if job['engine'] not in ENGINES:
+            raise ValueError(f"'engine' must be one of {', '.join(ENGINES)}")
+        limits = job['limits']
+        if limits is not None:
+            if not isinstance(limits, dict):
+                raise ValueError("'limits' must be an object")
+            for name in LIMIT_DESCRIPTIONS:
+                value = limits.get(name)
+                if value is not None and (not is_number(value) or value < 0):
+                    raise ValueError(f"limit '{name}' must be a non-negative number")
+        timeout = request.get('timeout')
+        if timeout is None:
+            timeout = self.timeout
+        elif not is_number(timeout) or timeout <= 0:
+            raise ValueError("'timeout' must be a positive number of seconds")
+        return job, timeout
+
+    def handle_run(self, request, send):
+        start = time.perf_counter()
+        try:
+            job, timeout = self.run_job(request)
+        except ValueError as e:
+            send({'type': 'error', 'message': f"Malformed request: {e}"})
+            return
+        with self.lock:
+            self.waiting += 1
+        worker = self.pool.acquire()
+        with self.lock:
+            self.waiting -= 1
+            self.active += 1
+
+        try:
+            worker.connection.send(job)
+            deadline = time.perf_counter() + timeout
+            while True:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0 or not worker.connection.poll(remaining):
+                    self.pool.replace(worker, kill=True)
+                    worker = None
+                    with self.lock:
+                        self.timeouts += 1
+                    send({'type': 'done', 'errors': [f"Error: Timed out after {timeout:g}s"], 'timings': {}})
+                    break
+                message = worker.connection.recv()
+                if message[0] == 'output':
+                    send({'type': 'output', 'data': message[1]})
+                else:
+                    _, errors, timings = message
+                    send({'type': 'done', 'errors': errors, 'timings': timings, 'worker': worker.pid})
+                    break
+        except (EOFError, OSError):
+            # The worker died mid-run
+            if worker is not None:
+                self.pool.replace(worker, kill=True)
+                worker = None
+            send({'type': 'done', 'errors': ["Error: Worker process exited unexpectedly"], 'timings': {}})
+        except Exception as e:
+            # The worker may still be running the job, so its output must
+            # not reach the next request
+            if worker is not None:
+                self.pool.replace(worker, kill=True)
+                worker = None
+            send({'type': 'done', 'errors': [f"Error: {e}"], 'timings': {}})
+            raise
+        finally:
+            if worker is not None:
+                self.pool.release(worker)
+            with self.lock:
+                self.active -= 1
+                self.runs += 1
+                self.latencies.append(time.perf_counter() - start)
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            return {
+                'workers': self.pool.size,
+                'idle': self.pool.idle.qsize(),
+                'active': self.active,
+                'queue_depth': self.waiting,
+                'runs': self.runs,
+                'timeouts': self.timeouts,
+                'recycled': self.pool.recycled,
+                'latency_p50': percentile(latencies, 0.50),
+                'latency_p99': percentile(latencies, 0.99),
+                'uptime': time.time() - self.started,
+            }
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
@@ -1,10 +1,10 @@
 import tkinter as tk
 from tkinter import filedialog, scrolledtext, messagebox, simpledialog
-import subprocess
-import sys
-import os
 import threading
-import re
+import queue
+
+from lolcode import run_source
+from inputs import CallbackInput
 
 class LOLCodeGUI:
     def __init__(self, root):
@@ -29,37 +29,22 @@ class LOLCodeGUI:
             messagebox.showerror("File Error", str(e))
             return
 
-        # Extract GIMMEH vars
-        gimmeh_vars = re.findall(r"\bGIMMEH\s+(\w+)", content)
-
-        inputs = ""
-        if gimmeh_vars:
-            for var in gimmeh_vars:
-                user_input = simpledialog.askstring("User Input", f"Enter value for `{var}`:")
-                if user_input is None:
-                    return  # User cancelled
-                inputs += user_input + "\n"
-
         def run_code():
-            if not os.path.exists("main.py"):
-                messagebox.showerror("Error", "main.py not found in current folder.")
-                return
-
-            result = subprocess.run(
-                [sys.executable, "main.py", file_path],
-                input=inputs,
-                capture_output=True,
-                text=True
-            )
+            # Answers are asked for only when GIMMEH actually runs
+            result = run_source(content, stdin=CallbackInput(self.ask_for_input))
 
             self.output_area.delete(1.0, tk.END)
-            if result.stdout:
-                self.output_area.insert(tk.END, result.stdout)
-            if result.stderr:
-                self.output_area.insert(tk.END, "\n[stderr]\n" + result.stderr)
+            self.output_area.insert(tk.END, result.transcript)
 
         threading.Thread(target=run_code).start()
 
+    def ask_for_input(self):
+        # Called from the worker thread; Tk dialogs must run on the main
+        # thread, so hand the question over and wait for the answer
+        answer = queue.Queue()
+        self.root.after(0, lambda: answer.put(simpledialog.askstring("User Input", "Enter a value for GIMMEH:")))
+        return answer.get()
+
 # Run GUI
 if __name__ == "__main__":
     root = tk.Tk()
@@ -0,0 +1,107 @@
+"""
+LOLCODE Input Module
+Input sources that GIMMEH reads lines from in every execution engine
+"""
+
+import codecs
+import io
+import sys
+
+# Bytes requested from the underlying stream per read
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class InputSource:
+    """Source of GIMMEH answers.
+
+    read_line() returns the next line without its newline and raises
+    EOFError once the input is exhausted, like input()."""
+
+    def read_line(self):
+        raise NotImplementedError
+
+    def end_of_input(self):
+        return EOFError("EOF when reading a line")
+
+
+class ChunkedInput(InputSource):
+    """Reads a binary stream in large chunks and splits lines lazily.
+
+    read1() returns whatever is available, so an interactive terminal still
+    answers one line at a time. Line endings are normalized to '\\n' the way
+    text-mode stdin does."""
+
+    def __init__(self, stream, chunk_size=DEFAULT_CHUNK_SIZE, encoding='utf-8'):
+        self.stream = stream
+        self.read_chunk = getattr(stream, 'read1', stream.read)
+        self.chunk_size = chunk_size
+        self.decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(), translate=True)
+        self.text = ''
+        self.position = 0
+        self.at_eof = False
+
+    def read_line(self):
+        while True:
+            end = self.text.find('\n', self.position)
+            if end >= 0:
+                line = self.text[self.position:end]
+                self.position = end + 1
+                return line
+            if self.at_eof:
+                if self.position < len(self.text):
+                    # Last line without a trailing newline
+                    line = self.text[self.position:]
+                    self.position = len(self.text)
+                    return line
+                raise self.end_of_input()
+            self.fill()
+
+    def fill(self):
+        chunk = self.read_chunk(self.chunk_size)
+        self.at_eof = not chunk
+        self.text = self.text[self.position:] + self.decoder.decode(chunk, self.at_eof)
+        self.position = 0
+
+
+class StreamInput(InputSource):
+    """Reads lines from a text stream such as an io.StringIO."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def read_line(self):
+        line = self.stream.readline()
+        if not line:
+            raise self.end_of_input()
+        if line.endswith('\n'):
+            return line[:-1]
+        return line
+
+
+class CallbackInput(InputSource):
+    """Asks a function for each line; the function returns None at the end
+    of input. Used to prompt for answers only when GIMMEH runs."""
+
+    def __init__(self, function):
+        self.function = function
+
+    def read_line(self):
+        line = self.function()
+        if line is None:
+            raise self.end_of_input()
+        return line
+
+
+def default_source(stream=None):
+    """Pick an input source for a text stream, sys.stdin by default."""
+    stream = stream if stream is not None else sys.stdin
+    if hasattr(stream, 'buffer'):
+        return ChunkedInput(stream.buffer, encoding=getattr(stream, 'encoding', None) or 'utf-8')
+    return StreamInput(stream)
+
+
+def as_source(stdin):
+    """Accept an InputSource, a text stream or None (sys.stdin)."""
+    if isinstance(stdin, InputSource):
+        return stdin
+    return default_source(stdin)
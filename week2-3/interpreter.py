@@ -3,25 +3,105 @@ LOLCODE Interpreter Module
 Executes the semantically analyzed AST
 """
 
+import bukkit
+import runtime
+from bukkit import BUKKIT_OPERATIONS
+from inputs import as_source
+from output import as_sink
+from parser import counting_bound, function_parts, loop_parts, postorder
+from runtime import BINARY_OPERATORS, LOOP_STEPS, MAX_CALL_DEPTH, OPERATOR_TABLES
+
+
+class LoopBreak(Exception):
+    """Raised by GTFO and caught by the innermost loop or WTF? running it, or
+    by the function call running it outside any of them."""
+
+
+class FunctionReturn(Exception):
+    """Raised by FOUND YR and caught by the function call running it."""
+
+    def __init__(self, value):
+        super().__init__(value)
+        self.value = value
+
+
 class Interpreter:
-    def __init__(self, ast):
+    # Loops on the plain Interpreter that count their variable to a constant
+    # keep the count in a local instead of evaluating the condition node
+    count_loops = True
+
+    def __init__(self, ast, stdout=None, stdin=None, memo_size=None):
         self.ast = ast
-        self.variables = {}
+        self.slot_names = ()
+        # The slots of the program, or of the function call running
+        self.slots = []
         self.it_value = None
-
-    def interpret(self):
+        # VISIBLE writes to stdout (an OutputSink or a text stream) and GIMMEH
+        # reads from stdin (an InputSource or a text stream); both default to
+        # the process streams in effect when the program runs
+        self.stdout = stdout
+        self.stdin = stdin
+        self.output_sink = None
+        self.input_source = None
+        # Postorder node lists of the deeply nested expressions run so far
+        self.expression_code = {}
+        # What every loop run so far does on each pass; see resolve_loop
+        self.loop_code = {}
+        # Every function defined so far, by number, as a Python callable
+        # taking the argument values
+        self.functions = {}
+        # Function calls running now, up to MAX_CALL_DEPTH
+        self.call_depth = 0
+        # Results kept per pure function, or None to call every time
+        self.memo_size = memo_size
+        # Operator implementations, per instance so a subclass can wrap them
+        self.operator_tables = OPERATOR_TABLES
+        self.smoosh = runtime.smoosh
+        self.bukkit_operations = BUKKIT_OPERATIONS
+
+    @property
+    def variables(self):
+        return dict(zip(self.slot_names, self.slots))
+
+    def interpret(self, statements=None):
+        """Run the program. statements, an iterable of analyzed top-level
+        statements, replaces the PROGRAM node's children for a program that
+        is run while it is still being parsed; see lolcode.run_stream."""
         if not self.ast or self.ast.type != 'PROGRAM':
             raise ValueError("Invalid AST: Root node must be a PROGRAM")
+        if self.ast.value is None:
+            raise ValueError("Invalid AST: run SemanticAnalyzer first to assign variable slots")
 
         self.initialize_variables()
+        self.output_sink = as_sink(self.stdout)
+        self.input_source = as_source(self.stdin)
 
-        for statement in self.ast.children:
-            self.execute_statement(statement)
+        try:
+            if statements is None:
+                self.execute_block(self.ast.children)
+            else:
+                self.execute_stream(statements)
+        finally:
+            self.output_sink.flush()
 
     def initialize_variables(self):
-        self.variables = {
-            'IT': None
-        }
+        # Slot 0 is IT; names were resolved to slots by the SemanticAnalyzer,
+        # so undeclared names never reach the interpreter.
+        self.slot_names = self.ast.value
+        self.slots = [None] * len(self.slot_names)
+
+    def execute_stream(self, statements):
+        for statement in statements:
+            # Declarations analyzed since the previous statement add slots
+            self.slots.extend([None] * (len(self.slot_names) - len(self.slots)))
+            self.execute_block((statement,))
+            # Streamed statements run once, so keep nothing alive for reuse
+            self.expression_code.clear()
+            self.loop_code.clear()
+
+    def execute_block(self, statements):
+        for statement in statements:
+            self.execute_statement(statement)
 
     def execute_statement(self, node):
         if not node:
@@ -35,238 +115,311 @@ class Interpreter:
             self.execute_output(node)
         elif node.type == 'INPUT':
             self.execute_input(node)
+        elif node.type == 'APPEND':
+            self.execute_append(node)
+        elif node.type == 'ITEM_ASSIGNMENT':
+            self.execute_item_assignment(node)
         elif node.type == 'CONDITIONAL':
             self.execute_conditional(node)
+        elif node.type == 'SWITCH':
+            self.execute_switch(node)
+        elif node.type == 'LOOP':
+            self.execute_loop(node)
+        elif node.type == 'BREAK':
+            self.execute_break(node)
+        elif node.type == 'RETURN':
+            self.execute_return(node)
+        elif node.type == 'FUNCTION':
+            self.execute_function_definition(node)
 
     def execute_variable_declaration(self, node):
-        var_name = node.value
-        self.variables[var_name] = None
+        self.slots[node.slot] = None
 
         if node.children:
-            value = self.evaluate_expression(node.children[0])
-            self.variables[var_name] = value
+            self.slots[node.slot] = self.evaluate_expression(node.children[0])
 
     def execute_variable_assignment(self, node):
-        var_name = node.value
-        if var_name not in self.variables:
-            raise NameError(f"Variable '{var_name}' not declared")
-
         value = self.evaluate_expression(node.children[0])
-        self.variables[var_name] = value
-        self.variables['IT'] = value
+        self.slots[node.slot] = value
+        if node.stores_it:
+            self.slots[0] = value
 
     def execute_output(self, node):
         value = self.evaluate_expression(node.children[0])
-        print(self.to_string(value))
+        self.output_sink.write(self.to_string(value) + '\n')
 
     def execute_input(self, node):
-        var_name = node.value
-        if var_name not in self.variables:
-            raise NameError(f"Variable '{var_name}' not declared")
+        self.output_sink.input_requested()
+        user_input = self.input_source.read_line()
+        value = runtime.parse_input(user_input)
+        self.slots[node.slot] = value
+        self.slots[0] = value
 
-        user_input = input()
+    def execute_append(self, node):
+        target = self.slots[node.slot]
+        bukkit.append(target, self.evaluate_expression(node.children[0]))
 
-        try:
-            self.variables[var_name] = int(user_input)
-        except ValueError:
-            try:
-                self.variables[var_name] = float(user_input)
-            except ValueError:
-                self.variables[var_name] = user_input
-
-        self.variables['IT'] = self.variables[var_name]
+    def execute_item_assignment(self, node):
+        target, index, value = [self.evaluate_expression(child) for child in node.children]
+        bukkit.put(target, index, value)
 
     def execute_conditional(self, node):
-        condition = self.variables['IT']
+        condition = self.slots[0]
         condition_result = self.is_truthy(condition)
 
         for branch in node.children:
             if branch.type == 'TRUE_BRANCH' and condition_result:
-                for statement in branch.children:
-                    self.execute_statement(statement)
+                self.execute_block(branch.children)
                 break
             elif branch.type == 'FALSE_BRANCH' and not condition_result:
-                for statement in branch.children:
-                    self.execute_statement(statement)
+                self.execute_block(branch.children)
                 break
 
+    def execute_switch(self, node):
+        """Jump straight to the case whose literal equals IT, or to OMGWTF,
+        and fall through the cases after it until GTFO."""
+        cases = node.children
+        default = len(cases) - 1 if cases[-1].type == 'DEFAULT_CASE' else len(cases)
+        start = runtime.switch_entry(node.value, self.slots[0], default)
+        try:
+            for index in range(start, len(cases)):
+                self.execute_block(cases[index].children)
+        except LoopBreak:
+            pass
+
+    def execute_loop(self, node):
+        loop = self.loop_code.get(node)
+        if loop is None:
+            loop = self.loop_code[node] = self.resolve_loop(node)
+        slot, step, start, condition, until, body, bound = loop
+
+        if start is not None:
+            # The loop declared its own variable
+            self.slots[slot] = start
+        try:
+            if bound is None:
+                self.run_loop(slot, step, condition, until, body)
+            else:
+                self.run_counted_loop(slot, step, condition, until, body, bound)
+        except LoopBreak:
+            pass
+
+    def run_loop(self, slot, step, condition, until, body):
+        slots = self.slots
+        evaluate = self.evaluate_expression
+        is_truthy = runtime.is_truthy
+        while True:
+            if condition is not None and is_truthy(evaluate(condition)) is until:
+                return
+            for execute, statement in body:
+                execute(statement)
+            if step is not None:
+                slots[slot] = step(slots[slot])
+
+    def run_counted_loop(self, slot, step, condition, until, body, bound):
+        slots = self.slots
+        counter = slots[slot]
+        delta = 1 if step is runtime.uppin else -1
+        equal = condition.type == 'OP_EQUAL'
+        stores_it = condition.stores_it
+        while True:
+            # Runs exactly like BOTH SAEM or DIFFRINT of the variable and bound
+            result = (counter == bound) if equal else (counter != bound)
+            if stores_it:
+                slots[0] = result
+            if result is until:
+                return
+            for execute, statement in body:
+                execute(statement)
+            counter = counter + delta if type(counter) is int else step(counter)
+            slots[slot] = counter
+
+    def resolve_loop(self, node):
+        """Work out once what each pass of a loop does, so passes never
+        dispatch on node types: the slot and step of the loop variable, its
+        initial value when the loop declares it, the condition and whether
+        it ends the loop when true (TIL) or false (WILE), the body as
+        (executor, statement) pairs and, for a counting loop, its bound."""
+        update, condition, body = loop_parts(node)
+        slot = step = start = None
+        if update is not None:
+            slot = update.slot
+            step = LOOP_STEPS[update.type]
+            if update.children:
+                start = update.children[0].value
+
+        test = until = None
+        if condition is not None:
+            test = condition.children[0]
+            until = condition.type == 'LOOP_TIL'
+
+        bound = counting_bound(node) if self.count_loops else None
+        return (slot, step, start, test, until, self.resolve_body(body), bound)
+
+    def resolve_body(self, body):
+        """The statements of a loop body paired with the method that runs
+        each one."""
+        executors = {
+            'VAR_DECLARATION': self.execute_variable_declaration,
+            'VAR_ASSIGNMENT': self.execute_variable_assignment,
+            'OUTPUT': self.execute_output,
+            'INPUT': self.execute_input,
+            'APPEND': self.execute_append,
+            'ITEM_ASSIGNMENT': self.execute_item_assignment,
+            'CONDITIONAL': self.execute_conditional,
+            'SWITCH': self.execute_switch,
+            'LOOP': self.execute_loop,
+            'BREAK': self.execute_break,
+            'RETURN': self.execute_return,
+        }
+        return [(executors[statement.type], statement) for statement in body.children]
+
+    def execute_break(self, node):
+        raise LoopBreak()
+
+    def execute_return(self, node):
+        raise FunctionReturn(self.evaluate_expression(node.children[0]))
+
+    def execute_function_definition(self, node):
+        _, body = function_parts(node)
+        statements = body.children
+        frame_size = len(body.value)
+
+        def call(*arguments):
+            if self.call_depth == MAX_CALL_DEPTH:
+                raise RecursionError()
+            frame = [None, *arguments]
+            frame.extend([None] * (frame_size - len(frame)))
+            caller_slots = self.slots
+            self.slots = frame
+            self.call_depth += 1
+            try:
+                self.execute_block(statements)
+            except FunctionReturn as e:
+                return e.value
+            except LoopBreak:
+                return None
+            finally:
+                self.slots = caller_slots
+                self.call_depth -= 1
+            # Running off the end returns the function's IT
+            return frame[0]
+
+        if node.static_type == 'PURE' and self.memo_size is not None:
+            call = runtime.memoize(call, self.memo_size)
+        self.functions[node.slot] = call
+
+    def call_function(self, node, arguments):
+        result = self.functions[node.slot](*arguments)
+        if node.stores_it:
+            self.slots[0] = result
+        return result
+
     def evaluate_expression(self, node):
         if not node:
             return None
 
-        if node.type == 'LITERAL':
+        node_type = node.type
+        if node_type == 'LITERAL':
             return node.value
 
-        elif node.type == 'VARIABLE':
-            var_name = node.value
-            if var_name not in self.variables:
-                raise NameError(f"Variable '{var_name}' not declared")
-            return self.variables[var_name]
-
-        elif node.type == 'OP_ADD':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            try:
-                result = float(left) + float(right)
-                if result.is_integer():
-                    result = int(result)
-                self.variables['IT'] = result
-                return result
-            except (ValueError, TypeError):
-                result = str(left) + str(right)
-                self.variables['IT'] = result
-                return result
-
-        elif node.type == 'OP_SUB':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            try:
-                result = float(left) - float(right)
-                if result.is_integer():
-                    result = int(result)
-                self.variables['IT'] = result
-                return result
-            except (ValueError, TypeError):
-                raise TypeError("Cannot subtract non-numeric values")
-
-        elif node.type == 'OP_MUL':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            try:
-                result = float(left) * float(right)
-                if result.is_integer():
-                    result = int(result)
-                self.variables['IT'] = result
-                return result
-            except (ValueError, TypeError):
-                raise TypeError("Cannot multiply non-numeric values")
-
-        elif node.type == 'OP_DIV':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            try:
-                if float(right) == 0:
-                    raise ZeroDivisionError("Division by zero")
-                result = float(left) / float(right)
-                if result.is_integer():
-                    result = int(result)
-                self.variables['IT'] = result
-                return result
-            except (ValueError, TypeError):
-                raise TypeError("Cannot divide non-numeric values")
-
-        elif node.type == 'OP_MOD':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            try:
-                left_val = int(float(left))
-                right_val = int(float(right))
-                if right_val == 0:
-                    raise ZeroDivisionError("Modulo by zero")
-                result = left_val % right_val
-                self.variables['IT'] = result
-                return result
-            except (ValueError, TypeError):
-                raise TypeError("Cannot perform modulo on non-numeric values")
-
-        elif node.type == 'OP_MAX':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            try:
-                left_val = float(left)
-                right_val = float(right)
-                result = max(left_val, right_val)
-                if result.is_integer():
-                    result = int(result)
-                self.variables['IT'] = result
-                return result
-            except (ValueError, TypeError):
-                raise TypeError("Cannot compare non-numeric values")
-
-        elif node.type == 'OP_MIN':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            try:
-                left_val = float(left)
-                right_val = float(right)
-                result = min(left_val, right_val)
-                if result.is_integer():
-                    result = int(result)
-                self.variables['IT'] = result
-                return result
-            except (ValueError, TypeError):
-                raise TypeError("Cannot compare non-numeric values")
-
-        elif node.type == 'OP_EQUAL':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            result = left == right
-            self.variables['IT'] = result
+        elif node_type == 'VARIABLE':
+            return self.slots[node.slot]
+
+        elif node_type in BINARY_OPERATORS:
+            if node.deep:
+                return self.evaluate_deep(node)
+            left, right = node.children
+            result = self.operator_tables[node.operand_type][node_type](
+                self.evaluate_expression(left), self.evaluate_expression(right))
+            if node.stores_it:
+                self.slots[0] = result
             return result
 
-        elif node.type == 'OP_NOT_EQUAL':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            result = left != right
-            self.variables['IT'] = result
-            return result
+        elif node_type == 'FOLDED':
+            # A constant expression folded by the Optimizer still sets IT
+            if node.stores_it:
+                self.slots[0] = node.value
+            return node.value
 
-        elif node.type == 'OP_AND':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            result = self.is_truthy(left) and self.is_truthy(right)
-            self.variables['IT'] = result
-            return result
+        elif node.deep:
+            return self.evaluate_deep(node)
 
-        elif node.type == 'OP_OR':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            result = self.is_truthy(left) or self.is_truthy(right)
-            self.variables['IT'] = result
+        elif node_type == 'OP_NOT':
+            result = runtime.negate(self.evaluate_expression(node.children[0]))
+            if node.stores_it:
+                self.slots[0] = result
             return result
 
-        elif node.type == 'OP_XOR':
-            left = self.evaluate_expression(node.children[0])
-            right = self.evaluate_expression(node.children[1])
-            result = self.is_truthy(left) != self.is_truthy(right)
-            self.variables['IT'] = result
+        elif node_type == 'OP_SMOOSH':
+            result = self.smoosh([self.evaluate_expression(child) for child in node.children])
+            if node.stores_it:
+                self.slots[0] = result
             return result
 
-        elif node.type == 'OP_NOT':
-            operand = self.evaluate_expression(node.children[0])
-            result = not self.is_truthy(operand)
-            self.variables['IT'] = result
-            return result
+        elif node_type == 'CALL':
+            return self.call_function(node, [self.evaluate_expression(child) for child in node.children])
 
-        elif node.type == 'OP_SMOOSH':
-            parts = [self.evaluate_expression(child) for child in node.children]
-            result = ''.join(map(self.to_string, parts))
-            self.variables['IT'] = result
+        elif node_type in BUKKIT_OPERATIONS:
+            operands = [self.evaluate_expression(child) for child in node.children]
+            result = self.bukkit_operations[node_type][0](*operands)
+            if node.stores_it:
+                self.slots[0] = result
             return result
 
         return None
 
+    def evaluate_deep(self, node):
+        """Evaluate a deeply nested expression without recursion: its nodes
+        run in postorder, built once per expression, against a value stack."""
+        code = self.expression_code.get(node)
+        if code is None:
+            code = self.expression_code[node] = postorder(node)
+
+        slots = self.slots
+        operator_tables = self.operator_tables
+        values = []
+        push = values.append
+        for expr in code:
+            expr_type = expr.type
+            if expr_type == 'VARIABLE':
+                push(slots[expr.slot])
+                continue
+            if expr_type == 'LITERAL':
+                push(expr.value)
+                continue
+
+            if expr_type in BINARY_OPERATORS:
+                right = values.pop()
+                result = operator_tables[expr.operand_type][expr_type](values.pop(), right)
+            elif expr_type == 'FOLDED':
+                result = expr.value
+            elif expr_type == 'OP_NOT':
+                result = runtime.negate(values.pop())
+            elif expr_type == 'OP_SMOOSH':
+                count = len(expr.children)
+                result = self.smoosh(values[-count:])
+                del values[-count:]
+            elif expr_type == 'CALL':
+                start = len(values) - len(expr.children)
+                arguments = values[start:]
+                del values[start:]
+                # The call stores IT itself
+                push(self.call_function(expr, arguments))
+                continue
+            elif expr_type in BUKKIT_OPERATIONS:
+                start = len(values) - len(expr.children)
+                result = self.bukkit_operations[expr_type][0](*values[start:])
+                del values[start:]
+            else:
+                result = None
+            if expr.stores_it:
+                slots[0] = result
+            push(result)
+        return values[-1]
+
     def is_truthy(self, value):
-        if value is None:
-            return False
-        if isinstance(value, bool):
-            return value
-        if isinstance(value, (int, float)):
-            return value != 0
-        if isinstance(value, str):
-            if value.strip() == '' or value.upper() == 'FAIL':
-                return False
-            try:
-                if float(value) == 0:
-                    return False
-            except ValueError:
-                pass
-            return True
-        return True
+        return runtime.is_truthy(value)
 
     def to_string(self, value):
-        if value is None:
-            return "NOOB"
-        if isinstance(value, bool):
-            return "WIN" if value else "FAIL"
-        return str(value)
+        return runtime.to_string(value)
@@ -3,7 +3,17 @@ LOLCODE Lexer/Tokenizer Module
 Tokenizes LOLCODE source code into a stream of tokens
 """
 
+import gc
+import mmap
+import re
+import sys
+from array import array
+from collections.abc import Sequence
+
+
 class Token:
+    __slots__ = ('type', 'value', 'line', 'position')
+
     def __init__(self, token_type, value=None, line=None, position=None):
         self.type = token_type
         self.value = value
@@ -35,6 +45,19 @@ class Lexer:
         "O RLY?": "IF_START",
         "YA RLY": "IF_TRUE",
         "NO WAI": "IF_FALSE",
+        "IM IN YR": "LOOP_START",
+        "IM OUTTA YR": "LOOP_END",
+        "HOW IZ I": "FUNCTION_START",
+        "IF U SAY SO": "FUNCTION_END",
+        "FOUND YR": "RETURN",
+        "I IZ": "CALL_START",
+        "A BUKKIT": "NEW_BUKKIT",
+        "HAS A": "APPEND",
+        "ITEM OF": "OP_ITEM",
+        "LENGZ OF": "OP_LENGTH",
+        "TOTAL OF": "OP_TOTAL",
+        "BIGGEST OF": "OP_BIGGEST",
+        "SMALLEST OF": "OP_SMALLEST",
         "OBTW": "COMMENT_BLOCK_START",
         "TLDR": "COMMENT_BLOCK_END",
         "BTW": "COMMENT_LINE",
@@ -47,76 +70,302 @@ class Lexer:
         "VISIBLE": "OUTPUT",
         "GIMMEH": "INPUT",
         "OIC": "IF_END",
+        "WTF?": "SWITCH_START",
+        "OMG": "CASE",
+        "OMGWTF": "DEFAULT_CASE",
         "AN": "CONNECTOR",
         "NOT": "OP_NOT",
-        "SMOOSH": "OP_SMOOSH"
+        "SMOOSH": "OP_SMOOSH",
+        "UPPIN": "LOOP_UPPIN",
+        "NERFIN": "LOOP_NERFIN",
+        "YR": "YR",
+        "TIL": "LOOP_TIL",
+        "WILE": "LOOP_WILE",
+        "GTFO": "BREAK",
+        "MKAY": "EXPRESSION_END",
+        "EACH": "EACH"
+    }
+
+    # Single words with a fixed token type and value
+    WORD_TOKENS = {
+        "WIN": ("BOOL_LITERAL", True),
+        "FAIL": ("BOOL_LITERAL", False),
     }
 
+    NUMBER_PATTERN = re.compile(r"-?(?:[0-9]+|(?P<fraction>[0-9]*\.[0-9]+))")
+
     def __init__(self, source_code):
         self.source_code = source_code
-        self.lines = source_code.split('\n')
         self.tokens = []
 
+    @classmethod
+    def build_scanner(cls):
+        """Compile the master regex used to scan a whole source buffer.
+
+        Each match skips leading spaces and yields one newline, comment,
+        string literal, multi-word keyword or plain word. Multi-word keywords
+        may be separated by any run of spaces or tabs and, like every word,
+        must be followed by whitespace or the end of the source."""
+        space = r"[^\S\n]+"
+        phrases = [phrase for phrase in cls.TOKEN_TYPES if ' ' in phrase]
+        phrases.sort(key=lambda phrase: -len(phrase))
+        keyword = '|'.join(space.join(re.escape(word) for word in phrase.split()) for phrase in phrases)
+        pattern = (
+            r"[^\S\n]*(?:"
+            r"(?P<NEWLINE>\n)"
+            r"|(?P<COMMENT_BLOCK>OBTW(?!\S).*?(?:(?<!\S)TLDR(?!\S)|\Z))"
+            r"|(?P<COMMENT_LINE>BTW(?!\S)[^\n]*)"
+            r'|(?P<STRING_LITERAL>"[^"\n]*"?)'
+            rf"|(?P<KEYWORD>(?:{keyword})(?!\S))"
+            r"|(?P<WORD>\S+)"
+            r")"
+        )
+        words = {
+            phrase: (token_type, phrase)
+            for phrase, token_type in cls.TOKEN_TYPES.items()
+            if ' ' not in phrase and not token_type.startswith('COMMENT')
+        }
+        words.update(cls.WORD_TOKENS)
+        keywords = {' '.join(phrase.split()): (token_type, phrase) for phrase, token_type in cls.TOKEN_TYPES.items()}
+        return re.compile(pattern, re.DOTALL), words, keywords
+
+    @classmethod
+    def build_byte_scanner(cls):
+        """The scanner and word tables of build_scanner for sources held as
+        UTF-8 bytes, such as a memory-mapped source file."""
+        scanner, words, keywords = cls.build_scanner()
+        return (
+            re.compile(scanner.pattern.encode('ascii'), re.DOTALL),
+            {word.encode('ascii'): token for word, token in words.items()},
+            {phrase.encode('ascii'): token for phrase, token in keywords.items()},
+        )
+
     def tokenize(self):
-        for line_num, line in enumerate(self.lines):
-            words = line.strip().split()
-            i = 0
-            while i < len(words):
-                word = words[i]
-
-                # Handle string literals
-                if word.startswith('"'):
-                    string_token = word
-                    while not string_token.endswith('"') and i + 1 < len(words):
-                        i += 1
-                        string_token += ' ' + words[i]
-                    self.tokens.append(Token("STRING_LITERAL", string_token.strip('"'), line_num + 1, i))
-                    i += 1
-                    continue
+        # Tokens never form reference cycles, so pausing the cyclic garbage
+        # collector while hundreds of thousands of them are allocated saves
+        # repeated full-generation scans without leaking anything
+        gc_was_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self.tokens = list(self.iter_tokens())
+        finally:
+            if gc_was_enabled:
+                gc.enable()
+        return self.tokens
 
-                # Try 3-word phrases
-                if i + 2 < len(words):
-                    phrase = f"{words[i]} {words[i + 1]} {words[i + 2]}"
-                    if phrase in self.TOKEN_TYPES:
-                        self.tokens.append(Token(self.TOKEN_TYPES[phrase], phrase, line_num + 1, i))
-                        i += 3
-                        continue
-
-                # Try 2-word phrases
-                if i + 1 < len(words):
-                    phrase = f"{words[i]} {words[i + 1]}"
-                    if phrase in self.TOKEN_TYPES:
-                        self.tokens.append(Token(self.TOKEN_TYPES[phrase], phrase, line_num + 1, i))
-                        i += 2
-                        continue
-
-                # Single-word tokens
-                if word in self.TOKEN_TYPES:
-                    self.tokens.append(Token(self.TOKEN_TYPES[word], word, line_num + 1, i))
-                    i += 1
-                    continue
+    def iter_tokens(self):
+        """Tokens of the source, produced lazily as they are scanned.
 
-                # Check for literals
-                if word.isdigit():
-                    self.tokens.append(Token("INT_LITERAL", int(word), line_num + 1, i))
-                    i += 1
-                    continue
+        The source is a string; UTF-8 bytes in any buffer, such as an mmap,
+        that are scanned in place; or a text stream that is read a chunk at
+        a time so that only the current chunk is held in memory."""
+        if isinstance(self.source_code, str):
+            return self.scan(self.source_code)
+        if isinstance(self.source_code, BUFFER_TYPES):
+            return self.scan_buffer(self.source_code)
+        return self.scan_stream(self.source_code)
 
-                if word == "WIN":
-                    self.tokens.append(Token("BOOL_LITERAL", True, line_num + 1, i))
-                    i += 1
-                    continue
-                elif word == "FAIL":
-                    self.tokens.append(Token("BOOL_LITERAL", False, line_num + 1, i))
-                    i += 1
-                    continue
+    def scan_stream(self, stream):
+        line = 1
+        pending = ''
+        in_comment = False
+        while True:
+            chunk = stream.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            # A TLDR may start in the text already pending
+            if in_comment and 'TLDR' not in pending[-3:] + chunk:
+                pending += chunk
+                continue
+            # Scan whole lines only; no token but a block comment spans lines
+            text = pending + chunk
+            end = text.rfind('\n') + 1
+            if not end:
+                pending = text
+                continue
+            line, comment_start = yield from self.scan(text[:end], line, final=False)
+            in_comment = comment_start is not None
+            pending = text[comment_start:] if in_comment else text[end:]
+        if pending:
+            yield from self.scan(pending, line)
+
+    def scan(self, source, line=1, final=True):
+        """Scan source in one pass, yielding tokens as they are found.
 
-                # Otherwise treat as identifier or unknown
-                if word.isidentifier():
-                    self.tokens.append(Token("IDENTIFIER", word, line_num + 1, i))
+        source starts at the beginning of line number line. Token positions
+        are 1-based column numbers. Unless final, an OBTW block still open at
+        the end of source is left unscanned; the return value is the line
+        reached and the offset of that open comment, or None."""
+        scanner, words, keywords = SCANNER
+        number_match = self.NUMBER_PATTERN.fullmatch
+        line_start = 0
+
+        for match in scanner.finditer(source):
+            kind = match.lastgroup
+            if kind == 'WORD':
+                text = match.group(kind)
+                column = match.end() - len(text) - line_start + 1
+                known = words.get(text)
+                if known is not None:
+                    yield Token(known[0], known[1], line, column)
+                elif text.isidentifier():
+                    # Repeated names share one string object
+                    yield Token('IDENTIFIER', sys.intern(text), line, column)
                 else:
-                    self.tokens.append(Token("UNKNOWN", word, line_num + 1, i))
+                    number = number_match(text)
+                    if number is None:
+                        yield Token('UNKNOWN', text, line, column)
+                    elif number.group('fraction') is None:
+                        yield Token('INT_LITERAL', int(text), line, column)
+                    else:
+                        yield Token('FLOAT_LITERAL', float(text), line, column)
+            elif kind == 'NEWLINE':
+                line += 1
+                line_start = match.end()
+            elif kind == 'STRING_LITERAL':
+                text = match.group(kind)
+                column = match.end() - len(text) - line_start + 1
+                yield Token(kind, text.strip('"'), line, column)
+            elif kind == 'KEYWORD':
+                text = match.group(kind)
+                column = match.end() - len(text) - line_start + 1
+                token_type, value = keywords[' '.join(text.split())]
+                yield Token(token_type, value, line, column)
+            elif kind == 'COMMENT_BLOCK':
+                comment = match.group(kind)
+                if not final and not comment.endswith('TLDR'):
+                    # Its TLDR may be in text that has not been read yet
+                    return line, match.start(kind)
+                newlines = comment.count('\n')
+                if newlines:
+                    line += newlines
+                    line_start = match.end() - (len(comment) - comment.rindex('\n') - 1)
+        return line, None
 
-                i += 1
+    def scan_buffer(self, buffer):
+        """Scan UTF-8 source bytes in place, decoding only the identifier,
+        number and string literal slices that become token values.
 
-        return self.tokens
+        Keywords are looked up as bytes and never decoded. Token positions
+        are 1-based byte offsets into their line, which equal the column
+        numbers of scan() on ASCII lines. A source holding whitespace that
+        only text patterns match, such as a no-break space, is decoded and
+        scanned by scan() instead."""
+        if TEXT_ONLY_SPACE.search(buffer):
+            # The byte scanner would take this whitespace for part of a word,
+            # so the source is decoded and scanned as text instead
+            yield from self.scan(str(buffer, 'utf-8'))
+            return
+        scanner, words, keywords = BYTE_SCANNER
+        number_match = self.NUMBER_PATTERN.fullmatch
+        line = 1
+        line_start = 0
+
+        for match in scanner.finditer(buffer):
+            kind = match.lastgroup
+            if kind == 'WORD':
+                data = match.group(kind)
+                column = match.end() - len(data) - line_start + 1
+                known = words.get(data)
+                if known is not None:
+                    yield Token(known[0], known[1], line, column)
+                    continue
+                text = data.decode('utf-8')
+                if text.isidentifier():
+                    yield Token('IDENTIFIER', sys.intern(text), line, column)
+                else:
+                    number = number_match(text)
+                    if number is None:
+                        yield Token('UNKNOWN', text, line, column)
+                    elif number.group('fraction') is None:
+                        yield Token('INT_LITERAL', int(text), line, column)
+                    else:
+                        yield Token('FLOAT_LITERAL', float(text), line, column)
+            elif kind == 'NEWLINE':
+                line += 1
+                line_start = match.end()
+            elif kind == 'STRING_LITERAL':
+                data = match.group(kind)
+                column = match.end() - len(data) - line_start + 1
+                yield Token(kind, data.decode('utf-8').strip('"'), line, column)
+            elif kind == 'KEYWORD':
+                data = match.group(kind)
+                column = match.end() - len(data) - line_start + 1
+                token_type, value = keywords[b' '.join(data.split())]
+                yield Token(token_type, value, line, column)
+            elif kind == 'COMMENT_BLOCK':
+                comment = match.group(kind)
+                newlines = comment.count(b'\n')
+                if newlines:
+                    line += newlines
+                    line_start = match.end() - (len(comment) - comment.rindex(b'\n') - 1)
+
+    def tokenize_columnar(self):
+        return TokenColumns(self.iter_tokens())
+
+
+SCANNER = Lexer.build_scanner()
+BYTE_SCANNER = Lexer.build_byte_scanner()
+
+# Whitespace to \s in a text pattern but not in a bytes pattern, as UTF-8
+TEXT_ONLY_SPACE = re.compile(b'|'.join(
+    re.escape(char.encode('utf-8'))
+    for char in '\x1c\x1d\x1e\x1f\x85\xa0\u1680' + ''.join(map(chr, range(0x2000, 0x200b))) + '\u2028\u2029\u202f\u205f\u3000'
+))
+
+# Sources of these types are UTF-8 bytes scanned in place
+BUFFER_TYPES = (bytes, bytearray, memoryview, mmap.mmap)
+
+# Characters read at a time when scanning a text stream
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Small integer codes for every token type, used by the columnar token store
+TOKEN_TYPE_NAMES = sorted(set(Lexer.TOKEN_TYPES.values()) | {
+    'BOOL_LITERAL', 'FLOAT_LITERAL', 'IDENTIFIER', 'INT_LITERAL', 'STRING_LITERAL', 'UNKNOWN'
+})
+TOKEN_TYPE_CODES = {name: code for code, name in enumerate(TOKEN_TYPE_NAMES)}
+
+
+class TokenColumns(Sequence):
+    """Array-backed token store for very large sources.
+
+    Token types, lines and columns live in parallel typed arrays and each
+    distinct value is stored once in a shared table, so a token costs a few
+    bytes instead of a full object. Indexing builds a Token on demand, which
+    lets the Parser consume the store like a token list."""
+
+    def __init__(self, tokens=()):
+        self.types = array('B')
+        self.lines = array('I')
+        self.positions = array('I')
+        self.value_indexes = array('I')
+        self.values = []
+        self.value_table = {}
+        for token in tokens:
+            self.append(token)
+
+    def append(self, token):
+        # Key on the type too so that 1, 1.0 and True stay distinct values
+        key = (type(token.value), token.value)
+        index = self.value_table.get(key)
+        if index is None:
+            index = len(self.values)
+            self.value_table[key] = index
+            self.values.append(token.value)
+        self.types.append(TOKEN_TYPE_CODES[token.type])
+        self.lines.append(token.line)
+        self.positions.append(token.position)
+        self.value_indexes.append(index)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return Token(
+            TOKEN_TYPE_NAMES[self.types[index]],
+            self.values[self.value_indexes[index]],
+            self.lines[index],
+            self.positions[index],
+        )
@@ -0,0 +1,309 @@
+"""
+LOLCODE Limits Module
+Execution budgets that stop untrusted programs from running away
+"""
+
+import sys
+import time
+
+from interpreter import Interpreter
+from output import OutputSink, as_sink
+from yarn import Yarn
+
+# How each limit is named in error messages
+LIMIT_DESCRIPTIONS = {
+    'statements': "Statement",
+    'output_bytes': "Output",
+    'string_length': "String length",
+    'seconds': "Time",
+    'number_digits': "Number size",
+}
+
+LIMIT_UNITS = {
+    'statements': "statements",
+    'output_bytes': "bytes",
+    'string_length': "characters",
+    'seconds': "seconds",
+    'number_digits': "digits",
+}
+
+
+class ResourceLimitExceeded(Exception):
+    """Raised when a program goes over one of its ResourceLimits.
+
+    limit is the name of the ResourceLimits field that was exceeded,
+    maximum its configured value and line the source line of the statement
+    that was running, or None when no statement was."""
+
+    def __init__(self, limit, maximum, line=None):
+        super().__init__(limit, maximum, line)
+        self.limit = limit
+        self.maximum = maximum
+        self.line = line
+
+    def __str__(self):
+        line_str = f" on line {self.line}" if self.line is not None else ""
+        return (f"{LIMIT_DESCRIPTIONS[self.limit]} limit of {self.maximum} "
+                f"{LIMIT_UNITS[self.limit]} exceeded{line_str}")
+
+
+class ResourceLimits:
+    """Budgets for one program run; None leaves that resource unlimited.
+
+    statements caps the statements executed, output_bytes the UTF-8 size of
+    everything VISIBLE prints, string_length the characters in any YARN the
+    program builds or reads, seconds the wall-clock time of the run and
+    number_digits the decimal digits of any NUMBR it computes or reads.
+    NUMBRs are always capped under limits: without number_digits they may
+    have no more digits than string_length allows, nor more than CPython
+    converts to text (sys.get_int_max_str_digits), since a longer NUMBR
+    could not be printed."""
+
+    def __init__(self, statements=None, output_bytes=None, string_length=None, seconds=None, number_digits=None):
+        self.statements = statements
+        self.output_bytes = output_bytes
+        self.string_length = string_length
+        self.seconds = seconds
+        self.number_digits = number_digits
+
+    def max_number_digits(self):
+        """The digits a NUMBR may have, or None when NUMBRs are unbounded."""
+        if self.number_digits is not None:
+            return self.number_digits
+        caps = [cap for cap in (self.string_length, sys.get_int_max_str_digits()) if cap]
+        return min(caps) if caps else None
+
+    @classmethod
+    def from_dict(cls, values):
+        """Limits from a mapping such as a JSON daemon request."""
+        return cls(**{name: values[name] for name in LIMIT_DESCRIPTIONS if values.get(name) is not None})
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in LIMIT_DESCRIPTIONS if getattr(self, name) is not None}
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={value!r}" for name, value in self.to_dict().items())
+        return f"ResourceLimits({fields})"
+
+
+class LimitedSink(OutputSink):
+    """Passes output on to another sink until output_bytes have been written."""
+
+    def __init__(self, sink, output_bytes):
+        self.sink = sink
+        self.output_bytes = output_bytes
+        self.written = 0
+
+    def write(self, text):
+        self.written += len(text) if text.isascii() else len(text.encode('utf-8'))
+        if self.written > self.output_bytes:
+            raise ResourceLimitExceeded('output_bytes', self.output_bytes)
+        self.sink.write(text)
+
+    def input_requested(self):
+        self.sink.input_requested()
+
+    def flush(self):
+        self.sink.flush()
+
+
+def limit_add(add, maximum):
+    """Wrap a SUM OF implementation so that a YARN result longer than maximum
+    raises."""
+    def limited_add(left, right):
+        result = add(left, right)
+        if isinstance(result, (str, Yarn)) and len(result) > maximum:
+            raise ResourceLimitExceeded('string_length', maximum)
+        return result
+    return limited_add
+
+
+def limit_smoosh(smoosh, maximum):
+    def limited_smoosh(parts):
+        result = smoosh(parts)
+        if len(result) > maximum:
+            raise ResourceLimitExceeded('string_length', maximum)
+        return result
+    return limited_smoosh
+
+
+def limit_total(total, maximum):
+    """Wrap TOTAL OF, which adds a BUKKIT's YARNs like a chain of SUM OF,
+    so that a YARN result longer than maximum raises."""
+    def limited_total(bukkit):
+        result = total(bukkit)
+        if isinstance(result, (str, Yarn)) and len(result) > maximum:
+            raise ResourceLimitExceeded('string_length', maximum)
+        return result
+    return limited_total
+
+
+def limit_number(operation, maximum):
+    """Wrap an arithmetic operator so that a NUMBR result of more than
+    maximum digits raises. Operands are results checked the same way, so no
+    single operation can take long before its result is checked."""
+    bound = 10 ** maximum
+
+    def limited_number(*operands):
+        result = operation(*operands)
+        if type(result) is int and not -bound < result < bound:
+            raise ResourceLimitExceeded('number_digits', maximum)
+        return result
+    return limited_number
+
+
+def limit_each(each, string_length, number_digits):
+    """Wrap an EACH operation so that its elements meet the same limits as
+    the results of the scalar operator. Compact storage only holds 64-bit
+    NUMBRs and NUMBARs, so only list storage is checked."""
+    bound = 10 ** number_digits if number_digits is not None else None
+
+    def limited_each(bukkit, scalar):
+        result = each(bukkit, scalar)
+        if result.typecode is None:
+            for value in result.items:
+                if type(value) is int:
+                    if bound is not None and not -bound < value < bound:
+                        raise ResourceLimitExceeded('number_digits', number_digits)
+                elif string_length is not None and isinstance(value, (str, Yarn)) and len(value) > string_length:
+                    raise ResourceLimitExceeded('string_length', string_length)
+        return result
+    return limited_each
+
+
+# Operators whose NUMBR results can outgrow their operands, directly or
+# element by element
+GROWING_OPERATORS = ('OP_ADD', 'OP_SUB', 'OP_MUL')
+GROWING_EACH_OPERATIONS = ('EACH_ADD', 'EACH_SUB', 'EACH_MUL')
+
+# A timed run reads the clock when a block starts and again after every
+# this many of its statements, so a long straight-line block cannot
+# outlive the deadline
+DEADLINE_CHECK_INTERVAL = 64
+
+
+class LimitedInterpreter(Interpreter):
+    """Interpreter that enforces ResourceLimits.
+
+    Statements are counted once per block, when a program body, function
+    call, branch or pass of a loop starts, rather than per node: a block is
+    charged for all of its statements up front, and one that would overrun
+    the budget runs only the statements still covered before raising. The
+    deadline is checked likewise, when a block starts and after every
+    DEADLINE_CHECK_INTERVAL statements of a long one. Output is
+    counted by the sink, string length by the operators that build YARNs,
+    SUM OF (with or without EACH) and SMOOSH, and NUMBR size by the
+    operators that can grow a NUMBR, so other nodes run exactly as in the
+    plain Interpreter."""
+
+    def __init__(self, ast, stdout=None, stdin=None, limits=None, memo_size=None):
+        super().__init__(ast, stdout, stdin, memo_size)
+        limits = limits if limits is not None else ResourceLimits()
+        self.limits = limits
+        self.statements_run = 0
+        self.max_statements = limits.statements if limits.statements is not None else float('inf')
+        self.deadline = None
+
+        string_length = limits.string_length
+        number_digits = limits.max_number_digits()
+        operator_tables = {}
+        for operand_type, table in self.operator_tables.items():
+            table = dict(table)
+            if string_length is not None:
+                table['OP_ADD'] = limit_add(table['OP_ADD'], string_length)
+            if number_digits is not None:
+                for op_type in GROWING_OPERATORS:
+                    table[op_type] = limit_number(table[op_type], number_digits)
+            operator_tables[operand_type] = table
+        self.operator_tables = operator_tables
+        if string_length is not None:
+            self.smoosh = limit_smoosh(self.smoosh, string_length)
+
+        operations = dict(self.bukkit_operations)
+        total, arity = operations['OP_TOTAL']
+        if string_length is not None:
+            total = limit_total(total, string_length)
+        if number_digits is not None:
+            total = limit_number(total, number_digits)
+        operations['OP_TOTAL'] = (total, arity)
+        if string_length is not None or number_digits is not None:
+            for each_type in GROWING_EACH_OPERATIONS:
+                each, arity = operations[each_type]
+                operations[each_type] = (limit_each(each, string_length, number_digits), arity)
+        self.bukkit_operations = operations
+        self.number_digits = number_digits
+
+    def interpret(self, statements=None):
+        if self.limits.output_bytes is not None:
+            self.stdout = LimitedSink(as_sink(self.stdout), self.limits.output_bytes)
+        if self.limits.seconds is not None:
+            self.deadline = time.perf_counter() + self.limits.seconds
+        super().interpret(statements)
+
+    def execute_block(self, statements):
+        self.statements_run += len(statements)
+        if self.statements_run > self.max_statements:
+            return self.execute_last_block(statements)
+
+        statement = None
+        try:
+            if self.deadline is None:
+                for statement in statements:
+                    self.execute_statement(statement)
+            else:
+                for start in range(0, len(statements), DEADLINE_CHECK_INTERVAL):
+                    if time.perf_counter() > self.deadline:
+                        raise ResourceLimitExceeded('seconds', self.limits.seconds, statements[start].line)
+                    for statement in statements[start:start + DEADLINE_CHECK_INTERVAL]:
+                        self.execute_statement(statement)
+        except ResourceLimitExceeded as e:
+            # Limits hit by an operator or the output sink do not know which
+            # statement was running; the innermost block does
+            if e.line is None:
+                e.line = statement.line
+            raise
+
+    def resolve_body(self, body):
+        # Each pass of a loop runs its body as one block. An empty body runs
+        # as a block of the body node itself, which does nothing but is
+        # charged like a statement, so even an empty loop uses up the budget.
+        return [(self.execute_block, body.children or (body,))]
+
+    def execute_last_block(self, statements):
+        """Run the statements the budget still covers, then raise. Nested
+        blocks of those statements find the budget spent."""
+        covered = len(statements) - (self.statements_run - self.max_statements)
+        self.statements_run = self.max_statements - covered
+        self.execute_block(statements[:covered])
+        raise ResourceLimitExceeded('statements', self.max_statements, statements[covered].line)
+
+    def execute_input(self, node):
+        super().execute_input(node)
+        value = self.slots[node.slot]
+        if type(value) is str and self.limits.string_length is not None and len(value) > self.limits.string_length:
+            raise ResourceLimitExceeded('string_length', self.limits.string_length, node.line)
+        if type(value) is int and self.number_digits is not None and len(str(abs(value))) > self.number_digits:
+            raise ResourceLimitExceeded('number_digits', self.number_digits, node.line)
+
+
+def add_limit_arguments(arg_parser):
+    """Add the --max-* options read by limits_from_args to a command line."""
+    arg_parser.add_argument('--max-statements', type=int, metavar='N',
+                            help="stop the program after N statements (tree engine)")
+    arg_parser.add_argument('--max-output-bytes', type=int, metavar='N',
+                            help="stop the program once VISIBLE has printed N bytes (tree engine)")
+    arg_parser.add_argument('--max-string-length', type=int, metavar='N',
+                            help="stop the program when it builds or reads a YARN longer than N "
+                                 "characters (tree engine)")
+    arg_parser.add_argument('--max-seconds', type=float, metavar='S',
+                            help="stop the program after S seconds of wall-clock time (tree engine)")
+    arg_parser.add_argument('--max-number-digits', type=int, metavar='N',
+                            help="stop the program when it computes or reads a NUMBR of more than N digits "
+                                 "(tree engine)")
+
+
+def limits_from_args(args):
+    """ResourceLimits from the --max-* options, or None when none was given."""
+    limits = ResourceLimits(args.max_statements, args.max_output_bytes, args.max_string_length, args.max_seconds,
+                            args.max_number_digits)
+    return limits if limits.to_dict() else None
@@ -0,0 +1,358 @@
+"""
+LOLCODE Embedding API Module
+Runs LOLCODE programs in-process and reports output, variables, timings and errors
+"""
+
+import io
+import sys
+import threading
+import time
+
+from lexer import Lexer
+from parser import ASTNode, Parser
+from semantic_analyzer import SemanticAnalyzer
+from optimizer import Optimizer
+from interpreter import Interpreter
+from profiler import ProfilingInterpreter
+from limits import LimitedInterpreter, ResourceLimitExceeded
+from compiler import Compiler
+from vm import VirtualMachine
+from transpiler import Transpiler, PythonProgram
+from output import MemorySink
+from runtime import MAX_CALL_DEPTH
+from yarn import flatten
+
+ENGINES = ('tree', 'vm', 'python')
+
+# Reported when function calls nest deeper than MAX_CALL_DEPTH
+RECURSION_MESSAGE = "Function calls nested too deeply"
+
+# Python frames a run may use per LOLCODE call, enough for a call made from
+# inside loops, conditionals and expressions on the tree engine
+FRAMES_PER_CALL = 40
+# Stack of the thread a program runs in, with room for every one of those
+# frames even where a frame also takes C stack
+RUN_STACK_SIZE = 64 * 1024 * 1024
+
+# How each phase's errors are labelled when printed, matching the CLI output
+ERROR_LABELS = {
+    'syntax': "Syntax Error",
+    'semantic': "Semantic Error",
+    'compile': "Error",
+    'runtime': "Error",
+    'limit': "Resource Limit Error",
+}
+
+
+class LolError:
+    """A syntax, semantic, compile, runtime or resource limit error from one
+    program run."""
+
+    def __init__(self, phase, message, line=None):
+        self.phase = phase
+        self.message = message
+        self.line = line
+
+    def __str__(self):
+        return f"{ERROR_LABELS[self.phase]}: {self.message}"
+
+    def __repr__(self):
+        line_str = f", line={self.line}" if self.line is not None else ""
+        return f"LolError({self.phase}, {self.message!r}{line_str})"
+
+
+class RunResult:
+    """Outcome of run_source.
+
+    output holds what the program printed when no stdout stream was given,
+    variables the final value of every variable (IT included), timings and
+    cpu_timings the wall-clock and CPU seconds spent in each phase that ran,
+    errors a list of LolError and profile the NodeProfile of a profiled run."""
+
+    def __init__(self):
+        self.output = None
+        self.variables = {}
+        self.timings = {}
+        self.cpu_timings = {}
+        self.errors = []
+        self.profile = None
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    @property
+    def transcript(self):
+        """The output followed by the error messages, as main.py prints them."""
+        lines = [str(error) + '\n' for error in self.errors]
+        return (self.output or '') + ''.join(lines)
+
+    def __repr__(self):
+        return f"RunResult(ok={self.ok}, errors={self.errors!r})"
+
+
+class PhaseTimer:
+    """Context manager adding the wall-clock and CPU time spent in a phase to
+    result.timings and result.cpu_timings."""
+
+    def __init__(self, result, phase):
+        self.result = result
+        self.phase = phase
+        self.start = None
+        self.cpu_start = None
+
+    def __enter__(self):
+        self.cpu_start = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        cpu_elapsed = time.process_time() - self.cpu_start
+        timings, cpu_timings = self.result.timings, self.result.cpu_timings
+        timings[self.phase] = timings.get(self.phase, 0.0) + elapsed
+        cpu_timings[self.phase] = cpu_timings.get(self.phase, 0.0) + cpu_elapsed
+        return False
+
+
+def build_ast(source_code, result=None):
+    """Lex, parse, analyze and optimize source_code.
+
+    Returns the optimized AST, or None after recording the syntax or semantic
+    errors in result."""
+    result = result if result is not None else RunResult()
+
+    with PhaseTimer(result, 'lex'):
+        token_stream = Lexer(source_code).tokenize()
+
+    try:
+        with PhaseTimer(result, 'parse'):
+            ast = Parser(token_stream).parse()
+    except SyntaxError as e:
+        result.errors.append(LolError('syntax', e.msg, e.lineno))
+        return None
+
+    with PhaseTimer(result, 'analyze'):
+        analyzer = SemanticAnalyzer(ast)
+        checked_ast = analyzer.analyze()
+    if checked_ast is None:
+        result.errors.extend(LolError('semantic', error) for error in analyzer.errors)
+        return None
+
+    with PhaseTimer(result, 'optimize'):
+        return Optimizer(checked_ast).optimize()
+
+
+def build_program(source_code, engine='tree', result=None):
+    """Build the optimized AST and compile it for the engine.
+
+    Returns an analyzed AST (tree), a CodeObject (vm) or a Python code object
+    (python), or None after recording any error in result."""
+    result = result if result is not None else RunResult()
+    checked_ast = build_ast(source_code, result)
+    if checked_ast is None or engine == 'tree':
+        return checked_ast
+
+    try:
+        with PhaseTimer(result, 'compile'):
+            if engine == 'vm':
+                return Compiler(checked_ast).compile()
+            return Transpiler(checked_ast).compile()
+    except Exception as e:
+        result.errors.append(LolError('compile', str(e)))
+        return None
+
+
+class DeepStack:
+    """Runs programs in threads with a stack and a recursion limit deep
+    enough for MAX_CALL_DEPTH calls on every engine, so that they all stop
+    at that depth rather than wherever Python's default stack runs out.
+
+    Python's recursion limit is shared by every thread, so it is raised
+    while any run is in progress and restored when the last one ends."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.runs = 0
+        self.outer_limit = None
+
+    def call(self, function):
+        """Call function in a new thread and return its result, raising
+        its exception if it raised one."""
+        outcome = []
+
+        def run():
+            try:
+                outcome.append((True, function()))
+            except BaseException as e:
+                outcome.append((False, e))
+
+        with self.lock:
+            if self.runs == 0:
+                self.outer_limit = sys.getrecursionlimit()
+                sys.setrecursionlimit(max(self.outer_limit, MAX_CALL_DEPTH * FRAMES_PER_CALL))
+            self.runs += 1
+        try:
+            # The stack size applies to threads started while it is set
+            with self.lock:
+                previous_size = threading.stack_size(RUN_STACK_SIZE)
+                try:
+                    thread = threading.Thread(target=run, daemon=True)
+                    thread.start()
+                finally:
+                    threading.stack_size(previous_size)
+            thread.join()
+        finally:
+            with self.lock:
+                self.runs -= 1
+                if self.runs == 0:
+                    sys.setrecursionlimit(self.outer_limit)
+        succeeded, value = outcome[0]
+        if not succeeded:
+            raise value
+        return value
+
+
+DEEP_STACK = DeepStack()
+
+
+def create_engine(engine, program, stdout=None, stdin=None, profile=False, limits=None, memo_size=None):
+    if limits is not None:
+        if engine != 'tree':
+            raise ValueError(f"Resource limits are enforced by the tree engine only, not '{engine}'")
+        if profile:
+            raise ValueError("Resource limits cannot be combined with profiling")
+        return LimitedInterpreter(program, stdout, stdin, limits, memo_size)
+    if engine == 'vm':
+        return VirtualMachine(program, stdout, stdin, memo_size)
+    if engine == 'python':
+        return PythonProgram(program, stdout, stdin, memo_size)
+    if profile:
+        return ProfilingInterpreter(program, stdout, stdin, memo_size)
+    return Interpreter(program, stdout, stdin, memo_size)
+
+
+def final_variables(runner):
+    """The runner's variables, with every YARN as a plain str."""
+    return {name: flatten(value) for name, value in runner.variables.items()}
+
+
+def run_program(engine, program, stdout=None, stdin=None, result=None, profile=False, limits=None, memo_size=None):
+    """Run a program from build_program, recording variables and any runtime
+    error in result. With profile the tree engine also records a NodeProfile
+    in result.profile; with limits, a ResourceLimits, the run stops with a
+    'limit' error once it exceeds one of them. With memo_size every pure
+    function keeps the results of its memo_size most recent argument lists."""
+    result = result if result is not None else RunResult()
+    runner = create_engine(engine, program, stdout, stdin, profile, limits, memo_size)
+    try:
+        with PhaseTimer(result, 'run'):
+            DEEP_STACK.call(runner.interpret if engine == 'tree' else runner.run)
+    except ResourceLimitExceeded as e:
+        result.errors.append(LolError('limit', str(e), e.line))
+    except RecursionError:
+        result.errors.append(LolError('runtime', RECURSION_MESSAGE))
+    except Exception as e:
+        result.errors.append(LolError('runtime', str(e)))
+    result.variables = final_variables(runner)
+    result.profile = getattr(runner, 'profile', None)
+    return result
+
+
+def run_source(source_code, stdin=None, stdout=None, engine='tree', cache=None, profile=False, limits=None,
+               memo_size=None):
+    """Run a LOLCODE program in this process and return a RunResult.
+
+    stdin is a string, an InputSource or a readable text stream for GIMMEH
+    and stdout an OutputSink or a writable text stream for VISIBLE; without
+    one the output is collected in result.output. cache is an optional
+    ProgramCache consulted before compiling. profile collects per-node
+    counts and times in result.profile (tree engine only). limits is a
+    ResourceLimits budget for running untrusted programs (tree engine
+    only). memo_size turns on result memoization for functions the
+    SemanticAnalyzer proved pure, keeping that many results per function.
+    Errors in the program never raise: they are returned in result.errors."""
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}'; expected one of {', '.join(ENGINES)}")
+    result = RunResult()
+    if isinstance(stdin, str):
+        stdin = io.StringIO(stdin)
+    output = None
+    if stdout is None:
+        output = stdout = MemorySink()
+
+    program = None
+    if cache is not None:
+        with PhaseTimer(result, 'cache'):
+            program = cache.load(source_code, engine)
+    if program is None:
+        program = build_program(source_code, engine, result)
+        if program is not None and cache is not None:
+            with PhaseTimer(result, 'cache'):
+                cache.store(source_code, engine, program)
+
+    if program is not None:
+        run_program(engine, program, stdout, stdin, result, profile, limits, memo_size)
+    if output is not None:
+        result.output = output.getvalue()
+    return result
+
+
+def stream_statements(parser, analyzer, optimizer, result):
+    """The parsed, analyzed and optimized top-level statements of a streamed
+    program. Stops after recording the first syntax or semantic error."""
+    it_value = None
+    try:
+        for statement in parser.iter_statements():
+            analyzer.analyze_node(statement)
+            if analyzer.errors:
+                result.errors.extend(LolError('semantic', error) for error in analyzer.errors)
+                return
+            # IT is tracked across statements, but whether a store is read
+            # later is unknown, so every IT store is kept
+            statements, it_value = optimizer.optimize_block([statement], it_value)
+            yield from statements
+    except SyntaxError as e:
+        result.errors.append(LolError('syntax', e.msg, e.lineno))
+
+
+def run_stream(source_stream, stdin=None, stdout=None, limits=None, memo_size=None):
+    """Run a LOLCODE program read from a text stream one top-level statement
+    at a time and return a RunResult.
+
+    Tokens are scanned from the stream a chunk at a time, and every
+    statement is parsed, analyzed, optimized and run before the next one is
+    read, then dropped. Memory stays flat however long the program is, and
+    output starts as soon as the first statement runs. Programs run on the
+    tree engine, under limits and with memo_size if given. Unlike
+    run_source, an error is found only when its statement is reached, after
+    everything before it has run. The whole run is timed as one 'stream'
+    phase."""
+    result = RunResult()
+    if isinstance(stdin, str):
+        stdin = io.StringIO(stdin)
+    output = None
+    if stdout is None:
+        output = stdout = MemorySink()
+
+    program = ASTNode('PROGRAM', line=1)
+    analyzer = SemanticAnalyzer(program)
+    analyzer.initialize_scope()
+    # Slots are added to this list as declarations are analyzed
+    program.value = analyzer.slot_names
+    statements = stream_statements(Parser(Lexer(source_stream).iter_tokens()), analyzer, Optimizer(program), result)
+
+    runner = create_engine('tree', program, stdout, stdin, limits=limits, memo_size=memo_size)
+    try:
+        with PhaseTimer(result, 'stream'):
+            DEEP_STACK.call(lambda: runner.interpret(statements))
+    except ResourceLimitExceeded as e:
+        result.errors.append(LolError('limit', str(e), e.line))
+    except RecursionError:
+        result.errors.append(LolError('runtime', RECURSION_MESSAGE))
+    except Exception as e:
+        result.errors.append(LolError('runtime', str(e)))
+    result.variables = final_variables(runner)
+    if output is not None:
+        result.output = output.getvalue()
+    return result
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+LOLCODE Daemon
+Starts the worker daemon and talks to it as a thin client
+
+The client side imports nothing from the interpreter, so a run costs only
+this small script's startup while lexing, parsing and execution happen in
+the daemon's pre-warmed workers.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+
+DEFAULT_SOCKET = os.path.join(os.environ.get('TMPDIR', '/tmp'), f"lolcoded-{os.getuid()}.sock")
+
+
+def send_request(socket_path, request):
+    """Send one request and yield each response message as it arrives."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(json.dumps(request).encode('utf-8') + b'\n')
+        with client.makefile('rb') as responses:
+            for line in responses:
+                yield json.loads(line)
+
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description="LOLCODE worker daemon and client.")
+    arg_parser.add_argument('--socket', default=DEFAULT_SOCKET,
+                            help=f"Unix-domain socket path (default: {DEFAULT_SOCKET})")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+
+    serve = commands.add_parser('serve', help="start the daemon in the foreground")
+    serve.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                       help="worker processes (default: one per CPU)")
+    serve.add_argument('--max-runs', type=int, default=1000,
+                       help="runs before a worker is replaced by a fresh one (default: 1000)")
+    serve.add_argument('--timeout', type=float, default=30.0,
+                       help="default seconds a run may take before its worker is killed (default: 30)")
+
+    run = commands.add_parser('run', help="run a .lol file on the daemon")
+    run.add_argument('file', help="path to a .lol source file")
+    run.add_argument('--engine', choices=['tree', 'vm', 'python'], default='tree',
+                     help="execution engine (default: tree)")
+    run.add_argument('--inputs', metavar='FILE',
+                     help="GIMMEH answers, one per line (default: piped stdin, if any)")
+    run.add_argument('--timeout', type=float, help="seconds this run may take")
+    run.add_argument('--max-statements', type=int, metavar='N', help="stop the program after N statements")
+    run.add_argument('--max-output-bytes', type=int, metavar='N',
+                     help="stop the program once VISIBLE has printed N bytes")
+    run.add_argument('--max-string-length', type=int, metavar='N',
+                     help="stop the program when it builds or reads a YARN longer than N characters")
+    run.add_argument('--max-seconds', type=float, metavar='S',
+                     help="stop the program after S seconds, without killing its worker")
+    run.add_argument('--max-number-digits', type=int, metavar='N',
+                     help="stop the program when it computes or reads a NUMBR of more than N digits")
+
+    commands.add_parser('stats', help="print daemon statistics")
+    commands.add_parser('stop', help="shut the daemon down")
+    return arg_parser.parse_args()
+
+
+def serve(args):
+    from daemon import LolDaemon
+
+    lol_daemon = LolDaemon(args.socket, args.workers, args.max_runs, args.timeout)
+    lol_daemon.start()
+    print(f"lolcoded: {args.workers} workers listening on {args.socket}", file=sys.stderr)
+    try:
+        lol_daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def run(args):
+    try:
+        with open(args.file, 'r', encoding='utf-8') as file:
+            source_code = file.read()
+        if args.inputs:
+            with open(args.inputs, 'r', encoding='utf-8') as inputs_file:
+                stdin = inputs_file.read()
+        else:
+            # The daemon cannot prompt, so answers come from piped input only
+            stdin = '' if sys.stdin.isatty() else sys.stdin.read()
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.")
+        return 1
+
+    request = {'op': 'run', 'source': source_code, 'stdin': stdin, 'engine': args.engine}
+    if args.timeout:
+        request['timeout'] = args.timeout
+    # Resource limits are enforced inside the worker; see limits.py
+    limits = {
+        'statements': args.max_statements,
+        'output_bytes': args.max_output_bytes,
+        'string_length': args.max_string_length,
+        'seconds': args.max_seconds,
+        'number_digits': args.max_number_digits,
+    }
+    if any(value is not None for value in limits.values()):
+        request['limits'] = limits
+    errors = []
+    for message in send_request(args.socket, request):
+        if message['type'] == 'output':
+            sys.stdout.write(message['data'])
+            sys.stdout.flush()
+        elif message['type'] == 'done':
+            errors = message['errors']
+        elif message['type'] == 'error':
+            errors = [f"Error: {message['message']}"]
+    for error in errors:
+        print(error)
+    return 1 if errors else 0
+
+
+def stats(args):
+    for message in send_request(args.socket, {'op': 'stats'}):
+        for key, value in message.items():
+            if key == 'type':
+                continue
+            if key.startswith('latency') and value is not None:
+                value = f"{value * 1000:.2f} ms"
+            print(f"{key:<12} {value}")
+    return 0
+
+
+def stop(args):
+    for _ in send_request(args.socket, {'op': 'shutdown'}):
+        pass
+    return 0
+
+
+def main():
+    args = parse_args()
+    commands = {'serve': serve, 'run': run, 'stats': stats, 'stop': stop}
+    try:
+        sys.exit(commands[args.command](args))
+    except (ConnectionRefusedError, FileNotFoundError):
+        print(f"Error: no daemon is listening on {args.socket}. Start one with 'lolcoded.py serve'.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
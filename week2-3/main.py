@@ -4,50 +4,201 @@ LOLCODE Interpreter
 Main module that orchestrates the interpretation process
 """
 
+import argparse
+import contextlib
+import mmap
+import os
 import sys
-from lexer import Lexer
-from parser import Parser
-from semantic_analyzer import SemanticAnalyzer
-from interpreter import Interpreter
+from parser import format_ast
+from cache import ProgramCache, DEFAULT_CACHE_DIR
+from lolcode import ENGINES, RunResult, build_ast, run_source, run_stream
+from inputs import ChunkedInput
+from profiler import format_phases
+from batch import BatchTask, run_batch
+from limits import add_limit_arguments, limits_from_args
+from runtime import DEFAULT_MEMO_SIZE
+
+def parse_args():
+    arg_parser = argparse.ArgumentParser(description="Run a LOLCODE program.")
+    arg_parser.add_argument('file', help="path to a .lol source file")
+    arg_parser.add_argument('--engine', choices=ENGINES, default='tree',
+                            help="execution engine: tree-walking interpreter, bytecode VM or "
+                                 "Python transpiler (default: tree)")
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help="always re-analyze the program instead of using the compiled-program cache")
+    arg_parser.add_argument('--cache-dir',
+                            help=f"compiled-program cache directory (default: {DEFAULT_CACHE_DIR} "
+                                 "next to the source file)")
+    arg_parser.add_argument('--inputs', metavar='FILE',
+                            help="read GIMMEH answers from FILE, one per line, instead of stdin")
+    arg_parser.add_argument('--dump-optimized-ast', action='store_true',
+                            help="print the AST after constant folding and dead-branch elimination "
+                                 "instead of running the program")
+    arg_parser.add_argument('--profile', action='store_true',
+                            help="report wall and CPU time per phase and, on the tree engine, counts "
+                                 "and times per node type and source line on stderr (skips the cache)")
+    arg_parser.add_argument('--profile-output', metavar='FILE',
+                            help="with --profile, also write collapsed stacks for speedscope or "
+                                 "flamegraph.pl to FILE")
+    arg_parser.add_argument('--stream', action='store_true',
+                            help="lex, parse and run the program one statement at a time, in flat "
+                                 "memory, for very large generated scripts (tree engine, no cache)")
+    add_memoize_arguments(arg_parser)
+    add_limit_arguments(arg_parser)
+    args = arg_parser.parse_args()
+    check_limits(arg_parser, args)
+    if args.stream and (args.engine != 'tree' or args.profile or args.dump_optimized_ast):
+        arg_parser.error("--stream runs on the tree engine and cannot be combined with "
+                         "--profile or --dump-optimized-ast")
+    return args
+
+def parse_batch_args(argv):
+    arg_parser = argparse.ArgumentParser(prog="main.py run",
+                                         description="Run many LOLCODE programs in parallel.")
+    arg_parser.add_argument('paths', nargs='+', metavar='PATH',
+                            help=".lol files, directories (searched recursively) or glob patterns")
+    arg_parser.add_argument('--jobs', '-j', type=int, default=None,
+                            help="worker processes (default: one per CPU)")
+    arg_parser.add_argument('--engine', choices=ENGINES, default='tree',
+                            help="execution engine (default: tree)")
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help="always re-analyze programs instead of using the compiled-program cache")
+    arg_parser.add_argument('--cache-dir',
+                            help=f"compiled-program cache directory (default: {DEFAULT_CACHE_DIR} "
+                                 "next to each source file)")
+    arg_parser.add_argument('--inputs', metavar='FILE',
+                            help="GIMMEH answers given to every program, one per line "
+                                 "(default: no input)")
+    add_memoize_arguments(arg_parser)
+    add_limit_arguments(arg_parser)
+    args = arg_parser.parse_args(argv)
+    check_limits(arg_parser, args)
+    return args
+
+def add_memoize_arguments(arg_parser):
+    arg_parser.add_argument('--memoize', action='store_true',
+                            help="reuse the results of functions that have no side effects")
+    arg_parser.add_argument('--memo-size', type=int, default=DEFAULT_MEMO_SIZE, metavar='N',
+                            help=f"with --memoize, results kept per function (default: {DEFAULT_MEMO_SIZE})")
+
+def memo_size_from_args(args):
+    return args.memo_size if args.memoize else None
+
+def check_limits(arg_parser, args):
+    args.limits = limits_from_args(args)
+    if args.limits is not None:
+        if args.engine != 'tree':
+            arg_parser.error("--max-* limits need --engine=tree")
+        if getattr(args, 'profile', False):
+            arg_parser.error("--max-* limits cannot be combined with --profile")
+
+def batch_main(argv):
+    args = parse_batch_args(argv)
+    inputs = ''
+    if args.inputs:
+        try:
+            with open(args.inputs, 'r', encoding='utf-8') as inputs_file:
+                inputs = inputs_file.read()
+        except FileNotFoundError:
+            print(f"Error: File '{args.inputs}' not found.")
+            return 1
+    task = BatchTask(args.engine, not args.no_cache, args.cache_dir, inputs, args.limits,
+                     memo_size_from_args(args))
+    failed = run_batch(args.paths, task, args.jobs)
+    return 1 if failed else 0
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python main.py <filename.lol>")
-        return
+    # "main.py run PATH..." runs a batch; "main.py FILE" runs one program
+    if len(sys.argv) > 1 and sys.argv[1] == 'run':
+        sys.exit(batch_main(sys.argv[2:]))
 
-    file_path = sys.argv[1]
+    args = parse_args()
+    file_path = args.file
+
+    if args.stream:
+        stream_main(args)
+        return
 
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            source_code = file.read()
+        source_file = open(file_path, 'rb')
     except FileNotFoundError:
         print(f"Error: File '{file_path}' not found.")
         return
+    with source_file, map_source(source_file) as source_code:
+        run_main(args, source_code)
 
-    # Lexical Analysis
-    lexer = Lexer(source_code)
-    token_stream = lexer.tokenize()
-
-    # Parsing
+def map_source(source_file):
+    """Map a source file read-only into memory, so that the lexer scans its
+    bytes in place instead of a decoded copy of the whole file."""
     try:
-        parser = Parser(token_stream)
-        ast = parser.parse()
-    except SyntaxError as e:
-        print(f"Syntax Error: {e}")
+        return mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (ValueError, OSError):
+        # Empty files and pipes cannot be mapped
+        return contextlib.nullcontext(source_file.read())
+
+def run_main(args, source_code):
+    file_path = args.file
+    if args.dump_optimized_ast:
+        result = RunResult()
+        optimized_ast = build_ast(source_code, result)
+        if optimized_ast is not None:
+            print(format_ast(optimized_ast))
+        for error in result.errors:
+            print(error)
         return
 
-    # Semantic Analysis
-    analyzer = SemanticAnalyzer(ast)
-    checked_ast = analyzer.analyze()
-    if checked_ast is None:
-        return  
+    cache = None
+    # A profile measures every phase, so it never loads a cached program
+    if not args.no_cache and not args.profile:
+        cache_dir = args.cache_dir or os.path.join(os.path.dirname(os.path.abspath(file_path)), DEFAULT_CACHE_DIR)
+        cache = ProgramCache(cache_dir)
+
+    if args.inputs:
+        try:
+            with open(args.inputs, 'rb') as inputs_file:
+                result = run_source(source_code, stdin=ChunkedInput(inputs_file), stdout=sys.stdout,
+                                    engine=args.engine, cache=cache, profile=args.profile, limits=args.limits,
+                                    memo_size=memo_size_from_args(args))
+        except FileNotFoundError:
+            print(f"Error: File '{args.inputs}' not found.")
+            return
+    else:
+        result = run_source(source_code, stdout=sys.stdout, engine=args.engine, cache=cache,
+                            profile=args.profile, limits=args.limits, memo_size=memo_size_from_args(args))
+    for error in result.errors:
+        print(error)
+    if args.profile:
+        report_profile(result, args.engine, args.profile_output)
 
-    # Interpretation
+def stream_main(args):
     try:
-        interpreter = Interpreter(checked_ast)
-        interpreter.interpret()
-    except Exception as e:
-        print(f"Error: {e}")
+        with open(args.file, 'r', encoding='utf-8') as source_file:
+            if args.inputs:
+                with open(args.inputs, 'rb') as inputs_file:
+                    result = run_stream(source_file, stdin=ChunkedInput(inputs_file), stdout=sys.stdout,
+                                        limits=args.limits, memo_size=memo_size_from_args(args))
+            else:
+                result = run_stream(source_file, stdout=sys.stdout, limits=args.limits,
+                                    memo_size=memo_size_from_args(args))
+    except FileNotFoundError as e:
+        print(f"Error: File '{e.filename}' not found.")
+        return
+    for error in result.errors:
+        print(error)
+
+def report_profile(result, engine, output_path=None):
+    sys.stdout.flush()
+    print(format_phases(result.timings, result.cpu_timings), file=sys.stderr)
+    if result.profile is None:
+        if engine != 'tree':
+            print(f"\nNode-level profiles need --engine=tree; {engine} reports phases only.", file=sys.stderr)
+        return
+    print(file=sys.stderr)
+    print(result.profile.format_report(), file=sys.stderr)
+    if output_path:
+        with open(output_path, 'w', encoding='utf-8') as output_file:
+            result.profile.write_collapsed(output_file)
+        print(f"\nCollapsed stacks written to {output_path}", file=sys.stderr)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,267 @@
+"""
+LOLCODE Optimizer Module
+Folds constant expressions, removes conditional branches that can never run
+and drops IT stores that are never read
+"""
+
+import math
+
+import runtime
+from bukkit import BUKKIT_OPERATIONS
+from parser import ASTNode, NO_CHILDREN, function_parts, loop_parts, postorder
+from runtime import OPERATOR_TABLES
+from yarn import flatten
+
+# Marks an IT value that is not known until run time
+UNKNOWN = object()
+
+CONSTANT_NODES = ('LITERAL', 'FOLDED')
+
+
+class Optimizer:
+    """Rewrites the analyzed AST in place.
+
+    An operator whose operands are all constants becomes a FOLDED node. Like
+    the operator it replaces, a FOLDED node stores its value in IT when it is
+    evaluated, so every observable IT write is kept. While walking straight-line
+    code the optimizer tracks IT, and a CONDITIONAL reached with a known IT is
+    replaced by the statements of the branch that would run. IT is unknown
+    throughout a loop and after it, since any pass may have changed it, and
+    after a call. A function body is optimized like a program of its own,
+    since it runs with an IT of its own.
+
+    A final backward liveness pass clears stores_it on operators and
+    assignments whose IT store is overwritten before anything reads IT."""
+
+    def __init__(self, ast):
+        self.ast = ast
+        self.folded_count = 0
+        self.removed_branches = 0
+        self.dead_it_stores = 0
+
+    def optimize(self):
+        if not self.ast or self.ast.type != 'PROGRAM':
+            raise ValueError("Invalid AST: Root node must be a PROGRAM")
+        if self.ast.value is None:
+            raise ValueError("Invalid AST: run SemanticAnalyzer first to assign variable slots")
+
+        # Every slot, IT included, starts out as NOOB
+        self.ast.children, _ = self.optimize_block(self.ast.children, None)
+        # IT stays visible after the program ends through the engines'
+        # variables, so it is live at the exit
+        self.mark_block(self.ast.children, True)
+        return self.ast
+
+    def optimize_block(self, statements, it_value):
+        """Optimize a statement list given the IT value on entry.
+
+        Returns the new statement list and the IT value on exit."""
+        optimized = []
+        for statement in statements:
+            if statement.type == 'CONDITIONAL':
+                if it_value is UNKNOWN:
+                    for branch in statement.children:
+                        branch.children, _ = self.optimize_block(branch.children, UNKNOWN)
+                    optimized.append(statement)
+                    continue
+                # Only the branch selected by the known IT can run
+                live_statements = self.live_branch(statement, runtime.is_truthy(it_value))
+                self.removed_branches += len(statement.children) - (live_statements is not None)
+                if live_statements:
+                    live_statements, it_value = self.optimize_block(live_statements, it_value)
+                    optimized.extend(live_statements)
+                continue
+
+            if statement.type == 'SWITCH':
+                # A case can be entered by its literal or by falling through
+                for case in statement.children:
+                    case.children, _ = self.optimize_block(case.children, UNKNOWN)
+                optimized.append(statement)
+                it_value = UNKNOWN
+                continue
+
+            if statement.type == 'LOOP':
+                self.optimize_loop(statement)
+                optimized.append(statement)
+                it_value = UNKNOWN
+                continue
+
+            if statement.type == 'FUNCTION':
+                # Every call starts with a NOOB IT of its own
+                _, body = function_parts(statement)
+                body.children, _ = self.optimize_block(body.children, None)
+                optimized.append(statement)
+                continue
+
+            it_value = self.optimize_statement(statement, it_value)
+            optimized.append(statement)
+        return optimized, it_value
+
+    def optimize_loop(self, node):
+        _, condition, body = loop_parts(node)
+        if condition is not None:
+            condition.children = (self.fold(condition.children[0]),)
+        body.children, _ = self.optimize_block(body.children, UNKNOWN)
+
+    def live_branch(self, node, condition_result):
+        wanted = 'TRUE_BRANCH' if condition_result else 'FALSE_BRANCH'
+        for branch in node.children:
+            if branch.type == wanted:
+                return branch.children
+        return None
+
+    def optimize_statement(self, node, it_value):
+        """Fold the statement's expression and return the IT value after it."""
+        if node.type == 'INPUT':
+            return UNKNOWN
+        if not node.children:
+            return it_value
+        if len(node.children) > 1:
+            # ITEM OF b AN i R value leaves IT to its operands' operators
+            node.children = tuple(self.fold(child) for child in node.children)
+            return UNKNOWN
+
+        expr = self.fold(node.children[0])
+        node.children = (expr,)
+
+        if node.type == 'VAR_ASSIGNMENT':
+            if expr.type in CONSTANT_NODES:
+                return expr.value
+            if expr.type == 'VARIABLE' and expr.value == 'IT':
+                return it_value
+            return UNKNOWN
+
+        # Declarations and output only touch IT through their operators
+        if expr.type == 'FOLDED':
+            return expr.value
+        if expr.type in ('LITERAL', 'VARIABLE'):
+            return it_value
+        return UNKNOWN
+
+    def fold(self, node):
+        """Fold every constant operator in the expression, operands first,
+        and return the expression's new root."""
+        if not node.children:
+            return node
+        if node.deep:
+            return self.fold_deep(node)
+        node.children = tuple(self.fold(child) for child in node.children)
+        return self.fold_operator(node)
+
+    def fold_deep(self, node):
+        # Each operator takes its (possibly folded) operands off the end of
+        # this stack and pushes its own replacement
+        results = []
+        for expr in postorder(node):
+            if expr.children:
+                count = len(expr.children)
+                expr.children = tuple(results[-count:])
+                del results[-count:]
+                expr = self.fold_operator(expr)
+            results.append(expr)
+        return results[0]
+
+    def fold_operator(self, node):
+        # Calls are left to run, as the function may have side effects, and
+        # BUKKIT operations, as every BUKKIT is a new mutable value
+        if node.type == 'CALL' or node.type in BUKKIT_OPERATIONS or not all(child.type in CONSTANT_NODES for child in node.children):
+            return node
+
+        operands = [child.value for child in node.children]
+        try:
+            if node.type == 'OP_NOT':
+                value = runtime.negate(operands[0])
+            elif node.type == 'OP_SMOOSH':
+                value = runtime.smoosh(operands)
+            else:
+                value = OPERATOR_TABLES[node.operand_type][node.type](*operands)
+        except Exception:
+            # Errors such as division by zero are left to happen at run time
+            return node
+        if type(value) is float and not math.isfinite(value):
+            # inf and nan have no literal spelling in the generated code
+            return node
+        # Folded YARNs are literals, stored as plain strings
+        value = flatten(value)
+
+        folded = ASTNode('FOLDED', NO_CHILDREN, value, node.line)
+        folded.static_type = node.static_type
+        self.folded_count += 1
+        return folded
+
+    # IT liveness. Each mark_* method takes whether IT is live after the node
+    # runs, sets stores_it accordingly and returns whether IT is live before it.
+
+    def mark_block(self, statements, live):
+        for statement in reversed(statements):
+            live = self.mark_statement(statement, live)
+        return live
+
+    def mark_statement(self, node, live):
+        if node.type == 'CONDITIONAL':
+            for branch in node.children:
+                self.mark_block(branch.children, live)
+            # The condition itself reads IT
+            return True
+        if node.type == 'SWITCH':
+            # A case runs on into the next one unless it ends in GTFO
+            for case in node.children:
+                self.mark_block(case.children, True)
+            # Dispatch reads IT
+            return True
+        if node.type == 'LOOP':
+            # A pass can be followed by another pass or by whatever comes
+            # after the loop, so IT is kept live at the end of every pass
+            _, condition, body = loop_parts(node)
+            self.mark_block(body.children, True)
+            if condition is not None:
+                self.mark_expression(condition.children[0], True)
+            return True
+        if node.type == 'BREAK':
+            # GTFO jumps past the rest of the block to the end of the loop
+            return True
+        if node.type == 'FUNCTION':
+            # The function's IT is returned when the body runs off its end
+            # and is separate from the IT around the definition
+            _, body = function_parts(node)
+            self.mark_block(body.children, True)
+            return live
+        if node.type == 'RETURN':
+            # Nothing after FOUND YR runs in this call
+            return self.mark_expression(node.children[0], False)
+        if node.type == 'INPUT':
+            return False
+        if not node.children:
+            return live
+        if node.type == 'VAR_ASSIGNMENT':
+            self.set_stores_it(node, live)
+            # Whether or not the assignment stores IT, nothing can read the
+            # value IT holds between the expression and the assignment
+            live = False
+        # Operands run left to right
+        for child in reversed(node.children):
+            live = self.mark_expression(child, live)
+        return live
+
+    def mark_expression(self, node, live):
+        if node.type == 'VARIABLE':
+            return live or node.value == 'IT'
+        if node.type == 'LITERAL':
+            return live
+        # Walk the expression backwards from its last evaluated node: each
+        # operator before its operands, operands right to left
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.type == 'VARIABLE':
+                live = live or node.value == 'IT'
+            elif node.type != 'LITERAL':
+                self.set_stores_it(node, live)
+                live = False
+                stack.extend(node.children)
+        return live
+
+    def set_stores_it(self, node, live):
+        node.stores_it = live
+        if not live:
+            self.dead_it_stores += 1
@@ -0,0 +1,115 @@
+"""
+LOLCODE Output Module
+Output sinks that VISIBLE writes to in every execution engine
+"""
+
+import sys
+
+# Pending output is written out once it reaches this many characters
+DEFAULT_FLUSH_SIZE = 64 * 1024
+
+
+class OutputSink:
+    """Destination for program output.
+
+    Engines call write() for every VISIBLE, input_requested() right before a
+    GIMMEH reads a line and flush() when the program ends, including when it
+    stops on an error."""
+
+    def write(self, text):
+        raise NotImplementedError
+
+    def input_requested(self):
+        self.flush()
+
+    def flush(self):
+        pass
+
+
+class BufferedSink(OutputSink):
+    """Collects output in memory and writes it to the binary buffer beneath a
+    text stream (sys.stdout by default) in large encoded chunks.
+
+    Pending text is flushed when it reaches flush_size characters (never, if
+    flush_size is None), before GIMMEH reads input if flush_on_input is set,
+    and when the program ends. Text is joined and encoded once per flush,
+    which is cheaper than going through the text layer for every line."""
+
+    def __init__(self, stream=None, flush_size=DEFAULT_FLUSH_SIZE, flush_on_input=True):
+        self.stream = stream if stream is not None else sys.stdout
+        self.binary = self.stream.buffer
+        self.encoding = getattr(self.stream, 'encoding', None) or 'utf-8'
+        self.errors = getattr(self.stream, 'errors', None) or 'strict'
+        self.flush_size = flush_size
+        self.flush_on_input = flush_on_input
+        self.parts = []
+        self.size = 0
+
+    def write(self, text):
+        self.parts.append(text)
+        self.size += len(text)
+        if self.flush_size is not None and self.size >= self.flush_size:
+            self.flush()
+
+    def input_requested(self):
+        if self.flush_on_input:
+            self.flush()
+
+    def flush(self):
+        if not self.parts:
+            return
+        data = ''.join(self.parts).encode(self.encoding, self.errors)
+        self.parts.clear()
+        self.size = 0
+        # Anything already written through the text layer goes out first
+        self.stream.flush()
+        self.binary.write(data)
+        self.binary.flush()
+
+
+class StreamSink(OutputSink):
+    """Writes straight to a text stream such as an io.StringIO."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class MemorySink(OutputSink):
+    """Keeps all output in memory, for tests and embedding."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def getvalue(self):
+        return ''.join(self.parts)
+
+
+def default_sink(stream=None):
+    """Pick a sink for a text stream, sys.stdout by default.
+
+    Streams with a binary buffer get a BufferedSink; terminals are still
+    flushed on every write so output appears as the program runs."""
+    stream = stream if stream is not None else sys.stdout
+    if not hasattr(stream, 'buffer'):
+        return StreamSink(stream)
+    try:
+        interactive = stream.isatty()
+    except (AttributeError, ValueError):
+        interactive = False
+    return BufferedSink(stream, flush_size=0 if interactive else DEFAULT_FLUSH_SIZE)
+
+
+def as_sink(stdout):
+    """Accept an OutputSink, a text stream or None (sys.stdout)."""
+    if isinstance(stdout, OutputSink):
+        return stdout
+    return default_sink(stdout)
@@ -3,11 +3,67 @@ LOLCODE Parser Module
 Converts token stream into an Abstract Syntax Tree (AST)
 """
 
+from collections.abc import Sequence
+
+# Shared children tuple for leaf nodes. Nodes with a fixed number of children
+# hold them in a tuple; only block nodes (PROGRAM, branches, cases, loop and
+# function bodies) use a list.
+NO_CHILDREN = ()
+
+LITERAL_TOKENS = ('INT_LITERAL', 'FLOAT_LITERAL', 'STRING_LITERAL', 'BOOL_LITERAL')
+
+# Operand count of every expression operator; None means any number
+OPERATOR_ARITY = {
+    'OP_ADD': 2, 'OP_SUB': 2, 'OP_MUL': 2, 'OP_DIV': 2, 'OP_MOD': 2, 'OP_MAX': 2, 'OP_MIN': 2,
+    'OP_EQUAL': 2, 'OP_NOT_EQUAL': 2, 'OP_AND': 2, 'OP_OR': 2, 'OP_XOR': 2,
+    'OP_NOT': 1,
+    'OP_SMOOSH': None,
+    'OP_ITEM': 2, 'OP_LENGTH': 1, 'OP_TOTAL': 1, 'OP_BIGGEST': 1, 'OP_SMALLEST': 1,
+}
+
+# Arithmetic operators followed by EACH map over a BUKKIT, with their own
+# node types
+EACH_OPERATORS = {
+    'OP_ADD': 'EACH_ADD', 'OP_SUB': 'EACH_SUB', 'OP_MUL': 'EACH_MUL', 'OP_DIV': 'EACH_DIV',
+    'OP_MOD': 'EACH_MOD', 'OP_MAX': 'EACH_MAX', 'OP_MIN': 'EACH_MIN',
+}
+
+# Arity of a pending I IZ call, which takes operands for as long as AN YR
+# follows and ends with MKAY
+CALL_ARGUMENTS = 'CALL'
+
+# Tokens other than operators that start an expression statement, which
+# stores its value in IT
+EXPRESSION_STARTS = ('IDENTIFIER', 'CALL_START', 'NEW_BUKKIT') + LITERAL_TOKENS
+
+# Clauses that may follow the label of IM IN YR, in this order
+LOOP_UPDATES = ('LOOP_UPPIN', 'LOOP_NERFIN')
+LOOP_CONDITIONS = ('LOOP_TIL', 'LOOP_WILE')
+
+
 class ASTNode:
-    def __init__(self, node_type, children=None, value=None):
+    __slots__ = ('type', 'children', 'value', 'line', 'deep', 'slot', 'static_type', 'operand_type', 'stores_it')
+
+    def __init__(self, node_type, children=None, value=None, line=None):
         self.type = node_type
         self.children = children if children is not None else []
         self.value = value
+        # Source line the node starts on, for error reports and profiles
+        self.line = line
+        # Set on the root of an expression nested past MAX_RECURSION_DEPTH
+        self.deep = False
+        # Annotations filled in by the SemanticAnalyzer: the storage slot of
+        # the variable this node names (for a function or call, the
+        # function's number), the inferred type of an expression ('PURE' on a
+        # function proven free of side effects), and for arithmetic the
+        # operand type used to pick a specialized evaluator ('NUMBR',
+        # 'NUMBAR' or None for the generic path)
+        self.slot = None
+        self.static_type = None
+        self.operand_type = None
+        # Cleared by the Optimizer when the IT store this node performs can
+        # never be observed
+        self.stores_it = True
 
     def __repr__(self):
         value_str = f", value={self.value}" if self.value is not None else ""
@@ -15,46 +71,155 @@ class ASTNode:
         return f"ASTNode({self.type}{value_str}{children_str})"
 
 
+# Expressions nested deeper than this are flagged deep by the parser. Later
+# passes walk deep expressions with an explicit stack and everything else
+# with plain recursion, which is faster for the usual shallow code.
+MAX_RECURSION_DEPTH = 100
+
+
+def postorder(node):
+    """Every node of the tree under node, children before their parent and
+    left to right. Uses an explicit stack, so any depth of nesting works."""
+    order = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(node.children)
+    order.reverse()
+    return order
+
+
+def loop_parts(loop):
+    """The update clause, condition clause and body of a LOOP node. The
+    clauses are None when the loop has none."""
+    update = condition = None
+    for part in loop.children[:-1]:
+        if part.type in LOOP_UPDATES:
+            update = part
+        else:
+            condition = part
+    return update, condition, loop.children[-1]
+
+
+def function_parts(function):
+    """The PARAMETER nodes and the body of a FUNCTION node."""
+    return function.children[:-1], function.children[-1]
+
+
+# Statements that store into the variable slot they name; HAS A changes the
+# BUKKIT in its slot but not the slot itself
+SLOT_WRITERS = ('VAR_DECLARATION', 'VAR_ASSIGNMENT', 'INPUT', 'LOOP_UPPIN', 'LOOP_NERFIN')
+
+
+def counting_bound(loop):
+    """The constant an analyzed and optimized LOOP counts its variable to,
+    or None when it is not a counting loop.
+
+    A counting loop updates its variable with UPPIN or NERFIN, its condition
+    is BOTH SAEM or DIFFRINT of the variable and a constant, and nothing in
+    its body stores into the variable, so engines can keep the count in a
+    local and test it without evaluating the condition node."""
+    update, condition, body = loop_parts(loop)
+    if update is None or condition is None or update.slot == 0:
+        return None
+    test = condition.children[0]
+    if test.type not in ('OP_EQUAL', 'OP_NOT_EQUAL'):
+        return None
+    variable, constant = test.children
+    if variable.type != 'VARIABLE':
+        variable, constant = constant, variable
+    if variable.type != 'VARIABLE' or variable.slot != update.slot:
+        return None
+    # An operand's own IT store would be observable only if the comparison
+    # did not overwrite it
+    if constant.type != 'LITERAL' and not (constant.type == 'FOLDED' and not constant.stores_it):
+        return None
+    for node in postorder(body):
+        if node.type in SLOT_WRITERS and node.slot == update.slot:
+            return None
+    return constant.value
+
+
+def format_ast(ast):
+    """Render an AST as an indented outline, one node per line."""
+    lines = []
+    stack = [(ast, 0)]
+    while stack:
+        node, depth = stack.pop()
+        line = '  ' * depth + node.type
+        if node.value is not None:
+            line += f" {node.value!r}"
+        if node.operand_type:
+            line += f" [{node.operand_type}]"
+        if not node.stores_it:
+            line += " (IT unused)"
+        lines.append(line)
+        for child in reversed(node.children):
+            stack.append((child, depth + 1))
+    return '\n'.join(lines)
+
+
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens
+        # Accept a token sequence (a list or a TokenColumns store) or any
+        # iterable such as Lexer.iter_tokens(), which is then consumed lazily
+        # as parsing advances
+        if isinstance(tokens, Sequence):
+            self.tokens = tokens
+            self.token_source = None
+        else:
+            self.tokens = []
+            self.token_source = iter(tokens)
         self.current = 0
 
     def parse(self):
-        program_node = ASTNode('PROGRAM')
+        program_node = ASTNode('PROGRAM', line=1)
+        program_node.children.extend(self.iter_statements())
+        return program_node
 
-        if not self.tokens or self.tokens[0].type != 'PROGRAM_START':
+    def iter_statements(self):
+        """Parse the program, yielding each top-level statement as soon as
+        it is complete. With a lazy token source the tokens of a statement
+        are released once it is parsed, so only the statement being parsed
+        is ever held in memory."""
+        if self.token() is None or self.token().type != 'PROGRAM_START':
             raise SyntaxError("Program must start with 'HAI'")
 
         self.consume('PROGRAM_START')
 
-        while self.current < len(self.tokens) and self.tokens[self.current].type != 'PROGRAM_END':
-            if self.tokens[self.current].type in ['COMMENT_LINE', 'COMMENT_BLOCK_START', 'COMMENT_BLOCK_END']:
+        while self.token() is not None and self.token().type != 'PROGRAM_END':
+            if self.token().type in ['COMMENT_LINE', 'COMMENT_BLOCK_START', 'COMMENT_BLOCK_END']:
                 self.current += 1
                 continue
 
             statement = self.parse_statement()
+            if self.token_source is not None:
+                del self.tokens[:self.current]
+                self.current = 0
             if statement:
-                program_node.children.append(statement)
+                yield statement
 
-        if self.current >= len(self.tokens) or self.tokens[self.current].type != 'PROGRAM_END':
+        if self.token() is None or self.token().type != 'PROGRAM_END':
             raise SyntaxError("Program must end with 'KTHXBYE'")
 
         self.consume('PROGRAM_END')
-        return program_node
 
     def parse_statement(self):
-        if self.current >= len(self.tokens):
+        token = self.token()
+        if token is None:
             return None
 
-        token = self.tokens[self.current]
-
         if token.type == 'VAR_DECLARATION':
             return self.parse_variable_declaration()
 
         elif token.type == 'IDENTIFIER' and self.peek() and self.peek().type == 'ASSIGNMENT_OP':
             return self.parse_variable_assignment()
 
+        elif token.type == 'IDENTIFIER' and self.peek() and self.peek().type == 'APPEND':
+            self.current += 2
+            return ASTNode('APPEND', (self.parse_expression(),), token.value, token.line)
+
         elif token.type == 'OUTPUT':
             return self.parse_output()
 
@@ -64,146 +229,363 @@ class Parser:
         elif token.type == 'IF_START':
             return self.parse_conditional()
 
-        elif token.type in [
-            'OP_ADD', 'OP_SUB', 'OP_MUL', 'OP_DIV', 'OP_MOD', 'OP_MAX', 'OP_MIN',
-            'OP_EQUAL', 'OP_NOT_EQUAL', 'OP_AND', 'OP_OR', 'OP_XOR', 'OP_NOT',
-            'OP_SMOOSH'
-        ]:
+        elif token.type == 'SWITCH_START':
+            return self.parse_switch()
+
+        elif token.type == 'LOOP_START':
+            return self.parse_loop()
+
+        elif token.type == 'BREAK':
+            self.current += 1
+            return ASTNode('BREAK', NO_CHILDREN, line=token.line)
+
+        elif token.type == 'FUNCTION_START':
+            return self.parse_function()
+
+        elif token.type == 'RETURN':
+            self.current += 1
+            return ASTNode('RETURN', (self.parse_expression(),), line=token.line)
+
+        elif token.type in OPERATOR_ARITY or token.type in EXPRESSION_STARTS:
             expr = self.parse_expression()
-            return ASTNode('VAR_ASSIGNMENT', [expr], 'IT')
+            if expr.type == 'OP_ITEM' and self.token() is not None and self.token().type == 'ASSIGNMENT_OP':
+                # ITEM OF b AN i R value stores into the BUKKIT
+                self.current += 1
+                if expr.deep:
+                    for operand in expr.children:
+                        operand.deep = bool(operand.children)
+                return ASTNode('ITEM_ASSIGNMENT', expr.children + (self.parse_expression(),), None, token.line)
+            return ASTNode('VAR_ASSIGNMENT', (expr,), 'IT', token.line)
 
         self.current += 1
         return None
 
     def parse_variable_declaration(self):
+        line = self.token().line
         self.consume('VAR_DECLARATION')
 
-        if self.current >= len(self.tokens) or self.tokens[self.current].type != 'IDENTIFIER':
+        if self.token() is None or self.token().type != 'IDENTIFIER':
             raise self.syntax_error("Expected variable name after 'I HAS A'")
 
-        var_name = self.tokens[self.current].value
+        var_name = self.token().value
         self.current += 1
 
-        if self.current < len(self.tokens) and self.tokens[self.current].type == 'VAR_ASSIGNMENT':
+        if self.token() is not None and self.token().type == 'VAR_ASSIGNMENT':
             self.consume('VAR_ASSIGNMENT')
             value_expr = self.parse_expression()
-            return ASTNode('VAR_DECLARATION', [value_expr], var_name)
+            return ASTNode('VAR_DECLARATION', (value_expr,), var_name, line)
 
-        return ASTNode('VAR_DECLARATION', [], var_name)
+        return ASTNode('VAR_DECLARATION', NO_CHILDREN, var_name, line)
 
     def parse_variable_assignment(self):
-        var_name = self.tokens[self.current].value
+        var_name = self.token().value
+        line = self.token().line
         self.current += 1
 
         self.consume('ASSIGNMENT_OP')
         value_expr = self.parse_expression()
-        return ASTNode('VAR_ASSIGNMENT', [value_expr], var_name)
+        return ASTNode('VAR_ASSIGNMENT', (value_expr,), var_name, line)
 
     def parse_output(self):
+        line = self.token().line
         self.consume('OUTPUT')
         expr = self.parse_expression()
-        return ASTNode('OUTPUT', [expr])
+        return ASTNode('OUTPUT', (expr,), line=line)
 
     def parse_input(self):
+        line = self.token().line
         self.consume('INPUT')
 
-        if self.current >= len(self.tokens) or self.tokens[self.current].type != 'IDENTIFIER':
+        if self.token() is None or self.token().type != 'IDENTIFIER':
             raise self.syntax_error("Expected variable name after 'GIMMEH'")
 
-        var_name = self.tokens[self.current].value
+        var_name = self.token().value
         self.current += 1
-        return ASTNode('INPUT', [], var_name)
+        return ASTNode('INPUT', NO_CHILDREN, var_name, line)
 
     def parse_conditional(self):
+        line = self.token().line
         self.consume('IF_START')
-        cond_node = ASTNode('CONDITIONAL')
+        cond_node = ASTNode('CONDITIONAL', line=line)
 
-        if self.current >= len(self.tokens) or self.tokens[self.current].type != 'IF_TRUE':
+        if self.token() is None or self.token().type != 'IF_TRUE':
             raise self.syntax_error("Expected 'YA RLY' after 'O RLY?'")
 
+        true_branch = ASTNode('TRUE_BRANCH', line=self.token().line)
         self.consume('IF_TRUE')
-        true_branch = ASTNode('TRUE_BRANCH')
 
-        while self.current < len(self.tokens) and self.tokens[self.current].type not in ['IF_FALSE', 'IF_END']:
+        while self.token() is not None and self.token().type not in ['IF_FALSE', 'IF_END']:
             statement = self.parse_statement()
             if statement:
                 true_branch.children.append(statement)
 
         cond_node.children.append(true_branch)
 
-        if self.current < len(self.tokens) and self.tokens[self.current].type == 'IF_FALSE':
+        if self.token() is not None and self.token().type == 'IF_FALSE':
+            false_branch = ASTNode('FALSE_BRANCH', line=self.token().line)
             self.consume('IF_FALSE')
-            false_branch = ASTNode('FALSE_BRANCH')
 
-            while self.current < len(self.tokens) and self.tokens[self.current].type != 'IF_END':
+            while self.token() is not None and self.token().type != 'IF_END':
                 statement = self.parse_statement()
                 if statement:
                     false_branch.children.append(statement)
 
             cond_node.children.append(false_branch)
 
-        if self.current >= len(self.tokens) or self.tokens[self.current].type != 'IF_END':
+        if self.token() is None or self.token().type != 'IF_END':
             raise self.syntax_error("Expected 'OIC' to end conditional")
 
         self.consume('IF_END')
         return cond_node
 
-    def parse_expression(self):
-        if self.current >= len(self.tokens):
-            raise self.syntax_error("Unexpected end of input while parsing expression")
+    def parse_switch(self):
+        """WTF? with its OMG cases and optional OMGWTF default. The node's
+        value maps every case literal to the index of its case, so engines
+        find where to start without comparing IT with each literal."""
+        line = self.token().line
+        self.consume('SWITCH_START')
+        cases = []
+        table = {}
+
+        while self.token() is not None and self.token().type == 'CASE':
+            case_line = self.token().line
+            self.current += 1
+            literal = self.token()
+            if literal is None or literal.type not in LITERAL_TOKENS:
+                raise self.syntax_error("Expected a literal after 'OMG'")
+            # Keys compare like BOTH SAEM, so 1, 1.0 and WIN are one case
+            if literal.value in table:
+                raise self.syntax_error(f"Duplicate OMG literal {literal.value!r} in 'WTF?'")
+            self.current += 1
+            table[literal.value] = len(cases)
+            cases.append(self.parse_case(ASTNode('CASE', value=literal.value, line=case_line)))
 
-        token = self.tokens[self.current]
+        if not cases:
+            raise self.syntax_error("Expected 'OMG' after 'WTF?'")
 
-        if token.type in ['INT_LITERAL', 'FLOAT_LITERAL', 'STRING_LITERAL', 'BOOL_LITERAL']:
+        if self.token() is not None and self.token().type == 'DEFAULT_CASE':
+            default_line = self.token().line
             self.current += 1
-            return ASTNode('LITERAL', [], token.value)
+            cases.append(self.parse_case(ASTNode('DEFAULT_CASE', line=default_line)))
 
-        elif token.type == 'IDENTIFIER':
-            var_name = token.value
-            self.current += 1
-            return ASTNode('VARIABLE', [], var_name)
+        if self.token() is None or self.token().type != 'IF_END':
+            raise self.syntax_error("Expected 'OIC' to end 'WTF?'")
+        self.consume('IF_END')
+        return ASTNode('SWITCH', tuple(cases), table, line)
 
-        elif token.type in [
-            'OP_ADD', 'OP_SUB', 'OP_MUL', 'OP_DIV', 'OP_MOD', 'OP_MAX', 'OP_MIN',
-            'OP_EQUAL', 'OP_NOT_EQUAL', 'OP_AND', 'OP_OR', 'OP_XOR']:
-            op_type = token.type
-            self.current += 1
-            left = self.parse_expression()
-            self.consume('CONNECTOR')
-            right = self.parse_expression()
-            return ASTNode(op_type, [left, right])
+    def parse_case(self, case):
+        while self.token() is not None and self.token().type not in ('CASE', 'DEFAULT_CASE', 'IF_END'):
+            statement = self.parse_statement()
+            if statement:
+                case.children.append(statement)
+        return case
 
-        elif token.type == 'OP_NOT':
+    def parse_loop(self):
+        line = self.token().line
+        self.consume('LOOP_START')
+
+        if self.token() is None or self.token().type != 'IDENTIFIER':
+            raise self.syntax_error("Expected loop label after 'IM IN YR'")
+
+        label = self.token().value
+        self.current += 1
+        parts = []
+
+        if self.token() is not None and self.token().type in LOOP_UPDATES:
+            update_type = self.token().type
+            self.current += 1
+            self.consume('YR')
+            if self.token() is None or self.token().type != 'IDENTIFIER':
+                raise self.syntax_error("Expected loop variable after 'YR'")
+            parts.append(ASTNode(update_type, NO_CHILDREN, self.token().value, self.token().line))
             self.current += 1
-            operand = self.parse_expression()
-            return ASTNode('OP_NOT', [operand])
 
-        elif token.type == 'OP_SMOOSH':
+        if self.token() is not None and self.token().type in LOOP_CONDITIONS:
+            condition_token = self.token()
             self.current += 1
-            args = [self.parse_expression()]
-            while self.current < len(self.tokens) and self.tokens[self.current].type == 'CONNECTOR':
-                self.consume('CONNECTOR')
-                args.append(self.parse_expression())
-            return ASTNode('OP_SMOOSH', args)
+            condition = self.parse_expression()
+            parts.append(ASTNode(condition_token.type, (condition,), None, condition_token.line))
+
+        body = ASTNode('LOOP_BODY', line=line)
+        while self.token() is not None and self.token().type != 'LOOP_END':
+            statement = self.parse_statement()
+            if statement:
+                body.children.append(statement)
+        parts.append(body)
+
+        if self.token() is None:
+            raise self.syntax_error(f"Expected 'IM OUTTA YR {label}' to end loop")
+        self.consume('LOOP_END')
+
+        if self.token() is None or self.token().type != 'IDENTIFIER' or self.token().value != label:
+            raise self.syntax_error(f"Expected 'IM OUTTA YR {label}' to end loop")
+        self.current += 1
+        return ASTNode('LOOP', tuple(parts), label, line)
+
+    def parse_function(self):
+        line = self.token().line
+        self.consume('FUNCTION_START')
+
+        if self.token() is None or self.token().type != 'IDENTIFIER':
+            raise self.syntax_error("Expected function name after 'HOW IZ I'")
+
+        name = self.token().value
+        self.current += 1
+        parts = []
+
+        if self.token() is not None and self.token().type == 'YR':
+            while True:
+                self.consume('YR')
+                if self.token() is None or self.token().type != 'IDENTIFIER':
+                    raise self.syntax_error("Expected parameter name after 'YR'")
+                parts.append(ASTNode('PARAMETER', NO_CHILDREN, self.token().value, self.token().line))
+                self.current += 1
+                if not self.at_next_argument():
+                    break
+                self.current += 1
+
+        body = ASTNode('FUNCTION_BODY', line=line)
+        while self.token() is not None and self.token().type != 'FUNCTION_END':
+            statement = self.parse_statement()
+            if statement:
+                body.children.append(statement)
+        parts.append(body)
+
+        if self.token() is None:
+            raise self.syntax_error(f"Expected 'IF U SAY SO' to end function '{name}'")
+        self.consume('FUNCTION_END')
+        return ASTNode('FUNCTION', tuple(parts), name, line)
+
+    def at_next_argument(self):
+        """Whether the next tokens are AN YR, which go before every argument
+        or parameter after the first."""
+        token = self.token()
+        if token is None or token.type != 'CONNECTOR':
+            return False
+        next_token = self.peek()
+        return next_token is not None and next_token.type == 'YR'
 
-        raise self.syntax_error(f"Unexpected token in expression: {token.type}")
+    def parse_expression(self):
+        # Operators still waiting for operands, innermost last, as (node
+        # type, node value, line, arity, operands parsed so far). Keeping them
+        # on an explicit stack lets expressions nest to any depth.
+        pending = []
+        max_depth = 0
+        while True:
+            token = self.token()
+            if token is None:
+                raise self.syntax_error("Unexpected end of input while parsing expression")
+
+            token_type = token.type
+            if token_type == 'IDENTIFIER':
+                self.current += 1
+                node = ASTNode('VARIABLE', NO_CHILDREN, token.value, token.line)
+
+            elif token_type in LITERAL_TOKENS:
+                self.current += 1
+                node = ASTNode('LITERAL', NO_CHILDREN, token.value, token.line)
+
+            elif token_type == 'NEW_BUKKIT':
+                self.current += 1
+                node = ASTNode('NEW_BUKKIT', NO_CHILDREN, None, token.line)
+
+            elif token_type in OPERATOR_ARITY:
+                self.current += 1
+                node_type = token_type
+                if token_type in EACH_OPERATORS and self.token() is not None and self.token().type == 'EACH':
+                    self.current += 1
+                    node_type = EACH_OPERATORS[token_type]
+                pending.append((node_type, None, token.line, OPERATOR_ARITY[token_type], []))
+                if len(pending) > max_depth:
+                    max_depth = len(pending)
+                continue
+
+            elif token_type == 'CALL_START':
+                self.current += 1
+                name_token = self.token()
+                if name_token is None or name_token.type != 'IDENTIFIER':
+                    raise self.syntax_error("Expected function name after 'I IZ'")
+                self.current += 1
+                if self.token() is not None and self.token().type == 'YR':
+                    # The call waits for its arguments like an operator
+                    self.current += 1
+                    pending.append(('CALL', name_token.value, name_token.line, CALL_ARGUMENTS, []))
+                    if len(pending) > max_depth:
+                        max_depth = len(pending)
+                    continue
+                self.consume_call_end(name_token.value)
+                node = ASTNode('CALL', NO_CHILDREN, name_token.value, name_token.line)
+
+            else:
+                raise self.syntax_error(f"Unexpected token in expression: {token_type}")
+
+            # A complete operand: hand it to the waiting operators, closing
+            # every one that now has all of its operands
+            while pending:
+                node_type, value, line, arity, operands = pending[-1]
+                operands.append(node)
+                if arity is None:
+                    # SMOOSH takes operands for as long as AN follows, except
+                    # AN YR, which starts the next argument of a call, and
+                    # ends at an optional MKAY
+                    next_token = self.token()
+                    if next_token is not None and next_token.type == 'CONNECTOR' and not self.at_next_argument():
+                        self.current += 1
+                        break
+                    if next_token is not None and next_token.type == 'EXPRESSION_END':
+                        self.current += 1
+                elif arity == CALL_ARGUMENTS:
+                    if self.at_next_argument():
+                        self.current += 2
+                        break
+                    self.consume_call_end(value)
+                elif len(operands) < arity:
+                    self.consume('CONNECTOR')
+                    break
+                pending.pop()
+                node = ASTNode(node_type, tuple(operands), value, line)
+            else:
+                # Later passes walk expressions this deep with explicit
+                # stacks instead of recursion
+                if max_depth > MAX_RECURSION_DEPTH:
+                    node.deep = True
+                return node
+
+    def consume_call_end(self, name):
+        token = self.token()
+        if token is None or token.type != 'EXPRESSION_END':
+            raise self.syntax_error(f"Expected 'MKAY' to end call to '{name}'")
+        self.current += 1
 
     def consume(self, expected_type):
-        if self.current >= len(self.tokens):
+        token = self.token()
+        if token is None:
             raise self.syntax_error(f"Unexpected end of input, expected {expected_type}")
 
-        if self.tokens[self.current].type != expected_type:
-            raise self.syntax_error(f"Expected {expected_type}, got {self.tokens[self.current].type}")
+        if token.type != expected_type:
+            raise self.syntax_error(f"Expected {expected_type}, got {token.type}")
 
         self.current += 1
 
+    def token(self, offset=0):
+        index = self.current + offset
+        while index >= len(self.tokens) and self.token_source is not None:
+            next_token = next(self.token_source, None)
+            if next_token is None:
+                self.token_source = None
+            else:
+                self.tokens.append(next_token)
+        if index < len(self.tokens):
+            return self.tokens[index]
+        return None
+
     def peek(self):
-        if self.current + 1 >= len(self.tokens):
-            return None
-        return self.tokens[self.current + 1]
+        return self.token(1)
 
     def syntax_error(self, message):
-        token = self.tokens[self.current] if self.current < len(self.tokens) else None
+        token = self.token()
         if token:
-            return SyntaxError(f"Syntax Error (line {token.line}): {message}")
+            error = SyntaxError(f"Syntax Error (line {token.line}): {message}")
+            error.lineno = token.line
+            return error
         return SyntaxError(message)
@@ -0,0 +1,197 @@
+"""
+LOLCODE Profiler Module
+Counts and times every AST node the tree-walking interpreter executes
+"""
+
+import time
+
+import runtime
+from interpreter import Interpreter
+from runtime import BINARY_OPERATORS
+
+# Rows shown per table in the text report
+REPORT_LIMIT = 20
+
+
+class NodeProfile:
+    """Execution counts and times gathered by a ProfilingInterpreter.
+
+    node_types maps a node type to [count, total seconds, self seconds] and
+    lines maps a source line to [statements run, self seconds of every node
+    on it]. Call stacks are kept as a tree of frames, numbered from 0 for
+    the PROGRAM root, so entering a node costs the same at any depth."""
+
+    def __init__(self):
+        self.node_types = {}
+        self.lines = {}
+        # (parent frame, node type, line) -> frame, and for every frame its
+        # parent, name and self seconds
+        self.frame_ids = {}
+        self.frame_parents = [None]
+        self.frame_names = ['PROGRAM']
+        self.frame_times = [0.0]
+
+    def frame(self, parent, node):
+        key = (parent, node.type, node.line)
+        frame = self.frame_ids.get(key)
+        if frame is None:
+            frame = self.frame_ids[key] = len(self.frame_names)
+            self.frame_parents.append(parent)
+            self.frame_names.append(f"{node.type}:{node.line}")
+            self.frame_times.append(0.0)
+        return frame
+
+    @property
+    def stacks(self):
+        """Self seconds of every collapsed stack, 'PROGRAM;TYPE:line;...'."""
+        paths = ['PROGRAM']
+        stacks = {}
+        # Parents are always numbered before their children
+        for frame in range(1, len(self.frame_names)):
+            paths.append(paths[self.frame_parents[frame]] + ';' + self.frame_names[frame])
+            stacks[paths[frame]] = self.frame_times[frame]
+        return stacks
+
+    def add(self, node, frame, is_statement, total, self_time):
+        entry = self.node_types.get(node.type)
+        if entry is None:
+            entry = self.node_types[node.type] = [0, 0.0, 0.0]
+        entry[0] += 1
+        entry[1] += total
+        entry[2] += self_time
+
+        line = self.lines.get(node.line)
+        if line is None:
+            line = self.lines[node.line] = [0, 0.0]
+        line[0] += is_statement
+        line[1] += self_time
+
+        self.frame_times[frame] += self_time
+
+    def format_report(self, limit=REPORT_LIMIT):
+        """Node type and source line tables, slowest first by self time."""
+        rows = [f"{'Node type':<16} {'count':>10} {'total ms':>10} {'self ms':>10}"]
+        by_self_time = sorted(self.node_types.items(), key=lambda item: item[1][2], reverse=True)
+        for node_type, (count, total, self_time) in by_self_time[:limit]:
+            rows.append(f"{node_type:<16} {count:>10} {total * 1000:>10.3f} {self_time * 1000:>10.3f}")
+
+        rows.append("")
+        rows.append(f"{'Line':<16} {'count':>10} {'self ms':>10}")
+        by_self_time = sorted(self.lines.items(), key=lambda item: item[1][1], reverse=True)
+        for line, (count, self_time) in by_self_time[:limit]:
+            rows.append(f"{str(line):<16} {count:>10} {self_time * 1000:>10.3f}")
+        return '\n'.join(rows)
+
+    def write_collapsed(self, file):
+        """Write the stacks in the collapsed-stack format read by speedscope
+        and flamegraph.pl: 'frame;frame;frame weight', weights in microseconds."""
+        for stack, self_time in sorted(self.stacks.items()):
+            weight = round(self_time * 1_000_000)
+            if weight:
+                file.write(f"{stack} {weight}\n")
+
+
+class ProfilingInterpreter(Interpreter):
+    """Interpreter that records every statement and expression node it runs.
+
+    Instrumentation lives only in this subclass, so the plain Interpreter
+    pays nothing when profiling is off. Times include the profiler's own
+    bookkeeping for nested nodes, so treat them as relative costs."""
+
+    def __init__(self, ast, stdout=None, stdin=None, memo_size=None):
+        super().__init__(ast, stdout, stdin, memo_size)
+        self.profile = NodeProfile()
+        self.frames = [0]
+        # Time spent in the children of each node being run, and when each
+        # node started
+        self.child_times = [0.0]
+        self.starts = []
+
+    def enter(self, node):
+        self.frames.append(self.profile.frame(self.frames[-1], node))
+        self.child_times.append(0.0)
+        self.starts.append(time.perf_counter())
+
+    def leave(self, node, is_statement):
+        total = time.perf_counter() - self.starts.pop()
+        children = self.child_times.pop()
+        self.child_times[-1] += total
+        self.profile.add(node, self.frames[-1], is_statement, total, total - children)
+        self.frames.pop()
+
+    # Every evaluation of a loop condition is recorded
+    count_loops = False
+
+    def resolve_body(self, body):
+        return [(self.execute_statement, statement) for statement in body.children]
+
+    def execute_statement(self, node):
+        if not node:
+            return
+        self.enter(node)
+        try:
+            Interpreter.execute_statement(self, node)
+        finally:
+            self.leave(node, True)
+
+    def evaluate_expression(self, node):
+        """Evaluate node by node on an explicit stack, timing each one."""
+        if not node:
+            return None
+        depth = len(self.frames)
+        values = []
+        stack = [(node, False)]
+        try:
+            while stack:
+                expr, operands_done = stack.pop()
+                if not operands_done:
+                    self.enter(expr)
+                    stack.append((expr, True))
+                    stack.extend((child, False) for child in reversed(expr.children))
+                    continue
+                count = len(expr.children)
+                operands = values[len(values) - count:]
+                del values[len(values) - count:]
+                values.append(self.apply(expr, operands))
+                self.leave(expr, False)
+        except Exception:
+            # Drop the frames of the nodes the error interrupted
+            del self.frames[depth:]
+            del self.child_times[depth:]
+            del self.starts[depth - 1:]
+            raise
+        return values[-1]
+
+    def apply(self, node, operands):
+        """The value of one expression node given its operands' values."""
+        if node.type == 'LITERAL':
+            return node.value
+        if node.type == 'VARIABLE':
+            return self.slots[node.slot]
+        if node.type in BINARY_OPERATORS:
+            result = self.operator_tables[node.operand_type][node.type](*operands)
+        elif node.type == 'FOLDED':
+            result = node.value
+        elif node.type == 'OP_NOT':
+            result = runtime.negate(operands[0])
+        elif node.type == 'OP_SMOOSH':
+            result = self.smoosh(operands)
+        elif node.type == 'CALL':
+            # The body's statements are recorded below this node
+            return self.call_function(node, operands)
+        elif node.type in self.bukkit_operations:
+            result = self.bukkit_operations[node.type][0](*operands)
+        else:
+            result = None
+        if node.stores_it:
+            self.slots[0] = result
+        return result
+
+
+def format_phases(timings, cpu_timings):
+    """Wall-clock and CPU time of each phase as a text table."""
+    rows = [f"{'Phase':<16} {'wall ms':>10} {'cpu ms':>10}"]
+    for phase, elapsed in timings.items():
+        rows.append(f"{phase:<16} {elapsed * 1000:>10.3f} {cpu_timings.get(phase, 0.0) * 1000:>10.3f}")
+    rows.append(f"{'total':<16} {sum(timings.values()) * 1000:>10.3f} {sum(cpu_timings.values()) * 1000:>10.3f}")
+    return '\n'.join(rows)
@@ -0,0 +1,380 @@
+"""
+LOLCODE Runtime Module
+Value semantics shared by every execution engine
+"""
+
+import functools
+import re
+
+from yarn import MIN_ROPE_LENGTH, Yarn, concat
+
+
+def is_truthy(value):
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    if type(value) is Yarn:
+        value = str(value)
+    if isinstance(value, str):
+        if value.strip() == '' or value.upper() == 'FAIL':
+            return False
+        try:
+            if float(value) == 0:
+                return False
+        except ValueError:
+            pass
+        return True
+    return True
+
+
+def to_string(value):
+    if value is None:
+        return "NOOB"
+    if isinstance(value, bool):
+        return "WIN" if value else "FAIL"
+    return str(value)
+
+
+def to_number(value):
+    """Coerce an arithmetic operand to an int or a float.
+
+    Raises ValueError or TypeError for operands with no numeric reading."""
+    value_type = type(value)
+    if value_type is int or value_type is float:
+        return value
+    if value_type is bool:
+        return int(value)
+    if value_type is str:
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+    if value_type is Yarn:
+        # A long concatenation is joined only if it may spell a number
+        if not value.could_be_number():
+            raise ValueError("Not a number")
+        return to_number(str(value))
+    return float(value)
+
+
+def normalize(result):
+    if type(result) is float and result.is_integer():
+        return int(result)
+    return result
+
+
+def add(left, right):
+    try:
+        left_val = to_number(left)
+        right_val = to_number(right)
+    except (ValueError, TypeError):
+        return concat(left if type(left) is Yarn else str(left), str(right))
+    return normalize(left_val + right_val)
+
+
+def sub(left, right):
+    try:
+        left_val = to_number(left)
+        right_val = to_number(right)
+    except (ValueError, TypeError):
+        raise TypeError("Cannot subtract non-numeric values")
+    return normalize(left_val - right_val)
+
+
+def mul(left, right):
+    try:
+        left_val = to_number(left)
+        right_val = to_number(right)
+    except (ValueError, TypeError):
+        raise TypeError("Cannot multiply non-numeric values")
+    return normalize(left_val * right_val)
+
+
+def div(left, right):
+    try:
+        right_val = to_number(right)
+        if right_val == 0:
+            raise ZeroDivisionError("Division by zero")
+        left_val = to_number(left)
+    except (ValueError, TypeError):
+        raise TypeError("Cannot divide non-numeric values")
+    return div_number(left_val, right_val)
+
+
+def div_number(left, right):
+    # Exact integer quotients stay exact instead of going through a float
+    if type(left) is int and type(right) is int and left % right == 0:
+        return left // right
+    return normalize(left / right)
+
+
+def mod(left, right):
+    try:
+        left_val = int(to_number(left))
+        right_val = int(to_number(right))
+    except (ValueError, TypeError):
+        raise TypeError("Cannot perform modulo on non-numeric values")
+    if right_val == 0:
+        raise ZeroDivisionError("Modulo by zero")
+    return left_val % right_val
+
+
+def biggr(left, right):
+    try:
+        left_val = to_number(left)
+        right_val = to_number(right)
+    except (ValueError, TypeError):
+        raise TypeError("Cannot compare non-numeric values")
+    return normalize(max(left_val, right_val))
+
+
+def smallr(left, right):
+    try:
+        left_val = to_number(left)
+        right_val = to_number(right)
+    except (ValueError, TypeError):
+        raise TypeError("Cannot compare non-numeric values")
+    return normalize(min(left_val, right_val))
+
+
+# Specialized evaluators for operands the SemanticAnalyzer inferred as NUMBR.
+# Inference is flow-insensitive (e.g. GIMMEH results), so each one checks the
+# exact operand types and defers to the generic coercion path on a mismatch.
+
+def add_int(left, right):
+    if type(left) is int and type(right) is int:
+        return left + right
+    return add(left, right)
+
+
+def sub_int(left, right):
+    if type(left) is int and type(right) is int:
+        return left - right
+    return sub(left, right)
+
+
+def mul_int(left, right):
+    if type(left) is int and type(right) is int:
+        return left * right
+    return mul(left, right)
+
+
+def div_int(left, right):
+    if type(left) is int and type(right) is int and right != 0:
+        return div_number(left, right)
+    return div(left, right)
+
+
+def mod_int(left, right):
+    if type(left) is int and type(right) is int and right != 0:
+        return left % right
+    return mod(left, right)
+
+
+def biggr_int(left, right):
+    if type(left) is int and type(right) is int:
+        return left if left >= right else right
+    return biggr(left, right)
+
+
+def smallr_int(left, right):
+    if type(left) is int and type(right) is int:
+        return left if left <= right else right
+    return smallr(left, right)
+
+
+# Specialized evaluators for NUMBAR operands (a float mixed with a float or int)
+
+NUMBER_TYPES = (int, float)
+
+
+def add_float(left, right):
+    if type(left) in NUMBER_TYPES and type(right) in NUMBER_TYPES:
+        return normalize(left + right)
+    return add(left, right)
+
+
+def sub_float(left, right):
+    if type(left) in NUMBER_TYPES and type(right) in NUMBER_TYPES:
+        return normalize(left - right)
+    return sub(left, right)
+
+
+def mul_float(left, right):
+    if type(left) in NUMBER_TYPES and type(right) in NUMBER_TYPES:
+        return normalize(left * right)
+    return mul(left, right)
+
+
+def div_float(left, right):
+    if type(left) in NUMBER_TYPES and type(right) in NUMBER_TYPES and right != 0:
+        return div_number(left, right)
+    return div(left, right)
+
+
+def biggr_float(left, right):
+    if type(left) in NUMBER_TYPES and type(right) in NUMBER_TYPES:
+        return normalize(max(left, right))
+    return biggr(left, right)
+
+
+def smallr_float(left, right):
+    if type(left) in NUMBER_TYPES and type(right) in NUMBER_TYPES:
+        return normalize(min(left, right))
+    return smallr(left, right)
+
+
+def equal(left, right):
+    return left == right
+
+
+def not_equal(left, right):
+    return left != right
+
+
+def both(left, right):
+    return is_truthy(left) and is_truthy(right)
+
+
+def either(left, right):
+    return is_truthy(left) or is_truthy(right)
+
+
+def won(left, right):
+    return is_truthy(left) != is_truthy(right)
+
+
+def negate(operand):
+    return not is_truthy(operand)
+
+
+def smoosh(parts):
+    """Concatenate parts. A long result is a Yarn, and SMOOSH of a Yarn and
+    more parts extends it instead of copying it, so building a YARN up with
+    out R SMOOSH out AN ... stays linear in its length."""
+    if parts and type(parts[0]) is Yarn:
+        return parts[0].extend(''.join(map(to_string, parts[1:])))
+    text = ''.join(map(to_string, parts))
+    return text if len(text) < MIN_ROPE_LENGTH else Yarn.of(text)
+
+
+def switch_entry(table, value, default):
+    """Where WTF? starts for IT holding value: the entry table maps for the
+    OMG literal equal to value, or default when no literal is. Dict lookup
+    compares keys with ==, exactly like BOTH SAEM."""
+    try:
+        return table.get(value, default)
+    except TypeError:
+        # An unhashable value such as a BUKKIT equals no literal
+        return default
+
+
+# Loop variable updates. A variable declared without a value counts from 0.
+
+def uppin(value):
+    if type(value) is int:
+        return value + 1
+    return add(0 if value is None else value, 1)
+
+
+def nerfin(value):
+    if type(value) is int:
+        return value - 1
+    return sub(0 if value is None else value, 1)
+
+
+LOOP_STEPS = {
+    'LOOP_UPPIN': uppin,
+    'LOOP_NERFIN': nerfin,
+}
+
+
+# Entries kept per pure function by --memoize when no size is given
+DEFAULT_MEMO_SIZE = 1024
+
+
+# Argument types a memoized call is keyed on; every one is immutable
+MEMO_KEY_TYPES = frozenset((int, float, str, Yarn, bool, type(None)))
+
+
+# How many LOLCODE function calls may run at once. Every engine counts its
+# calls and raises RecursionError for one more, so all of them stop at the
+# same depth
+MAX_CALL_DEPTH = 1000
+
+
+def memoize(function, max_entries):
+    """Cache the results of a call to a pure function, keeping the
+    max_entries most recently used. Arguments are keyed with their types, so
+    1, 1.0, "1" and WIN are separate entries. A call passing a BUKKIT, which
+    can change between calls, always runs."""
+    cached = functools.lru_cache(maxsize=max_entries, typed=True)(function)
+
+    @functools.wraps(function)
+    def call(*arguments):
+        if MEMO_KEY_TYPES.issuperset(map(type, arguments)):
+            return cached(*arguments)
+        return function(*arguments)
+
+    return call
+
+
+# GIMMEH answers that read as a NUMBR or a NUMBAR. Matching these up front
+# avoids raising and catching a ValueError for every non-numeric answer.
+NUMBR_INPUT = re.compile(r"\s*[+-]?[0-9]+\s*")
+NUMBAR_INPUT = re.compile(r"\s*[+-]?(?:[0-9]+\.?[0-9]*|\.[0-9]+)(?:[eE][+-]?[0-9]+)?\s*")
+
+
+def parse_input(user_input):
+    if NUMBR_INPUT.fullmatch(user_input):
+        return int(user_input)
+    if NUMBAR_INPUT.fullmatch(user_input):
+        return float(user_input)
+    return user_input
+
+
+# Binary operator node types mapped to their implementation
+BINARY_OPERATORS = {
+    'OP_ADD': add,
+    'OP_SUB': sub,
+    'OP_MUL': mul,
+    'OP_DIV': div,
+    'OP_MOD': mod,
+    'OP_MAX': biggr,
+    'OP_MIN': smallr,
+    'OP_EQUAL': equal,
+    'OP_NOT_EQUAL': not_equal,
+    'OP_AND': both,
+    'OP_OR': either,
+    'OP_XOR': won,
+}
+
+INT_OPERATORS = dict(BINARY_OPERATORS, **{
+    'OP_ADD': add_int,
+    'OP_SUB': sub_int,
+    'OP_MUL': mul_int,
+    'OP_DIV': div_int,
+    'OP_MOD': mod_int,
+    'OP_MAX': biggr_int,
+    'OP_MIN': smallr_int,
+})
+
+FLOAT_OPERATORS = dict(BINARY_OPERATORS, **{
+    'OP_ADD': add_float,
+    'OP_SUB': sub_float,
+    'OP_MUL': mul_float,
+    'OP_DIV': div_float,
+    'OP_MAX': biggr_float,
+    'OP_MIN': smallr_float,
+})
+
+# Operator tables keyed by the operand type the SemanticAnalyzer inferred.
+# Anything other than NUMBR or NUMBAR operands takes the generic path.
+OPERATOR_TABLES = {
+    None: BINARY_OPERATORS,
+    'NUMBR': INT_OPERATORS,
+    'NUMBAR': FLOAT_OPERATORS,
+}
@@ -3,12 +3,27 @@ LOLCODE Semantic Analyzer Module
 Performs semantic analysis on the AST
 """
 
+from bukkit import BUKKIT_OPERATIONS, EACH_OPERATORS
+from parser import ASTNode, NO_CHILDREN, function_parts, loop_parts, postorder
+
+
 class SemanticAnalyzer:
     def __init__(self, ast):
         self.ast = ast
         self.symbol_table = {}
+        self.slot_names = []
         self.errors = []
         self.it_value = None
+        # Loops and WTF? blocks enclosing the node being analyzed, for GTFO
+        self.loop_depth = 0
+        self.switch_depth = 0
+        # Blocks of any kind enclosing it, since HOW IZ I is top level only
+        self.block_depth = 0
+        # Every function defined so far by name, the one being analyzed and
+        # whether its body has shown a side effect yet
+        self.functions = {}
+        self.function = None
+        self.side_effects = False
 
     def analyze(self):
         if not self.ast or self.ast.type != 'PROGRAM':
@@ -17,13 +32,23 @@ class SemanticAnalyzer:
         self.initialize_scope()
         self.analyze_node(self.ast)
         if self.errors:
-            for error in self.errors:
-                print(f"Semantic Error: {error}")
+            # Callers report self.errors; see lolcode.build_ast
             return None
+        # The interpreter preallocates one storage slot per name in this list
+        self.ast.value = tuple(self.slot_names)
         return self.ast
 
     def initialize_scope(self):
-        self.symbol_table = {'IT': {'type': 'NOOB', 'declared': True}}
+        self.symbol_table = {'IT': {'type': 'NOOB', 'declared': True, 'slot': 0}}
+        self.slot_names = ['IT']
+
+    def slot_for(self, name):
+        # Variables of one name share a slot, so a loop variable left over
+        # from an earlier loop is the one every engine reports at the end
+        if name in self.slot_names:
+            return self.slot_names.index(name)
+        self.slot_names.append(name)
+        return len(self.slot_names) - 1
 
     def analyze_node(self, node):
         if not node:
@@ -39,16 +64,29 @@ class SemanticAnalyzer:
             self.analyze_output(node)
         elif node.type == 'INPUT':
             self.analyze_input(node)
+        elif node.type == 'APPEND':
+            self.analyze_append(node)
+        elif node.type == 'ITEM_ASSIGNMENT':
+            self.analyze_item_assignment(node)
         elif node.type == 'CONDITIONAL':
             self.analyze_conditional(node)
-        elif node.type in ['LITERAL', 'VARIABLE']:
+        elif node.type == 'LOOP':
+            self.analyze_loop(node)
+        elif node.type == 'SWITCH':
+            self.analyze_switch(node)
+        elif node.type == 'BREAK':
+            if not self.loop_depth and not self.switch_depth and self.function is None:
+                self.errors.append("GTFO outside of a loop or WTF?")
+        elif node.type == 'FUNCTION':
+            self.analyze_function(node)
+        elif node.type == 'RETURN':
+            if self.function is None:
+                self.errors.append("FOUND YR outside of a function")
+            self.analyze_expression(node.children[0])
+        elif node.type in ['LITERAL', 'VARIABLE', 'OP_ADD', 'OP_SUB', 'OP_MUL', 'OP_DIV', 'OP_MOD',
+                           'OP_MAX', 'OP_MIN', 'OP_EQUAL', 'OP_NOT_EQUAL', 'OP_AND', 'OP_OR',
+                           'OP_XOR', 'OP_NOT', 'OP_SMOOSH']:
             return self.analyze_expression(node)
-        elif node.type in ['OP_ADD', 'OP_SUB', 'OP_MUL', 'OP_DIV', 'OP_MOD', 'OP_MAX', 'OP_MIN']:
-            return self.analyze_arithmetic_operation(node)
-        elif node.type in ['OP_EQUAL', 'OP_NOT_EQUAL']:
-            return self.analyze_comparison_operation(node)
-        elif node.type in ['OP_AND', 'OP_OR', 'OP_XOR', 'OP_NOT']:
-            return self.analyze_logical_operation(node)
         elif node.type in ['TRUE_BRANCH', 'FALSE_BRANCH']:
             for child in node.children:
                 self.analyze_node(child)
@@ -58,7 +96,8 @@ class SemanticAnalyzer:
         if var_name in self.symbol_table:
             self.errors.append(f"Variable '{var_name}' already declared")
             return
-        self.symbol_table[var_name] = {'type': 'NOOB', 'declared': True}
+        self.symbol_table[var_name] = {'type': 'NOOB', 'declared': True, 'slot': self.slot_for(var_name)}
+        node.slot = self.symbol_table[var_name]['slot']
         if node.children:
             expr_type = self.analyze_expression(node.children[0])
             self.symbol_table[var_name]['type'] = expr_type
@@ -68,12 +107,14 @@ class SemanticAnalyzer:
         if var_name not in self.symbol_table:
             self.errors.append(f"Variable '{var_name}' not declared")
             return
+        node.slot = self.symbol_table[var_name]['slot']
         expr_type = self.analyze_expression(node.children[0])
         self.symbol_table[var_name]['type'] = expr_type
         # Set IT variable type
         self.symbol_table['IT']['type'] = expr_type
 
     def analyze_output(self, node):
+        self.side_effects = True
         if node.children:
             self.analyze_expression(node.children[0])
 
@@ -82,19 +123,123 @@ class SemanticAnalyzer:
         if var_name not in self.symbol_table:
             self.errors.append(f"Variable '{var_name}' not declared")
             return
-        
+        node.slot = self.symbol_table[var_name]['slot']
+        self.side_effects = True
         self.symbol_table[var_name]['type'] = 'YARN'
         
         self.symbol_table['IT']['type'] = 'YARN'
 
+    def analyze_append(self, node):
+        var_name = node.value
+        if var_name not in self.symbol_table:
+            self.errors.append(f"Variable '{var_name}' not declared")
+            return
+        node.slot = self.symbol_table[var_name]['slot']
+        self.side_effects = True
+        self.analyze_expression(node.children[0])
+
+    def analyze_item_assignment(self, node):
+        self.side_effects = True
+        for child in node.children:
+            self.analyze_expression(child)
+
     def analyze_conditional(self, node):
         
         if 'IT' not in self.symbol_table:
             self.errors.append("IT variable not set before conditional")
+        self.block_depth += 1
         for child in node.children:
             self.analyze_node(child)
+        self.block_depth -= 1
+
+    def analyze_switch(self, node):
+        # The cases run with the IT the preceding expression left
+        self.switch_depth += 1
+        self.block_depth += 1
+        for case in node.children:
+            for child in case.children:
+                self.analyze_node(child)
+        self.block_depth -= 1
+        self.switch_depth -= 1
+
+    def analyze_loop(self, node):
+        update, condition, body = loop_parts(node)
+        loop_variable = None
+        if update is not None:
+            var_name = update.value
+            if var_name not in self.symbol_table:
+                # An undeclared loop variable is local to the loop and counts
+                # from 0; the update clause holds its initial value
+                loop_variable = var_name
+                self.symbol_table[var_name] = {'type': 'NUMBR', 'declared': True, 'slot': self.slot_for(var_name)}
+                update.children = (ASTNode('LITERAL', NO_CHILDREN, 0, update.line),)
+            elif self.symbol_table[var_name]['type'] != 'NUMBAR':
+                self.symbol_table[var_name]['type'] = 'NUMBR'
+            update.slot = self.symbol_table[var_name]['slot']
+        if condition is not None:
+            self.analyze_expression(condition.children[0])
+        self.loop_depth += 1
+        self.block_depth += 1
+        for child in body.children:
+            self.analyze_node(child)
+        self.block_depth -= 1
+        self.loop_depth -= 1
+        if loop_variable is not None:
+            del self.symbol_table[loop_variable]
+
+    def analyze_function(self, node):
+        name = node.value
+        if self.block_depth:
+            self.errors.append(f"Function '{name}' must be defined at the top level")
+            return
+        if name in self.functions:
+            self.errors.append(f"Function '{name}' already defined")
+            return
+        node.slot = len(self.functions)
+        # Registered before its body is analyzed, so it can call itself
+        self.functions[name] = node
+
+        # Every call runs in a frame of its own: slot 0 is the function's own
+        # IT, then come its parameters and its locals. The caller's variables
+        # are out of scope.
+        outer_scope = (self.symbol_table, self.slot_names)
+        self.initialize_scope()
+        self.function = node
+        self.side_effects = False
+        self.block_depth += 1
+
+        parameters, body = function_parts(node)
+        for parameter in parameters:
+            if parameter.value in self.symbol_table:
+                self.errors.append(f"Parameter '{parameter.value}' repeated in function '{name}'")
+                continue
+            # Arguments are typed only at run time
+            parameter.slot = len(self.slot_names)
+            self.symbol_table[parameter.value] = {'type': None, 'declared': True, 'slot': parameter.slot}
+            self.slot_names.append(parameter.value)
+        for child in body.children:
+            self.analyze_node(child)
+        body.value = tuple(self.slot_names)
+        # Without VISIBLE or GIMMEH, and calling only pure functions, a call
+        # is a function of its arguments alone and its result can be reused
+        node.static_type = None if self.side_effects else 'PURE'
+
+        self.block_depth -= 1
+        self.function = None
+        self.symbol_table, self.slot_names = outer_scope
 
     def analyze_expression(self, node):
+        # Operands are typed before their operator
+        if node.deep:
+            for expr in postorder(node):
+                expr.static_type = self.infer_expression_type(expr)
+            return node.static_type
+        for child in node.children:
+            self.analyze_expression(child)
+        node.static_type = self.infer_expression_type(node)
+        return node.static_type
+
+    def infer_expression_type(self, node):
         if node.type == 'LITERAL':
             if isinstance(node.value, int):
                 return 'NUMBR'
@@ -120,6 +265,7 @@ class SemanticAnalyzer:
             if var_name not in self.symbol_table:
                 self.errors.append(f"Variable '{var_name}' not declared")
                 return 'NOOB'
+            node.slot = self.symbol_table[var_name]['slot']
             return self.symbol_table[var_name]['type']
         elif node.type in ['OP_ADD', 'OP_SUB', 'OP_MUL', 'OP_DIV', 'OP_MOD', 'OP_MAX', 'OP_MIN']:
             return self.analyze_arithmetic_operation(node)
@@ -127,6 +273,12 @@ class SemanticAnalyzer:
             return self.analyze_comparison_operation(node)
         elif node.type in ['OP_AND', 'OP_OR', 'OP_XOR', 'OP_NOT']:
             return self.analyze_logical_operation(node)
+        elif node.type == 'OP_SMOOSH':
+            return self.analyze_smoosh_operation(node)
+        elif node.type == 'CALL':
+            return self.analyze_call(node)
+        elif node.type in BUKKIT_OPERATIONS:
+            return self.analyze_bukkit_operation(node)
         return 'NOOB'
 
     def analyze_arithmetic_operation(self, node):
@@ -134,10 +286,17 @@ class SemanticAnalyzer:
             self.errors.append(f"Arithmetic operation requires exactly 2 operands")
             return 'NOOB'
         
-        left_type = self.analyze_expression(node.children[0])
-        right_type = self.analyze_expression(node.children[1])
-        
-        
+        left_type = node.children[0].static_type
+        right_type = node.children[1].static_type
+        if left_type is None or right_type is None:
+            # An operand only typed at run time takes the generic path
+            return None
+
+        if left_type == 'NUMBR' and right_type == 'NUMBR':
+            node.operand_type = 'NUMBR'
+        elif left_type in ['NUMBR', 'NUMBAR'] and right_type in ['NUMBR', 'NUMBAR']:
+            node.operand_type = 'NUMBAR'
+
         if node.type == 'OP_ADD' and (left_type == 'YARN' or right_type == 'YARN'):    
             if (left_type in ['NUMBR', 'NUMBAR'] or right_type in ['NUMBR', 'NUMBAR']):                
                 return 'NUMBR'  
@@ -164,8 +323,6 @@ class SemanticAnalyzer:
         if len(node.children) != 2:
             self.errors.append("Comparison operation requires 2 operands")
             return 'NOOB'
-        self.analyze_expression(node.children[0])
-        self.analyze_expression(node.children[1])
         self.symbol_table['IT']['type'] = 'TROOF'
         return 'TROOF'
 
@@ -174,7 +331,38 @@ class SemanticAnalyzer:
         if len(node.children) != expected:
             self.errors.append(f"{node.type} expects {expected} operands")
             return 'NOOB'
-        for child in node.children:
-            self.analyze_expression(child)
         self.symbol_table['IT']['type'] = 'TROOF'
-        return 'TROOF'
\ No newline at end of file
+        return 'TROOF'
+
+    def analyze_smoosh_operation(self, node):
+        self.symbol_table['IT']['type'] = 'YARN'
+        return 'YARN'
+
+    def analyze_bukkit_operation(self, node):
+        # Whether an operand holds a BUKKIT is checked at run time
+        if node.type == 'NEW_BUKKIT' or node.type in EACH_OPERATORS:
+            # A call that makes a BUKKIT must return a new one every time, so
+            # its result is never reused
+            self.side_effects = True
+            result_type = 'BUKKIT'
+        elif node.type == 'OP_LENGTH':
+            result_type = 'NUMBR'
+        else:
+            result_type = None
+        self.symbol_table['IT']['type'] = result_type
+        return result_type
+
+    def analyze_call(self, node):
+        function = self.functions.get(node.value)
+        if function is None:
+            self.errors.append(f"Function '{node.value}' not defined")
+            return 'NOOB'
+        expected = len(function.children) - 1
+        if len(node.children) != expected:
+            self.errors.append(f"Function '{node.value}' takes {expected} arguments, got {len(node.children)}")
+        node.slot = function.slot
+        # A recursive call is as pure as the function making it
+        if function is not self.function and function.static_type != 'PURE':
+            self.side_effects = True
+        self.symbol_table['IT']['type'] = None
+        return None
@@ -0,0 +1,25 @@
+# test/engine_support.py
+
+import unittest
+
+from lolcode import ENGINES, run_source
+
+
+class EngineTestCase(unittest.TestCase):
+    """Test case for programs that every engine must run alike."""
+
+    def run_everywhere(self, source, **options):
+        """Run source on every engine with the run_source options, check they
+        agree and return the tree engine's result.
+
+        Errors are compared as printed. Variables are compared only for runs
+        without errors, since engines may stop at different points of a
+        failing statement."""
+        results = [run_source(source, engine=engine, **options) for engine in ENGINES]
+        for engine, result in zip(ENGINES[1:], results[1:]):
+            with self.subTest(engine=engine):
+                self.assertEqual(list(map(str, result.errors)), list(map(str, results[0].errors)))
+                self.assertEqual(result.output, results[0].output)
+                if not result.errors:
+                    self.assertEqual(result.variables, results[0].variables)
+        return results[0]
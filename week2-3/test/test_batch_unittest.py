@@ -0,0 +1,73 @@
+# test/test_batch_unittest.py
+
+import io
+import os
+import unittest
+import subprocess
+import sys
+import tempfile
+
+from batch import BatchTask, expand_paths, run_batch
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.temp_dir.cleanup)
+        self.paths = []
+        for i in range(12):
+            path = os.path.join(self.temp_dir.name, f"prog{i:02d}.lol")
+            with open(path, 'w') as f:
+                f.write(f'HAI\nI HAS A n\nGIMMEH n\nVISIBLE SMOOSH "prog{i} " AN SUM OF n AN {i} MKAY\nKTHXBYE\n')
+            self.paths.append(path)
+        self.broken = os.path.join(self.temp_dir.name, "zz_broken.lol")
+        with open(self.broken, 'w') as f:
+            f.write('HAI\nVISIBLE QUOSHUNT OF 1 AN 0\nKTHXBYE\n')
+
+    def run_batch(self, patterns, jobs):
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        failed = run_batch(patterns, BatchTask(use_cache=False, inputs="100\n"), jobs, stdout, stderr)
+        return failed, stdout.getvalue(), stderr.getvalue()
+
+    def test_expand_paths(self):
+        directory = self.temp_dir.name
+        self.assertEqual(expand_paths([directory]), self.paths + [self.broken])
+        self.assertEqual(expand_paths([os.path.join(directory, "prog0*.lol"), self.paths[0]]), self.paths[:10])
+        self.assertEqual(expand_paths(["missing.lol"]), ["missing.lol"])
+
+    def test_output_is_separate_and_ordered(self):
+        failed, serial, serial_summary = self.run_batch([self.temp_dir.name], 1)
+        self.assertEqual(failed, 1)
+        for jobs in [2, 4]:
+            with self.subTest(jobs=jobs):
+                failed, parallel, summary = self.run_batch([self.temp_dir.name], jobs)
+                self.assertEqual(parallel, serial)
+                self.assertEqual(failed, 1)
+                self.assertIn("13 files, 1 failed", summary)
+
+        blocks = serial.split("==> ")[1:]
+        self.assertEqual(len(blocks), 13)
+        self.assertEqual(blocks[3], f"{self.paths[3]} <==\nprog3 103\n")
+        self.assertEqual(blocks[-1], f"{self.broken} <==\nError: Division by zero\n")
+        self.assertIn(f"FAIL ", serial_summary)
+
+    def test_cli_run(self):
+        result = subprocess.run(
+            [sys.executable, "main.py", "run", "--no-cache", "--jobs", "2",
+             os.path.join("test", "hello_world.lol"), os.path.join(self.temp_dir.name, "prog0[12].lol")],
+            capture_output=True,
+            text=True
+        )
+        self.assertEqual(result.returncode, 1)
+        headers = [line for line in result.stdout.splitlines() if line.startswith("==> ")]
+        self.assertEqual(len(headers), 3)
+        self.assertIn("hello_world.lol", headers[0])
+        self.assertIn("3 files, 3 failed", result.stderr)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,260 @@
+# test/test_bukkit_unittest.py
+
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+import bukkit
+import runtime
+from bukkit import Bukkit, each, total, biggest, smallest
+from cache import ProgramCache
+from lolcode import run_source, build_program
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+from limits import ResourceLimits
+from engine_support import ENGINES, EngineTestCase
+
+SAMPLE_OUTPUT = [
+    "0 1 4 9 16 25 36 49 64 81", "10", "285", "81", "0",
+    "1 2 5 10 17 26 37 50 65 82", "0 0.25 1 2.25 4 6.25 9 12.25 16 20.25", "9",
+    "zero 1 4 9 16 25 36 49 64 81", "1", "",
+]
+
+
+class TestBukkitStorage(unittest.TestCase):
+
+    def test_homogeneous_numbers_stay_compact(self):
+        ints = Bukkit()
+        for value in (1, 2, 3):
+            ints.append(value)
+        self.assertEqual(ints.typecode, 'q')
+        floats = Bukkit()
+        floats.append(0.5)
+        floats.append(2.0)
+        self.assertEqual(floats.typecode, 'd')
+        self.assertEqual(floats.get(1), 2.0)
+        self.assertIs(type(floats.get(1)), float)
+
+    def test_mixed_contents_fall_back_to_a_list(self):
+        for value in ("3", 0.5, True, None, 2 ** 63, Bukkit()):
+            with self.subTest(value=value):
+                mixed = Bukkit.of([1, 2])
+                mixed.append(value)
+                self.assertIsNone(mixed.typecode)
+                self.assertEqual(list(mixed.items), [1, 2, value])
+                self.assertIs(mixed.get(2), value)
+        # Storage only widens
+        mixed = Bukkit.of([1, "a"])
+        mixed.put(1, 2)
+        self.assertIsNone(mixed.typecode)
+
+    def test_of_picks_the_most_compact_storage(self):
+        self.assertEqual(Bukkit.of([1, 2]).typecode, 'q')
+        self.assertEqual(Bukkit.of([1.5]).typecode, 'd')
+        self.assertIsNone(Bukkit.of([1, 1.5]).typecode)
+        self.assertIsNone(Bukkit.of([-2 ** 64]).typecode)
+        self.assertIsNone(Bukkit.of([True, False]).typecode)
+
+    def test_indexes(self):
+        numbers = Bukkit.of([10, 20, 30])
+        self.assertEqual(numbers.get(2), 30)
+        self.assertEqual(numbers.get("1"), 20)
+        self.assertEqual(numbers.get(1.0), 20)
+        for index in (3, -1):
+            with self.assertRaisesRegex(IndexError, "out of range"):
+                numbers.get(index)
+        for index in (0.5, "one", None):
+            with self.assertRaisesRegex(TypeError, "must be a NUMBR"):
+                numbers.get(index)
+
+    def test_equality_compares_elements(self):
+        self.assertEqual(Bukkit.of([1, 2]), Bukkit.of([1.0, 2.0]))
+        self.assertNotEqual(Bukkit.of([1, 2]), Bukkit.of([1, 2, 3]))
+        self.assertNotEqual(Bukkit.of([1]), 1)
+        with self.assertRaises(TypeError):
+            hash(Bukkit())
+
+
+class TestBulkOperations(unittest.TestCase):
+    """Bulk operations must give exactly what the scalar operators give
+    element by element, whatever storage the fast paths use."""
+
+    SAMPLES = [
+        [3, -7, 0, 12, 2 ** 62],
+        [0.5, -2.25, 3.0, 1e300, float('inf')],
+        [1, 2.5, "4", True, None],
+        [],
+    ]
+    SCALARS = [2, -3, 0, 0.5, 4.0, "2", float('nan'), 2 ** 70]
+
+    def expected_each(self, op_type, values, scalar):
+        function = runtime.BINARY_OPERATORS[op_type]
+        return [function(value, scalar) for value in values]
+
+    def check_each(self, op_type, values, scalar):
+        try:
+            expected = self.expected_each(op_type, values, scalar)
+        except Exception as e:
+            with self.assertRaises(type(e)):
+                each(op_type, Bukkit.of(values), scalar)
+            return
+        result = each(op_type, Bukkit.of(values), scalar)
+        self.assertEqual([(type(value), repr(value)) for value in result.items],
+                         [(type(value), repr(value)) for value in expected])
+
+    def test_each_matches_the_scalar_operators(self):
+        for op_type in bukkit.EACH_OPERATORS.values():
+            for values in self.SAMPLES:
+                for scalar in self.SCALARS:
+                    with self.subTest(op_type=op_type, values=values, scalar=scalar):
+                        self.check_each(op_type, values, scalar)
+
+    def test_each_keeps_compact_storage_when_it_can(self):
+        self.assertEqual(each('OP_ADD', Bukkit.of([1, 2]), 3).typecode, 'q')
+        self.assertEqual(each('OP_MUL', Bukkit.of([0.5, 1.25]), 3).typecode, 'd')
+        # Whole-number NUMBAR results turn into NUMBRs, as SUM OF does
+        self.assertEqual(list(each('OP_ADD', Bukkit.of([0.5, 1.25]), 0.5).items), [1, 1.75])
+        # A NUMBR past 64 bits moves the result to a list
+        self.assertEqual(list(each('OP_MUL', Bukkit.of([2 ** 62, 1]), 4).items), [2 ** 64, 4])
+
+    def test_reductions(self):
+        self.assertEqual(total(Bukkit.of([2 ** 62, 2 ** 62, 2 ** 62])), 3 * 2 ** 62)
+        self.assertEqual(total(Bukkit.of([0.1] * 10)), sum([0.1] * 10))
+        self.assertEqual(total(Bukkit.of([0.5, 0.5])), 1)
+        self.assertIs(type(total(Bukkit.of([0.5, 0.5]))), int)
+        self.assertEqual(total(Bukkit.of(["a", "b"])), "ab")
+        self.assertEqual(total(Bukkit()), 0)
+        self.assertEqual(biggest(Bukkit.of([3, 9, -1])), 9)
+        self.assertEqual(smallest(Bukkit.of([2.5, 0.5])), 0.5)
+        self.assertIs(type(biggest(Bukkit.of([2.5, 4.0]))), int)
+        self.assertEqual(biggest(Bukkit.of([1, "7", 3])), 7)
+        self.assertIsNone(smallest(Bukkit()))
+
+    @unittest.skipIf(bukkit.numpy is None, "NumPy is not installed")
+    def test_numpy_backend_matches(self):
+        samples = [list(range(-5000, 5000, 3)), [value / 8 for value in range(-5000, 5000, 3)]]
+        for values in samples:
+            for op_type in bukkit.EACH_OPERATORS.values():
+                for scalar in (3, 0.5, 2 ** 61):
+                    with self.subTest(op_type=op_type, scalar=scalar):
+                        with_numpy = each(op_type, Bukkit.of(values), scalar)
+                        with mock.patch.object(bukkit, 'numpy', None):
+                            without = each(op_type, Bukkit.of(values), scalar)
+                        self.assertEqual(list(with_numpy.items), list(without.items))
+                        self.assertEqual(with_numpy.typecode, without.typecode)
+            for reduce in (total, biggest, smallest):
+                with self.subTest(reduce=reduce.__name__):
+                    with mock.patch.object(bukkit, 'numpy', None):
+                        expected = reduce(Bukkit.of(values))
+                    self.assertEqual(reduce(Bukkit.of(values)), expected)
+
+
+class TestBukkitPrograms(EngineTestCase):
+
+    def analyze(self, source):
+        return SemanticAnalyzer(Parser(Lexer(source).tokenize()).parse()).analyze()
+
+    def test_sample_program(self):
+        result = self.run_everywhere(open("test/bukkits.lol").read())
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.output.split('\n'), SAMPLE_OUTPUT)
+        self.assertEqual(result.variables['IT'], 1)
+
+    def test_operations_store_it(self):
+        source = ("HAI\nI HAS A b ITZ A BUKKIT\nb HAS A 4\nLENGZ OF b\nVISIBLE IT\nITEM OF b AN 0\nVISIBLE IT\n"
+                  "TOTAL OF SUM OF EACH b AN 1\nVISIBLE IT\nKTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source).output, "1\n4\n5\n")
+
+    def test_numbar_total_rounds_like_a_loop(self):
+        source = ("HAI\nI HAS A b ITZ A BUKKIT\nI HAS A s ITZ 0\nIM IN YR a UPPIN YR i TIL BOTH SAEM i AN 10\n"
+                  "  b HAS A 0.1\n  s R SUM OF s AN 0.1\nIM OUTTA YR a\nVISIBLE BOTH SAEM TOTAL OF b AN s\n"
+                  "VISIBLE BOTH SAEM s AN 1\nKTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source).output, "WIN\nFAIL\n")
+
+    def test_variables_share_a_bukkit(self):
+        source = ("HAI\nI HAS A a ITZ A BUKKIT\nI HAS A b ITZ a\nb HAS A 1\nVISIBLE LENGZ OF a\n"
+                  "VISIBLE BOTH SAEM a AN b\nI HAS A c ITZ SUM OF EACH a AN 0\nc HAS A 2\nVISIBLE LENGZ OF a\n"
+                  "KTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source).output, "1\nWIN\n1\n")
+
+    def test_deep_operands(self):
+        depth = 150
+        deep = f"{'SUM OF 1 AN ' * depth}0"
+        source = (f"HAI\nI HAS A b ITZ A BUKKIT\nb HAS A {deep}\nb HAS A 0\nITEM OF b AN 1 R {deep}\n"
+                  f"VISIBLE TOTAL OF b\nKTHXBYE\n")
+        result = self.run_everywhere(source)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.output, "300\n")
+
+    def test_runtime_errors(self):
+        cases = [
+            ("I HAS A b ITZ A BUKKIT\nVISIBLE ITEM OF b AN 0", "Index 0 out of range"),
+            ("I HAS A b ITZ A BUKKIT\nb HAS A 1\nITEM OF b AN 1.5 R 2", "BUKKIT index must be a NUMBR"),
+            ("I HAS A n ITZ 3\nn HAS A 1", "HAS A needs a BUKKIT"),
+            ("VISIBLE LENGZ OF 3", "LENGZ OF needs a BUKKIT"),
+            ("VISIBLE SUM OF EACH \"b\" AN 1", "EACH needs a BUKKIT"),
+            ("I HAS A b ITZ A BUKKIT\nb HAS A 1\nVISIBLE MOD OF EACH b AN 0", "Modulo by zero"),
+        ]
+        for body, message in cases:
+            with self.subTest(body=body):
+                result = self.run_everywhere(f"HAI\n{body}\nKTHXBYE\n")
+                self.assertEqual(result.errors[0].phase, 'runtime')
+                self.assertIn(message, result.errors[0].message)
+
+    def test_syntax_and_semantic_errors(self):
+        result = run_source("HAI\nmissing HAS A 1\nKTHXBYE\n")
+        self.assertEqual(result.errors[0].message, "Variable 'missing' not declared")
+        result = run_source("HAI\nI HAS A b ITZ A BUKKIT\nVISIBLE SUM OF b AN 1\nKTHXBYE\n")
+        self.assertIn("Arithmetic operation requires numeric operands", result.errors[0].message)
+        result = run_source("HAI\nVISIBLE EACH 1\nKTHXBYE\n")
+        self.assertEqual(result.errors[0].phase, 'syntax')
+
+    def test_functions_making_or_changing_bukkits_are_impure(self):
+        ast = self.analyze("HAI\nHOW IZ I make\n  FOUND YR A BUKKIT\nIF U SAY SO\n"
+                           "HOW IZ I grow YR b\n  b HAS A 1\nIF U SAY SO\n"
+                           "HOW IZ I size YR b\n  FOUND YR LENGZ OF b\nIF U SAY SO\nKTHXBYE\n")
+        self.assertEqual([node.static_type for node in ast.children], [None, None, 'PURE'])
+        source = ("HAI\nHOW IZ I make\n  FOUND YR A BUKKIT\nIF U SAY SO\nI HAS A a ITZ I IZ make MKAY\n"
+                  "a HAS A 1\nVISIBLE LENGZ OF I IZ make MKAY\nKTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source, memo_size=8).output, "0\n")
+
+    def test_memoized_calls_never_key_on_a_bukkit(self):
+        # size is pure, but the BUKKIT passed to it changes between calls
+        source = ("HAI\nHOW IZ I size YR b\n  FOUND YR LENGZ OF b\nIF U SAY SO\nI HAS A b ITZ A BUKKIT\n"
+                  "VISIBLE I IZ size YR b MKAY\nb HAS A 1\nVISIBLE I IZ size YR b MKAY\nKTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source, memo_size=8).output, "0\n1\n")
+
+    def test_bulk_operations_are_not_folded(self):
+        program = build_program("HAI\nVISIBLE LENGZ OF A BUKKIT\nKTHXBYE\n", 'vm')
+        self.assertIn("BUKKIT_OP", program.disassemble())
+
+    def test_string_length_limit_covers_each(self):
+        source = ("HAI\nI HAS A b ITZ A BUKKIT\nb HAS A \"ab\"\nIM IN YR grow\n"
+                  "  b R SUM OF EACH b AN ITEM OF b AN 0\nIM OUTTA YR grow\nKTHXBYE\n")
+        result = run_source(source, limits=ResourceLimits(string_length=100))
+        self.assertEqual(result.errors[0].phase, 'limit')
+        self.assertIn("string", result.errors[0].message.lower())
+
+    def test_cached_programs(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        source = open("test/bukkits.lol").read()
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                for _ in range(2):
+                    result = run_source(source, engine=engine, cache=ProgramCache(cache_dir))
+                    self.assertEqual(result.output.split('\n'), SAMPLE_OUTPUT)
+        self.assertTrue(os.listdir(cache_dir))
+
+    def test_profiled_run(self):
+        result = run_source(open("test/bukkits.lol").read(), profile=True)
+        self.assertEqual(result.output.split('\n'), SAMPLE_OUTPUT)
+        self.assertEqual(result.profile.node_types['APPEND'][0], 12)
+        self.assertIn('EACH_ADD', result.profile.node_types)
+
+
+if __name__ == '__main__':
+    unittest.main()
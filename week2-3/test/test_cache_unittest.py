@@ -0,0 +1,91 @@
+# test/test_cache_unittest.py
+
+import unittest
+import subprocess
+import sys
+import os
+import shutil
+import tempfile
+
+from cache import ProgramCache, dump_ast, load_ast, CACHE_SUFFIX
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+
+SOURCE = 'HAI\nI HAS A x ITZ SUM OF 1 AN 2\nVISIBLE SMOOSH "x=" AN x MKAY\nKTHXBYE\n'
+
+
+class TestProgramCache(unittest.TestCase):
+
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def analyze(self, source):
+        return SemanticAnalyzer(Parser(Lexer(source).tokenize()).parse()).analyze()
+
+    def entries(self):
+        return sorted(f for f in os.listdir(self.cache_dir) if f.endswith(CACHE_SUFFIX))
+
+    def test_ast_round_trip(self):
+        ast = self.analyze(open("test/final_test.lol").read())
+        loaded = load_ast(dump_ast(ast))
+        self.assertEqual(dump_ast(loaded), dump_ast(ast))
+        self.assertIsInstance(loaded.children, list)
+        self.assertEqual(loaded.value, ast.value)
+
+    def test_store_and_load(self):
+        cache = ProgramCache(self.cache_dir)
+        self.assertIsNone(cache.load(SOURCE, 'tree'))
+        cache.store(SOURCE, 'tree', self.analyze(SOURCE))
+        self.assertEqual(len(self.entries()), 1)
+        self.assertEqual(cache.load(SOURCE, 'tree').children[0].slot, 1)
+        self.assertIsNone(cache.load(SOURCE + "\n", 'tree'))
+        self.assertIsNone(cache.load(SOURCE, 'vm'))
+
+    def test_mapped_source_shares_key_with_text(self):
+        cache = ProgramCache(self.cache_dir)
+        self.assertEqual(cache.key(SOURCE.encode('utf-8'), 'tree'), cache.key(SOURCE, 'tree'))
+
+    def test_corrupt_entry_is_a_miss(self):
+        cache = ProgramCache(self.cache_dir)
+        with open(cache.path(SOURCE, 'tree'), 'wb') as f:
+            f.write(b'not marshal data')
+        self.assertIsNone(cache.load(SOURCE, 'tree'))
+        self.assertEqual(self.entries(), [])
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ProgramCache(self.cache_dir)
+        sources = [SOURCE.replace("1 AN 2", f"1 AN {n}") for n in range(3)]
+        for source in sources:
+            cache.store(source, 'tree', self.analyze(source))
+        for age, source in enumerate(reversed(sources)):
+            os.utime(cache.path(source, 'tree'), (1000 + age, 1000 + age))
+        cache.load(sources[2], 'tree')
+
+        entry_size = os.path.getsize(cache.path(sources[0], 'tree'))
+        cache.max_bytes = entry_size * 2
+        cache.evict()
+        self.assertFalse(os.path.exists(cache.path(sources[1], 'tree')))
+        self.assertTrue(os.path.exists(cache.path(sources[0], 'tree')))
+        self.assertTrue(os.path.exists(cache.path(sources[2], 'tree')))
+
+    def test_cli_uses_cache(self):
+        for engine in ['tree', 'vm', 'python']:
+            outputs = []
+            for _ in range(2):
+                result = subprocess.run(
+                    [sys.executable, "main.py", f"--engine={engine}", "--cache-dir", self.cache_dir,
+                     "test/nested_expr.lol"],
+                    capture_output=True,
+                    text=True
+                )
+                outputs.append(result.stdout)
+            self.assertEqual(outputs, ["7\n", "7\n"])
+        self.assertEqual(len(self.entries()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
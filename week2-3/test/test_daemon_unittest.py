@@ -0,0 +1,123 @@
+# test/test_daemon_unittest.py
+
+import os
+import unittest
+import subprocess
+import sys
+import tempfile
+import threading
+
+from daemon import LolDaemon
+from lolcoded import send_request
+
+
+class TestDaemon(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.socket_path = os.path.join(cls.temp_dir.name, "lolcoded.sock")
+        cls.daemon = LolDaemon(cls.socket_path, workers=2, max_runs=5, timeout=10)
+        cls.daemon.start()
+        cls.thread = threading.Thread(target=cls.daemon.serve_forever, daemon=True)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.daemon.shutdown()
+        cls.thread.join(timeout=10)
+        cls.temp_dir.cleanup()
+
+    def run_program(self, source, stdin='', **options):
+        output = []
+        done = None
+        for message in send_request(self.socket_path, {'op': 'run', 'source': source, 'stdin': stdin, **options}):
+            if message['type'] == 'output':
+                output.append(message['data'])
+            else:
+                done = message
+        return ''.join(output), done
+
+    def test_run_streams_output_and_errors(self):
+        output, done = self.run_program('HAI\nI HAS A n\nGIMMEH n\nVISIBLE SUM OF n AN 1\n'
+                                        'VISIBLE QUOSHUNT OF 1 AN 0\nKTHXBYE\n', stdin="41\n")
+        self.assertEqual(output, "42\n")
+        self.assertEqual(done['errors'], ["Error: Division by zero"])
+        self.assertIn('run', done['timings'])
+
+    def test_engines(self):
+        for engine in ['tree', 'vm', 'python']:
+            with self.subTest(engine=engine):
+                output, done = self.run_program('HAI\nVISIBLE SMOOSH "a" AN 1 MKAY\nKTHXBYE\n', engine=engine)
+                self.assertEqual(output, "a1\n")
+                self.assertEqual(done['errors'], [])
+
+    def test_concurrent_requests(self):
+        results = {}
+
+        def run(i):
+            results[i] = self.run_program(f'HAI\nVISIBLE PRODUKT OF {i} AN 2\nKTHXBYE\n')[0]
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(12)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, {i: f"{i * 2}\n" for i in range(12)})
+
+    def test_workers_are_recycled(self):
+        pids = {self.run_program('HAI\nVISIBLE 1\nKTHXBYE\n')[1]['worker'] for _ in range(12)}
+        # Two workers can serve at most ten runs before being replaced
+        self.assertGreater(len(pids), 2)
+        self.assertGreater(self.daemon.stats()['recycled'], 0)
+
+    def test_timeout_kills_the_run(self):
+        source = 'HAI\nI HAS A x ITZ 1\n' + 'x R SUM OF x AN 1\n' * 50000 + 'VISIBLE x\nKTHXBYE\n'
+        _, done = self.run_program(source, timeout=0.01)
+        self.assertEqual(done['errors'], ["Error: Timed out after 0.01s"])
+        output, done = self.run_program('HAI\nVISIBLE "still here"\nKTHXBYE\n')
+        self.assertEqual(output, "still here\n")
+
+    def test_resource_limits(self):
+        output, done = self.run_program('HAI\nVISIBLE 1\nVISIBLE 2\nKTHXBYE\n', limits={'statements': 1})
+        self.assertEqual(output, "1\n")
+        self.assertEqual(done['errors'],
+                         ["Resource Limit Error: Statement limit of 1 statements exceeded on line 3"])
+
+    def test_malformed_run_request(self):
+        for options in ({'timeout': "5"}, {'timeout': -1}, {'engine': "fast"}, {'stdin': 42},
+                        {'limits': {'statements': "1"}}, {'limits': [1]}):
+            with self.subTest(options=options):
+                messages = list(send_request(self.socket_path, {
+                    'op': 'run', 'source': 'HAI\nVISIBLE "first"\nKTHXBYE\n', **options}))
+                self.assertEqual([message['type'] for message in messages], ['error'])
+                self.assertIn("Malformed request", messages[0]['message'])
+        # Every worker is still free for the next clients, with no output left over
+        for _ in range(4):
+            output, done = self.run_program('HAI\nVISIBLE "second"\nKTHXBYE\n')
+            self.assertEqual(output, "second\n")
+            self.assertEqual(done['errors'], [])
+
+    def test_stats(self):
+        self.run_program('HAI\nVISIBLE 1\nKTHXBYE\n')
+        stats = next(send_request(self.socket_path, {'op': 'stats'}))
+        self.assertEqual(stats['type'], 'stats')
+        self.assertEqual(stats['workers'], 2)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertGreater(stats['runs'], 0)
+        self.assertLessEqual(stats['latency_p50'], stats['latency_p99'])
+
+    def test_cli_client(self):
+        result = subprocess.run(
+            [sys.executable, "lolcoded.py", "--socket", self.socket_path, "run", "test/conditional.lol"],
+            input="12\n",
+            capture_output=True,
+            text=True
+        )
+        self.assertEqual(result.returncode, 0)
+        self.assertIn("UR NUMBR IZ BIGR THAN OR EQUL TO 10!", result.stdout)
+        self.assertIn("UR NUMBR IZ EVEN!", result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# test/test_deep_nesting_unittest.py
+
+import sys
+import unittest
+
+from lolcode import run_source
+from engine_support import ENGINES
+
+DEPTH = 100000
+
+
+class TestDeepNesting(unittest.TestCase):
+    """Expressions nested far past the recursion limit must parse, analyze,
+    optimize, compile and run."""
+
+    def run_program(self, expression, engine='tree', **options):
+        source = f"HAI\nI HAS A x ITZ 1\nI HAS A t ITZ WIN\nVISIBLE {expression}\nKTHXBYE\n"
+        return run_source(source, engine=engine, **options)
+
+    def test_depth_exceeds_recursion_limit(self):
+        self.assertGreater(DEPTH, sys.getrecursionlimit() * 10)
+
+    def test_right_nested_arithmetic(self):
+        expression = 'SUM OF x AN ' * DEPTH + 'x'
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                result = self.run_program(expression, engine)
+                self.assertEqual(result.errors, [])
+                self.assertEqual(result.output, f"{DEPTH + 1}\n")
+                self.assertEqual(result.variables['IT'], DEPTH + 1)
+
+    def test_deep_declarations_and_assignments(self):
+        expression = 'SUM OF x AN ' * DEPTH + 'x'
+        source = f"HAI\nI HAS A x ITZ 1\nI HAS A r ITZ {expression}\nx R {expression}\nVISIBLE r\nVISIBLE x\nKTHXBYE\n"
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                result = run_source(source, engine=engine)
+                self.assertEqual(result.errors, [])
+                self.assertEqual(result.output, f"{DEPTH + 1}\n{DEPTH + 1}\n")
+
+    def test_left_nested_arithmetic(self):
+        expression = 'DIFF OF ' * DEPTH + 'x' + ' AN 1' * DEPTH
+        result = self.run_program(expression)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.output, f"{1 - DEPTH}\n")
+
+    def test_nested_logic(self):
+        result = self.run_program('NOT ' * DEPTH + 'BOTH OF t AN t')
+        self.assertEqual(result.output, "WIN\n")
+        result = self.run_program('NOT ' * (DEPTH + 1) + 't', engine='vm')
+        self.assertEqual(result.output, "FAIL\n")
+
+    def test_nested_constants_fold(self):
+        result = self.run_program('PRODUKT OF 1 AN ' * DEPTH + '2')
+        self.assertEqual(result.output, "2\n")
+
+    def test_deep_syntax_error(self):
+        result = self.run_program('SUM OF x AN ' * DEPTH + 'SUM OF x')
+        self.assertEqual(len(result.errors), 1)
+        self.assertEqual(result.errors[0].phase, 'syntax')
+
+    def test_deep_profile(self):
+        result = self.run_program('SUM OF x AN ' * DEPTH + 'x', profile=True)
+        self.assertEqual(result.output, f"{DEPTH + 1}\n")
+        self.assertEqual(result.profile.node_types['OP_ADD'][0], DEPTH)
+
+
+if __name__ == '__main__':
+    unittest.main()
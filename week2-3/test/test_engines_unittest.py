@@ -0,0 +1,62 @@
+# test/test_engines_unittest.py
+
+import unittest
+import subprocess
+import sys
+import os
+import tempfile
+
+from engine_support import ENGINES
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+SAMPLE_INPUT = "5\n3\n7\n"
+
+
+class TestEngines(unittest.TestCase):
+
+    def run_lol(self, filename, engine):
+        result = subprocess.run(
+            [sys.executable, "main.py", f"--engine={engine}", filename],
+            input=SAMPLE_INPUT,
+            capture_output=True,
+            text=True
+        )
+        return result.stdout
+
+    def test_engines_match_on_every_test_file(self):
+        lol_files = sorted(f for f in os.listdir(TEST_DIR) if f.endswith('.lol'))
+        self.assertTrue(lol_files)
+        for name in lol_files:
+            path = os.path.join("test", name)
+            expected = self.run_lol(path, 'tree')
+            for engine in ENGINES[1:]:
+                with self.subTest(file=name, engine=engine):
+                    self.assertEqual(self.run_lol(path, engine), expected)
+
+    def test_vm_hello_world(self):
+        output = self.run_lol("test/hello_world.lol", 'vm')
+        self.assertIn("HAI WORLD!", output)
+        self.assertIn("52", output)
+
+    def test_vm_conditional(self):
+        output = self.run_lol("test/conditional.lol", 'vm')
+        self.assertIn("UR NUMBR IZ LESS THAN 10!", output)
+        self.assertIn("UR NUMBR IZ ODD!", output)
+
+    def test_python_engine_deeply_nested_expression(self):
+        expr = "1"
+        for _ in range(200):
+            expr = f"SUM OF {expr} AN IT"
+        source = f"HAI\nIT R 1\nI HAS A d ITZ {expr}\nVISIBLE d\nKTHXBYE\n"
+        with tempfile.NamedTemporaryFile('w', suffix='.lol', delete=False) as f:
+            f.write(source)
+        try:
+            expected = self.run_lol(f.name, 'tree')
+            self.assertEqual(self.run_lol(f.name, 'python'), expected)
+            self.assertNotIn("Error", expected)
+        finally:
+            os.unlink(f.name)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,175 @@
+# test/test_functions_unittest.py
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from lolcode import run_source, run_stream, build_program, RECURSION_MESSAGE
+from cache import ProgramCache
+from compiler import DEFINE
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+from limits import ResourceLimits
+from runtime import MAX_CALL_DEPTH
+from engine_support import ENGINES, EngineTestCase
+
+FIB = ("HAI\nHOW IZ I fib YR n\n  BOTH SAEM BIGGR OF n AN 1 AN 1\n  O RLY?\n    YA RLY\n      FOUND YR n\n"
+       "  OIC\n  FOUND YR SUM OF I IZ fib YR DIFF OF n AN 1 MKAY AN I IZ fib YR DIFF OF n AN 2 MKAY\n"
+       "IF U SAY SO\nVISIBLE I IZ fib YR 12 MKAY\nKTHXBYE\n")
+
+
+class TestFunctions(EngineTestCase):
+
+    def functions(self, source):
+        ast = SemanticAnalyzer(Parser(Lexer(source).tokenize()).parse()).analyze()
+        return {node.value: node for node in ast.children if node.type == 'FUNCTION'}
+
+    def test_sample_program(self):
+        result = self.run_everywhere(open("test/functions.lol").read())
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.output.split('\n'), ["610", "HAI CAT!", "5", "4", "NOOB", "13", "7", ""])
+        # A call stores its result in the caller's IT
+        self.assertEqual(result.variables['IT'], 13)
+
+    def test_calls_run_in_frames_of_their_own(self):
+        source = ("HAI\nI HAS A x ITZ \"outer\"\nHOW IZ I shadow YR x\n  I HAS A y ITZ SUM OF x AN 1\n"
+                  "  x R y\n  FOUND YR x\nIF U SAY SO\nVISIBLE I IZ shadow YR 1 MKAY\n"
+                  "VISIBLE I IZ shadow YR 10 MKAY\nVISIBLE x\nKTHXBYE\n")
+        result = self.run_everywhere(source)
+        self.assertEqual(result.output, "2\n11\nouter\n")
+        self.assertNotIn('y', result.variables)
+        result = run_source("HAI\nI HAS A x ITZ 1\nHOW IZ I peek\n  FOUND YR x\nIF U SAY SO\nKTHXBYE\n")
+        self.assertEqual(result.errors[0].message, "Variable 'x' not declared")
+
+    def test_nested_and_deep_calls(self):
+        depth = 150
+        source = ("HAI\nHOW IZ I inc YR x\n  FOUND YR SUM OF x AN 1\nIF U SAY SO\n"
+                  f"VISIBLE {'I IZ inc YR ' * depth}0{' MKAY' * depth}\n"
+                  "VISIBLE SMOOSH \"a\" AN I IZ inc YR SMOOSH 1 AN 2 MKAY MKAY AN \"b\" MKAY\n"
+                  "VISIBLE I IZ inc YR SMOOSH 4 AN 5 MKAY MKAY\nKTHXBYE\n")
+        result = self.run_everywhere(source)
+        self.assertEqual(result.output, "150\na13b\n46\n")
+        # AN YR ends a SMOOSH argument and starts the next one
+        result = run_source(source.replace("AN 5 MKAY MKAY", "AN 5 AN YR 6 MKAY"))
+        self.assertIn("takes 1 arguments, got 2", result.errors[0].message)
+
+    def test_purity(self):
+        functions = self.functions(
+            "HAI\nHOW IZ I square YR x\n  FOUND YR PRODUKT OF x AN x\nIF U SAY SO\n"
+            "HOW IZ I shout YR x\n  VISIBLE x\nIF U SAY SO\n"
+            "HOW IZ I ask\n  I HAS A answer\n  GIMMEH answer\n  FOUND YR answer\nIF U SAY SO\n"
+            "HOW IZ I twice YR x\n  FOUND YR I IZ square YR I IZ square YR x MKAY MKAY\nIF U SAY SO\n"
+            "HOW IZ I loud YR x\n  FOUND YR I IZ shout YR x MKAY\nIF U SAY SO\nKTHXBYE\n")
+        self.assertEqual({name: node.static_type for name, node in functions.items()},
+                         {'square': 'PURE', 'shout': None, 'ask': None, 'twice': 'PURE', 'loud': None})
+        self.assertEqual(self.functions(FIB)['fib'].static_type, 'PURE')
+
+    def test_memoized_results_match(self):
+        plain = self.run_everywhere(FIB)
+        self.assertEqual(plain.output, "144\n")
+        for memo_size in (1, 2, 1024):
+            with self.subTest(memo_size=memo_size):
+                self.assertEqual(self.run_everywhere(FIB, memo_size=memo_size).output, plain.output)
+
+    def test_memoization_skips_repeated_calls(self):
+        plain = run_source(FIB, profile=True)
+        memoized = run_source(FIB, profile=True, memo_size=1024)
+        self.assertEqual(memoized.output, plain.output)
+        # Each fib(n) body runs once instead of once per path to it
+        self.assertEqual(plain.profile.node_types['CONDITIONAL'][0], 465)
+        self.assertEqual(memoized.profile.node_types['CONDITIONAL'][0], 13)
+
+    def test_memoization_keys_on_argument_types(self):
+        source = ("HAI\nHOW IZ I show YR x\n  FOUND YR SMOOSH x AN \"!\" MKAY\nIF U SAY SO\n"
+                  "VISIBLE I IZ show YR 1 MKAY\nVISIBLE I IZ show YR 1.0 MKAY\nVISIBLE I IZ show YR \"1\" MKAY\n"
+                  "VISIBLE I IZ show YR WIN MKAY\nKTHXBYE\n")
+        expected = self.run_everywhere(source).output
+        self.assertEqual(self.run_everywhere(source, memo_size=8).output, expected)
+
+    def test_side_effects_are_never_memoized(self):
+        source = ("HAI\nHOW IZ I shout YR x\n  VISIBLE x\nIF U SAY SO\n"
+                  "I IZ shout YR 1 MKAY\nI IZ shout YR 1 MKAY\nKTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source, memo_size=8).output, "1\n1\n")
+
+    def test_cached_programs_keep_their_functions(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        source = open("test/functions.lol").read()
+        expected = run_source(source).output
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                for _ in range(2):
+                    result = run_source(source, engine=engine, cache=ProgramCache(cache_dir), memo_size=16)
+                    self.assertEqual(result.output, expected)
+        self.assertTrue(os.listdir(cache_dir))
+
+    def test_vm_compiles_each_function_once(self):
+        program = build_program(open("test/functions.lol").read(), 'vm')
+        self.assertEqual(program.code[::2].count(DEFINE), 5)
+        self.assertIn("fib #0 (1 arguments)", program.disassemble())
+
+    def test_streamed_program(self):
+        with open("test/functions.lol") as source_file:
+            result = run_stream(source_file, memo_size=16)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.output, run_source(open("test/functions.lol").read()).output)
+
+    def test_limits_cover_function_bodies(self):
+        result = run_source(FIB, limits=ResourceLimits(statements=100))
+        self.assertEqual([error.phase for error in result.errors], ['limit'])
+        forever = "HAI\nHOW IZ I again\n  I IZ again MKAY\nIF U SAY SO\nI IZ again MKAY\nKTHXBYE\n"
+        self.assertEqual(run_source(forever, limits=ResourceLimits(statements=50)).errors[0].phase, 'limit')
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(run_source(forever, engine=engine).errors[0].message, RECURSION_MESSAGE)
+
+    def test_call_depth_is_the_same_on_every_engine(self):
+        # The recursive call sits inside a loop, a conditional and an
+        # expression, which takes the tree engine the most Python frames
+        depth = ("HAI\nHOW IZ I depth YR n\n  I HAS A r ITZ 0\n  IM IN YR once UPPIN YR i TIL BOTH SAEM i AN 1\n"
+                 "    DIFFRINT n AN 1\n    O RLY?\n      YA RLY\n"
+                 "        r R SUM OF 1 AN PRODUKT OF 1 AN I IZ depth YR DIFF OF n AN 1 MKAY\n"
+                 "      NO WAI\n        r R 1\n    OIC\n  IM OUTTA YR once\n  FOUND YR r\nIF U SAY SO\n"
+                 "VISIBLE I IZ depth YR {} MKAY\nKTHXBYE\n")
+        recursion_limit = sys.getrecursionlimit()
+        for engine in ENGINES:
+            for memo_size in (None, 4):
+                with self.subTest(engine=engine, memo_size=memo_size):
+                    result = run_source(depth.format(MAX_CALL_DEPTH), engine=engine, memo_size=memo_size)
+                    self.assertEqual(result.output, f"{MAX_CALL_DEPTH}\n")
+                    result = run_source(depth.format(MAX_CALL_DEPTH + 1), engine=engine, memo_size=memo_size)
+                    self.assertEqual(result.errors[0].message, RECURSION_MESSAGE)
+        self.assertEqual(run_stream(io.StringIO(depth.format(MAX_CALL_DEPTH))).output, f"{MAX_CALL_DEPTH}\n")
+        # Runs raise Python's recursion limit only while they last
+        self.assertEqual(sys.getrecursionlimit(), recursion_limit)
+
+    def test_errors(self):
+        cases = [
+            ("HAI\nVISIBLE I IZ nope MKAY\nKTHXBYE\n", 'semantic', "Function 'nope' not defined"),
+            ("HAI\nVISIBLE I IZ later MKAY\nHOW IZ I later\nIF U SAY SO\nKTHXBYE\n", 'semantic',
+             "Function 'later' not defined"),
+            ("HAI\nHOW IZ I f YR a\nIF U SAY SO\nI IZ f MKAY\nKTHXBYE\n", 'semantic',
+             "Function 'f' takes 1 arguments, got 0"),
+            ("HAI\nHOW IZ I f\nIF U SAY SO\nHOW IZ I f\nIF U SAY SO\nKTHXBYE\n", 'semantic',
+             "Function 'f' already defined"),
+            ("HAI\nHOW IZ I f YR a AN YR a\nIF U SAY SO\nKTHXBYE\n", 'semantic', "Parameter 'a' repeated"),
+            ("HAI\nIM IN YR l\n  HOW IZ I f\n  IF U SAY SO\nIM OUTTA YR l\nKTHXBYE\n", 'semantic',
+             "Function 'f' must be defined at the top level"),
+            ("HAI\nFOUND YR 1\nKTHXBYE\n", 'semantic', "FOUND YR outside of a function"),
+            ("HAI\nHOW IZ I f\nIF U SAY SO\nVISIBLE I IZ f\nKTHXBYE\n", 'syntax', "Expected 'MKAY' to end call to 'f'"),
+            ("HAI\nHOW IZ I f\nVISIBLE 1\n", 'syntax', "Expected 'IF U SAY SO' to end function 'f'"),
+            ("HAI\nHOW IZ I\nIF U SAY SO\nKTHXBYE\n", 'syntax', "Expected function name after 'HOW IZ I'"),
+        ]
+        for source, phase, message in cases:
+            with self.subTest(source=source):
+                result = run_source(source)
+                self.assertEqual(result.errors[0].phase, phase)
+                self.assertIn(message, result.errors[0].message)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+# test/test_inputs_unittest.py
+
+import io
+import os
+import unittest
+import subprocess
+import sys
+import tempfile
+
+from inputs import ChunkedInput, StreamInput, CallbackInput, as_source
+from runtime import parse_input
+from lolcode import run_source
+from engine_support import ENGINES
+
+
+class TestInputSources(unittest.TestCase):
+
+    def read_all(self, source):
+        lines = []
+        while True:
+            try:
+                lines.append(source.read_line())
+            except EOFError:
+                return lines
+
+    def test_chunked_input_splits_lines_across_chunks(self):
+        data = "first\r\nsecond ✓\n\nlast".encode('utf-8')
+        for chunk_size in [1, 2, 3, 64]:
+            with self.subTest(chunk_size=chunk_size):
+                source = ChunkedInput(io.BytesIO(data), chunk_size=chunk_size)
+                self.assertEqual(self.read_all(source), ["first", "second ✓", "", "last"])
+
+    def test_end_of_input_raises_eof_error(self):
+        for source in [ChunkedInput(io.BytesIO(b"")), StreamInput(io.StringIO("")), CallbackInput(lambda: None)]:
+            with self.subTest(source=type(source).__name__):
+                with self.assertRaises(EOFError):
+                    source.read_line()
+
+    def test_as_source(self):
+        callback = CallbackInput(lambda: "1")
+        self.assertIs(as_source(callback), callback)
+        self.assertIsInstance(as_source(io.StringIO()), StreamInput)
+        self.assertIsInstance(as_source(io.TextIOWrapper(io.BytesIO())), ChunkedInput)
+
+    def test_parse_input_classifies_without_exceptions(self):
+        cases = {
+            "42": 42, " -7 ": -7, "+3": 3, "3.5": 3.5, ".5": 0.5, "5.": 5.0, "1e3": 1000.0,
+            "abc": "abc", "": "", "-": "-", "1.2.3": "1.2.3", "12abc": "12abc", "nan": "nan",
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                value = parse_input(text)
+                self.assertEqual(value, expected)
+                self.assertIs(type(value), type(expected))
+
+    def test_engines_read_many_answers(self):
+        count = 2000
+        source = "HAI\nI HAS A n\nI HAS A total ITZ 0\n"
+        source += "GIMMEH n\ntotal R SUM OF total AN n\n" * count
+        source += "VISIBLE total\nKTHXBYE\n"
+        answers = ''.join(f"{i}\n" for i in range(count))
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                result = run_source(source, stdin=ChunkedInput(io.BytesIO(answers.encode()), chunk_size=100),
+                                    engine=engine)
+                self.assertEqual(result.output, f"{count * (count - 1) // 2}\n")
+
+    def test_cli_inputs_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+            f.write("12\n")
+        try:
+            result = subprocess.run(
+                [sys.executable, "main.py", "--no-cache", "--inputs", f.name, "test/conditional.lol"],
+                input="5\n",
+                capture_output=True,
+                text=True
+            )
+        finally:
+            os.unlink(f.name)
+        self.assertIn("UR NUMBR IZ BIGR THAN OR EQUL TO 10!", result.stdout)
+
+
+if __name__ == '__main__':
+    unittest.main()
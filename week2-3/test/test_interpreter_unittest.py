@@ -1,19 +1,26 @@
 # test/test_interpreter_unittest.py
 
+import io
 import unittest
-import subprocess
-import sys
-import os
+
+from lolcode import run_source
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+from interpreter import Interpreter
 
 class TestLOLCODE(unittest.TestCase):
 
-    def run_lol(self, filename):
-        result = subprocess.run(
-            [sys.executable, "main.py", filename],
-            capture_output=True,
-            text=True
-        )
-        return result.stdout.strip()
+    def run_lol(self, filename, stdin=""):
+        with open(filename, 'r', encoding='utf-8') as f:
+            return self.run_source(f.read(), stdin)
+
+    def run_source(self, source, stdin=""):
+        return run_source(source, stdin=stdin).transcript.strip()
+
+    def analyze(self, source):
+        ast = Parser(Lexer(source).tokenize()).parse()
+        return SemanticAnalyzer(ast).analyze()
 
     def test_hello_world(self):
         output = self.run_lol("test/hello_world.lol")
@@ -21,13 +28,8 @@ class TestLOLCODE(unittest.TestCase):
 
     def test_conditional(self):
         # Simulate input "5" for testing
-        result = subprocess.run(
-            [sys.executable, "main.py", "test/conditional.lol"],
-            input="5\n",
-            capture_output=True,
-            text=True
-        )
-        self.assertIn("UR NUMBR IZ LESS THAN 10!", result.stdout)
+        output = self.run_lol("test/conditional.lol", stdin="5\n")
+        self.assertIn("UR NUMBR IZ LESS THAN 10!", output)
     
     def test_smoosh(self):
         output = self.run_lol("test/smoosh.lol")
@@ -37,5 +39,63 @@ class TestLOLCODE(unittest.TestCase):
         output = self.run_lol("test/nested_expr.lol")
         self.assertIn("7", output)
 
+    def test_variables_are_assigned_slots(self):
+        ast = self.analyze("HAI\nI HAS A x ITZ 1\nI HAS A y\ny R SUM OF x AN 2\nKTHXBYE")
+        self.assertEqual(ast.value, ('IT', 'x', 'y'))
+        declaration, _, assignment = ast.children
+        self.assertEqual(declaration.slot, 1)
+        self.assertEqual(assignment.slot, 2)
+        self.assertEqual(assignment.children[0].children[0].slot, 1)
+
+        interpreter = Interpreter(ast)
+        interpreter.interpret()
+        self.assertEqual(interpreter.variables, {'IT': 3, 'x': 1, 'y': 3})
+
+    def test_undeclared_variable_in_smoosh_is_semantic_error(self):
+        output = self.run_source('HAI\nVISIBLE SMOOSH "a" AN q MKAY\nKTHXBYE\n')
+        self.assertEqual(output, "Semantic Error: Variable 'q' not declared")
+
+    def test_arithmetic_operand_types_are_annotated(self):
+        ast = self.analyze('HAI\nI HAS A x ITZ SUM OF 1 AN 2\nI HAS A y ITZ SUM OF x AN QUOSHUNT OF 1 AN 2\n'
+                           'I HAS A z ITZ SUM OF "a" AN x\nKTHXBYE')
+        int_sum, float_sum, yarn_sum = (node.children[0] for node in ast.children)
+        self.assertEqual(int_sum.operand_type, 'NUMBR')
+        self.assertEqual(int_sum.static_type, 'NUMBR')
+        self.assertEqual(float_sum.operand_type, 'NUMBAR')
+        self.assertIsNone(yarn_sum.operand_type)
+
+    def test_run_source_reports_output_variables_and_timings(self):
+        result = run_source('HAI\nI HAS A n\nGIMMEH n\nVISIBLE SUM OF n AN 1\nKTHXBYE\n', stdin="41\n")
+        self.assertTrue(result.ok)
+        self.assertEqual(result.output, "42\n")
+        self.assertEqual(result.variables, {'IT': 42, 'n': 41})
+        self.assertLessEqual({'lex', 'parse', 'analyze', 'optimize', 'run'}, set(result.timings))
+
+    def test_run_source_writes_to_given_stream(self):
+        for engine in ['tree', 'vm', 'python']:
+            with self.subTest(engine=engine):
+                stream = io.StringIO()
+                result = run_source('HAI\nVISIBLE "HAI"\nKTHXBYE\n', stdout=stream, engine=engine)
+                self.assertEqual(stream.getvalue(), "HAI\n")
+                self.assertIsNone(result.output)
+
+    def test_run_source_reports_structured_errors(self):
+        result = run_source('HAI\nVISIBLE\nKTHXBYE\n')
+        self.assertFalse(result.ok)
+        self.assertEqual(result.errors[0].phase, 'syntax')
+        self.assertEqual(result.errors[0].line, 3)
+
+        result = run_source('HAI\nVISIBLE "a"\nVISIBLE QUOSHUNT OF 1 AN 0\nKTHXBYE\n')
+        self.assertEqual(result.output, "a\n")
+        self.assertEqual([(e.phase, e.message) for e in result.errors], [('runtime', "Division by zero")])
+
+        result = run_source('HAI\nI HAS A n\nGIMMEH n\nKTHXBYE\n', stdin="")
+        self.assertEqual(str(result.errors[0]), "Error: EOF when reading a line")
+
+    def test_integer_arithmetic_is_exact(self):
+        output = self.run_source('HAI\nI HAS A a ITZ 9007199254740993\nVISIBLE SUM OF a AN 2\n'
+                                 'VISIBLE QUOSHUNT OF a AN 3\nVISIBLE SUM OF "a" AN 3\nKTHXBYE\n')
+        self.assertEqual(output.split('\n'), ['9007199254740995', '3002399751580331', 'a3'])
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,108 @@
+# test/test_lexer_unittest.py
+
+import glob
+import mmap
+import unittest
+
+from lexer import Lexer, TokenColumns
+from parser import Parser, NO_CHILDREN
+
+
+class TestLexer(unittest.TestCase):
+
+    def token_summary(self, source):
+        return [(t.type, t.value, t.line, t.position) for t in Lexer(source).tokenize()]
+
+    def test_columns_are_accurate(self):
+        tokens = self.token_summary('HAI\n  I HAS A  x ITZ SUM OF 1 AN 2\nKTHXBYE')
+        self.assertEqual(tokens[1], ('VAR_DECLARATION', 'I HAS A', 2, 3))
+        self.assertEqual(tokens[2], ('IDENTIFIER', 'x', 2, 12))
+        self.assertEqual(tokens[4], ('OP_ADD', 'SUM OF', 2, 18))
+        self.assertEqual(tokens[-1], ('PROGRAM_END', 'KTHXBYE', 3, 1))
+
+    def test_string_literal_keeps_whitespace(self):
+        tokens = self.token_summary('VISIBLE "a  b\tc "')
+        self.assertEqual(tokens[1], ('STRING_LITERAL', 'a  b\tc ', 1, 9))
+
+    def test_multi_word_keywords_allow_extra_spaces(self):
+        tokens = self.token_summary('I  HAS\tA x\nO RLY?')
+        self.assertEqual([t[0] for t in tokens], ['VAR_DECLARATION', 'IDENTIFIER', 'IF_START'])
+
+    def test_keywords_must_be_whole_words(self):
+        tokens = self.token_summary('SUMOF RX ANY')
+        self.assertEqual([t[0] for t in tokens], ['IDENTIFIER', 'IDENTIFIER', 'IDENTIFIER'])
+
+    def test_comments_are_skipped(self):
+        tokens = self.token_summary('VISIBLE 1 BTW VISIBLE 2\nOBTW\nVISIBLE 3\nTLDR\nVISIBLE 4')
+        self.assertEqual(tokens, [
+            ('OUTPUT', 'VISIBLE', 1, 1), ('INT_LITERAL', 1, 1, 9),
+            ('OUTPUT', 'VISIBLE', 5, 1), ('INT_LITERAL', 4, 5, 9),
+        ])
+
+    def test_literals(self):
+        tokens = self.token_summary('12 -3 4.5 -.5 WIN FAIL 1x')
+        self.assertEqual([t[:2] for t in tokens], [
+            ('INT_LITERAL', 12), ('INT_LITERAL', -3), ('FLOAT_LITERAL', 4.5),
+            ('FLOAT_LITERAL', -0.5), ('BOOL_LITERAL', True), ('BOOL_LITERAL', False),
+            ('UNKNOWN', '1x'),
+        ])
+
+    def test_parser_consumes_token_iterator_lazily(self):
+        tokens = Lexer('HAI\nVISIBLE "x"\nKTHXBYE\nthis is never read').iter_tokens()
+        ast = Parser(tokens).parse()
+        self.assertEqual(ast.children[0].type, 'OUTPUT')
+        self.assertEqual(next(tokens).value, 'this')
+
+    def test_columnar_store_round_trips_tokens(self):
+        source = open("test/final_test.lol").read()
+        tokens = Lexer(source).tokenize()
+        columns = Lexer(source).tokenize_columnar()
+        self.assertEqual(len(columns), len(tokens))
+        self.assertLess(len(columns.values), len(tokens))
+        for expected, actual in zip(tokens, columns):
+            self.assertEqual((actual.type, actual.value, actual.line, actual.position),
+                             (expected.type, expected.value, expected.line, expected.position))
+            self.assertIs(type(actual.value), type(expected.value))
+
+    def test_parser_accepts_columnar_store(self):
+        source = open("test/final_test.lol").read()
+        expected = Parser(Lexer(source).tokenize()).parse()
+        actual = Parser(Lexer(source).tokenize_columnar()).parse()
+        self.assertEqual([n.type for n in actual.children], [n.type for n in expected.children])
+
+    def test_tokens_and_leaf_nodes_are_compact(self):
+        tokens = Lexer('HAI\nI HAS A x ITZ SUM OF x AN 1\nKTHXBYE').tokenize()
+        self.assertFalse(hasattr(tokens[0], '__dict__'))
+        ast = Parser(tokens).parse()
+        self.assertFalse(hasattr(ast, '__dict__'))
+        left, right = ast.children[0].children[0].children
+        self.assertIs(left.children, NO_CHILDREN)
+        self.assertIs(right.children, NO_CHILDREN)
+
+    def test_byte_sources_match_text(self):
+        for path in sorted(glob.glob("test/*.lol")):
+            with self.subTest(path=path), open(path, 'rb') as source_file:
+                expected = self.token_summary(source_file.read().decode('utf-8'))
+                with mmap.mmap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    self.assertEqual([(t.type, t.value, t.line, t.position) for t in Lexer(mapped).tokenize()],
+                                     expected)
+
+    def test_byte_sources_match_text_with_unicode_whitespace(self):
+        for space in ('\u00a0', '\u2003', '\u3000', '\x1f', ' '):
+            source = f'HAI\nVISIBLE{space}"x"\nI HAS A{space}n ITZ 1{space}BTW note\nVISIBLE n\nKTHXBYE'
+            with self.subTest(space=repr(space)):
+                summary = [(t.type, t.value, t.line, t.position) for t in Lexer(source.encode('utf-8')).tokenize()]
+                self.assertEqual(summary, self.token_summary(source))
+                self.assertNotIn('UNKNOWN', [token_type for token_type, *_ in summary])
+
+    def test_byte_source_decodes_values_only(self):
+        tokens = Lexer('HAI\nI HAS A café ITZ "héllo"\nVISIBLE café\nKTHXBYE'.encode('utf-8')).tokenize()
+        self.assertEqual([(t.type, t.value, t.line, t.position) for t in tokens[1:4]], [
+            ('VAR_DECLARATION', 'I HAS A', 2, 1), ('IDENTIFIER', 'café', 2, 9), ('VAR_ASSIGNMENT', 'ITZ', 2, 15),
+        ])
+        self.assertEqual(tokens[4].value, 'héllo')
+        self.assertIs(tokens[2].value, tokens[6].value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+# test/test_limits_unittest.py
+
+import sys
+import time
+import unittest
+from unittest import mock
+
+from lolcode import run_source
+from limits import ResourceLimits, ResourceLimitExceeded, DEADLINE_CHECK_INTERVAL
+
+SOURCE = """HAI
+I HAS A x ITZ 1
+VISIBLE x
+BOTH SAEM x AN 1
+O RLY?
+  YA RLY
+    VISIBLE 2
+    VISIBLE 3
+OIC
+VISIBLE 4
+KTHXBYE
+"""
+
+
+class TestResourceLimits(unittest.TestCase):
+
+    def run_limited(self, source=SOURCE, stdin=None, **limits):
+        return run_source(source, stdin=stdin, limits=ResourceLimits(**limits))
+
+    def assert_limit(self, result, message, line):
+        self.assertEqual(len(result.errors), 1)
+        error = result.errors[0]
+        self.assertEqual(error.phase, 'limit')
+        self.assertEqual(error.line, line)
+        self.assertIn(message, error.message)
+
+    def test_within_limits(self):
+        result = self.run_limited(statements=7, output_bytes=8, string_length=10, seconds=60)
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.output, "1\n2\n3\n4\n")
+
+    def test_statement_budget_stops_inside_block(self):
+        result = self.run_limited(statements=6)
+        self.assertEqual(result.output, "1\n2\n")
+        self.assert_limit(result, "Statement limit of 6", 8)
+
+    def test_statement_budget_spent_before_branch(self):
+        # The top-level block is charged for all five of its statements first
+        result = self.run_limited(statements=5)
+        self.assertEqual(result.output, "1\n")
+        self.assert_limit(result, "Statement limit", 7)
+
+    def test_output_budget(self):
+        result = self.run_limited(output_bytes=5)
+        self.assertEqual(result.output, "1\n2\n")
+        self.assert_limit(result, "Output limit of 5 bytes", 8)
+
+    def test_output_counts_utf8_bytes(self):
+        result = self.run_limited('HAI\nVISIBLE "héllo"\nKTHXBYE\n', output_bytes=6)
+        self.assert_limit(result, "Output limit", 2)
+
+    def test_string_length_smoosh(self):
+        source = 'HAI\nI HAS A s ITZ "ab"\n' + 's R SMOOSH s AN s\n' * 10 + 'KTHXBYE\n'
+        result = self.run_limited(source, string_length=100)
+        self.assert_limit(result, "String length limit of 100", 8)
+        self.assertEqual(len(result.variables['s']), 64)
+
+    def test_string_length_inside_one_expression(self):
+        # Every SUM OF doubles IT, so one statement could build a huge YARN
+        source = 'HAI\nSMOOSH "ab" AN ""\nVISIBLE ' + 'SUM OF ' * 40 + 'IT' + ' AN IT' * 40 + '\nKTHXBYE\n'
+        result = self.run_limited(source, string_length=1000)
+        self.assert_limit(result, "String length", 3)
+
+    def test_string_length_total(self):
+        # Adding a BUKKIT's total to it doubles the YARN on every pass
+        source = ('HAI\nI HAS A b ITZ A BUKKIT\nb HAS A "ab"\nIM IN YR a UPPIN YR i TIL BOTH SAEM i AN 10\n'
+                  '  b HAS A TOTAL OF b\nIM OUTTA YR a\nKTHXBYE\n')
+        self.assert_limit(self.run_limited(source, string_length=100), "String length limit of 100", 5)
+
+    def test_string_length_concatenation_and_input(self):
+        source = 'HAI\nI HAS A s ITZ "ab"\ns R SUM OF s AN "cd"\nKTHXBYE\n'
+        self.assert_limit(self.run_limited(source, string_length=3), "String length", 3)
+        source = 'HAI\nI HAS A s\nGIMMEH s\nKTHXBYE\n'
+        self.assert_limit(self.run_limited(source, stdin="x" * 50, string_length=10), "String length", 3)
+
+    def test_deadline(self):
+        result = self.run_limited(seconds=0)
+        self.assertEqual(result.output, "")
+        self.assert_limit(result, "Time limit", 2)
+
+    def test_deadline_inside_one_block(self):
+        # The clock passes the deadline during the first stretch of
+        # DEADLINE_CHECK_INTERVAL statements of the top-level block, which
+        # has no nested block to check it
+        clock = mock.Mock(perf_counter=mock.Mock(side_effect=[0.0, 0.5, 2.0]))
+        source = 'HAI\n' + ''.join(f'VISIBLE {i}\n' for i in range(DEADLINE_CHECK_INTERVAL * 2)) + 'KTHXBYE\n'
+        with mock.patch('limits.time', clock):
+            result = self.run_limited(source, seconds=1)
+        self.assertEqual(result.output, ''.join(f"{i}\n" for i in range(DEADLINE_CHECK_INTERVAL)))
+        self.assert_limit(result, "Time limit of 1 seconds", DEADLINE_CHECK_INTERVAL + 2)
+
+    def test_squaring_stops_at_the_number_limit(self):
+        # Each statement doubles the digits of x; unchecked, the run would not
+        # finish. NUMBRs are capped even though no number limit was given.
+        source = 'HAI\nI HAS A x ITZ 2\n' + 'x R PRODUKT OF x AN x\n' * 30 + 'VISIBLE x\nKTHXBYE\n'
+        start = time.perf_counter()
+        result = self.run_limited(source, seconds=1, statements=1000)
+        self.assertLess(time.perf_counter() - start, 1)
+        self.assert_limit(result, f"Number size limit of {sys.get_int_max_str_digits()} digits", 16)
+        result = self.run_limited(source, number_digits=50)
+        self.assert_limit(result, "Number size limit of 50 digits", 10)
+        # A NUMBR may not have more digits than a YARN may have characters
+        result = self.run_limited(source, string_length=100)
+        self.assert_limit(result, "Number size limit of 100 digits", 11)
+
+    def test_number_limit_covers_every_growing_operator(self):
+        # n is a variable, so none of these are folded before the run
+        cases = [
+            'VISIBLE PRODUKT OF n AN n',
+            'VISIBLE SUM OF n AN 99999999999999999',
+            'VISIBLE DIFF OF -99999999999999999 AN n',
+            'I HAS A b ITZ A BUKKIT\nb HAS A 99999999999999999\nb HAS A 99999999999999999\nVISIBLE TOTAL OF b',
+            'I HAS A b ITZ A BUKKIT\nb HAS A "x"\nb HAS A 99999999999999999\nVISIBLE SUM OF EACH b AN n',
+        ]
+        for body in cases:
+            with self.subTest(body=body):
+                result = self.run_limited(f'HAI\nI HAS A n ITZ 99999999999\n{body}\nKTHXBYE\n', number_digits=17)
+                self.assertEqual(result.errors[0].phase, 'limit')
+                self.assertIn("Number size limit of 17 digits", result.errors[0].message)
+        result = self.run_limited('HAI\nVISIBLE PRODUKT OF 1000 AN 1000\nKTHXBYE\n', number_digits=7)
+        self.assertEqual(result.output, "1000000\n")
+
+    def test_number_limit_on_input(self):
+        source = 'HAI\nI HAS A n\nGIMMEH n\nKTHXBYE\n'
+        self.assert_limit(self.run_limited(source, stdin="123456\n", number_digits=5), "Number size", 3)
+
+    def test_exception_fields(self):
+        error = ResourceLimitExceeded('statements', 10, 4)
+        self.assertEqual((error.limit, error.maximum, error.line), ('statements', 10, 4))
+        self.assertEqual(str(error), "Statement limit of 10 statements exceeded on line 4")
+
+    def test_limits_round_trip(self):
+        limits = ResourceLimits(statements=10, seconds=1.5, number_digits=20)
+        self.assertEqual(limits.to_dict(), {'statements': 10, 'seconds': 1.5, 'number_digits': 20})
+        self.assertEqual(ResourceLimits.from_dict(limits.to_dict()).to_dict(), limits.to_dict())
+
+    def test_other_engines_rejected(self):
+        for engine in ('vm', 'python'):
+            with self.subTest(engine=engine):
+                with self.assertRaises(ValueError):
+                    run_source(SOURCE, engine=engine, limits=ResourceLimits(statements=10))
+        with self.assertRaises(ValueError):
+            run_source(SOURCE, profile=True, limits=ResourceLimits(statements=10))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+# test/test_loops_unittest.py
+
+import unittest
+
+from lolcode import run_source, build_program
+from compiler import COUNT_NEXT, POP_JUMP_IF_TRUE
+from interpreter import Interpreter
+from lexer import Lexer
+from parser import Parser, counting_bound
+from semantic_analyzer import SemanticAnalyzer
+from optimizer import Optimizer
+from limits import ResourceLimits
+from output import MemorySink
+from engine_support import EngineTestCase
+
+
+class TestLoops(EngineTestCase):
+
+    def loop_node(self, source):
+        ast = SemanticAnalyzer(Parser(Lexer(source).tokenize()).parse()).analyze()
+        ast = Optimizer(ast).optimize()
+        return next(node for node in ast.children if node.type == 'LOOP')
+
+    def test_counting_loop(self):
+        result = self.run_everywhere(
+            "HAI\nIM IN YR lup UPPIN YR i TIL BOTH SAEM i AN 3\n  VISIBLE i\nIM OUTTA YR lup\nKTHXBYE\n")
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.output, "0\n1\n2\n")
+        # The condition's last value is left in IT
+        self.assertIs(result.variables['IT'], True)
+
+    def test_declared_variable_keeps_its_value(self):
+        result = self.run_everywhere(
+            "HAI\nI HAS A n ITZ 10\nIM IN YR down NERFIN YR n WILE DIFFRINT n AN 7\n"
+            "  VISIBLE n\nIM OUTTA YR down\nVISIBLE n\nKTHXBYE\n")
+        self.assertEqual(result.output, "10\n9\n8\n7\n")
+
+    def test_loop_variable_is_local_to_the_loop(self):
+        source = ("HAI\nIM IN YR a UPPIN YR i TIL BOTH SAEM i AN 2\nIM OUTTA YR a\n"
+                  "I HAS A i ITZ \"later\"\nVISIBLE i\nKTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source).output, "later\n")
+        result = run_source("HAI\nIM IN YR a UPPIN YR i TIL BOTH SAEM i AN 2\nIM OUTTA YR a\nVISIBLE i\nKTHXBYE\n")
+        self.assertEqual(result.errors[0].message, "Variable 'i' not declared")
+
+    def test_final_value_of_a_reused_loop_variable(self):
+        source = ("HAI\nIM IN YR a UPPIN YR i TIL BOTH SAEM i AN 3\nIM OUTTA YR a\nFAIL\nO RLY?\n  YA RLY\n"
+                  "    IM IN YR b UPPIN YR i TIL BOTH SAEM i AN 5\n    IM OUTTA YR b\nOIC\nKTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source).variables, {'IT': False, 'i': 3})
+        result = self.run_everywhere(source.replace("OIC\n", "OIC\nI HAS A i\n"))
+        self.assertEqual(result.variables, {'IT': False, 'i': None})
+
+    def test_gtfo_and_nesting(self):
+        result = self.run_everywhere(open("test/loops.lol").read())
+        self.assertEqual(result.output.split(), ["0", "1", "2", "n=10", "n=9", "n=8", "4", "00", "01", "10", "11"])
+
+    def test_body_that_changes_the_variable(self):
+        source = ("HAI\nI HAS A k ITZ 0\nIM IN YR b UPPIN YR k WILE DIFFRINT k AN 9\n"
+                  "  k R SUM OF k AN 2\n  VISIBLE k\nIM OUTTA YR b\nKTHXBYE\n")
+        self.assertIsNone(counting_bound(self.loop_node(source)))
+        self.assertEqual(self.run_everywhere(source).output, "2\n5\n8\n")
+
+    def test_non_numeric_variable(self):
+        source = ('HAI\nI HAS A v ITZ "1.5"\nI HAS A w\nIM IN YR a UPPIN YR v TIL BOTH SAEM v AN 4.5\n'
+                  '  VISIBLE v\nIM OUTTA YR a\nIM IN YR b UPPIN YR w TIL BOTH SAEM w AN 2\n'
+                  '  VISIBLE w\nIM OUTTA YR b\nKTHXBYE\n')
+        self.assertEqual(self.run_everywhere(source).output, "1.5\n2.5\n3.5\nNOOB\n1\n")
+
+    def test_condition_reads_it(self):
+        source = ("HAI\nI HAS A n ITZ 0\nIM IN YR a WILE DIFFRINT IT AN 3\n"
+                  "  n R SUM OF n AN 1\n  SUM OF n AN 0\nIM OUTTA YR a\nVISIBLE n\nKTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source).output, "3\n")
+
+    def test_counting_bound(self):
+        loop = self.loop_node("HAI\nIM IN YR a UPPIN YR i TIL BOTH SAEM 5 AN i\nIM OUTTA YR a\nKTHXBYE\n")
+        self.assertEqual(counting_bound(loop), 5)
+        loop = self.loop_node("HAI\nIM IN YR a UPPIN YR i TIL BOTH SAEM i AN SUM OF 2 AN 3\nIM OUTTA YR a\nKTHXBYE\n")
+        self.assertEqual(counting_bound(loop), 5)
+        loop = self.loop_node("HAI\nI HAS A j ITZ 5\nIM IN YR a UPPIN YR i TIL BOTH SAEM i AN j\nIM OUTTA YR a\nKTHXBYE\n")
+        self.assertIsNone(counting_bound(loop))
+
+    def test_vm_fuses_counting_loops(self):
+        counting = build_program("HAI\nIM IN YR a UPPIN YR i TIL BOTH SAEM i AN 3\nIM OUTTA YR a\nKTHXBYE\n", 'vm')
+        self.assertIn(COUNT_NEXT, counting.code[::2])
+        general = build_program("HAI\nI HAS A j ITZ 3\nIM IN YR a UPPIN YR i TIL BOTH SAEM i AN j\n"
+                                "IM OUTTA YR a\nKTHXBYE\n", 'vm')
+        self.assertIn(POP_JUMP_IF_TRUE, general.code[::2])
+
+    def test_body_is_resolved_once(self):
+        source = ("HAI\nIM IN YR a UPPIN YR i TIL BOTH SAEM i AN 3\n"
+                  "  IM IN YR b UPPIN YR j TIL BOTH SAEM j AN 3\n    VISIBLE j\n  IM OUTTA YR b\n"
+                  "IM OUTTA YR a\nKTHXBYE\n")
+        ast = Optimizer(SemanticAnalyzer(Parser(Lexer(source).tokenize()).parse()).analyze()).optimize()
+        interpreter = Interpreter(ast, stdout=MemorySink())
+        calls = []
+        resolve_body = interpreter.resolve_body
+        interpreter.resolve_body = lambda body: calls.append(body) or resolve_body(body)
+        interpreter.interpret()
+        self.assertEqual(interpreter.stdout.getvalue(), "0\n1\n2\n" * 3)
+        # Once per loop, not once per pass
+        self.assertEqual(len(calls), 2)
+
+    def test_errors(self):
+        cases = [
+            ("HAI\nIM IN YR a\nIM OUTTA YR b\nKTHXBYE\n", 'syntax', "Expected 'IM OUTTA YR a' to end loop"),
+            ("HAI\nIM IN YR a\nVISIBLE 1\n", 'syntax', "Expected 'IM OUTTA YR a' to end loop"),
+            ("HAI\nIM IN YR a UPPIN i\nIM OUTTA YR a\nKTHXBYE\n", 'syntax', "Expected YR"),
+            ("HAI\nGTFO\nKTHXBYE\n", 'semantic', "GTFO outside of a loop"),
+        ]
+        for source, phase, message in cases:
+            with self.subTest(source=source):
+                result = run_source(source)
+                self.assertEqual(result.errors[0].phase, phase)
+                self.assertIn(message, result.errors[0].message)
+
+    def test_limits_stop_endless_loops(self):
+        source = "HAI\nIM IN YR forever\nIM OUTTA YR forever\nKTHXBYE\n"
+        result = run_source(source, limits=ResourceLimits(statements=1000))
+        self.assertEqual([(error.phase, error.line) for error in result.errors], [('limit', 2)])
+        result = run_source(source.replace("IM OUTTA", "VISIBLE 1\nIM OUTTA"), limits=ResourceLimits(output_bytes=10))
+        self.assertEqual(result.output, "1\n" * 5)
+        self.assertEqual([(error.phase, error.line) for error in result.errors], [('limit', 3)])
+
+    def test_profile_counts_every_pass(self):
+        source = "HAI\nIM IN YR a UPPIN YR i TIL BOTH SAEM i AN 4\n  VISIBLE i\nIM OUTTA YR a\nKTHXBYE\n"
+        result = run_source(source, profile=True)
+        self.assertEqual(result.profile.node_types['OUTPUT'][0], 4)
+        self.assertEqual(result.profile.node_types['OP_EQUAL'][0], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
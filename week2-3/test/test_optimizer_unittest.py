@@ -0,0 +1,130 @@
+# test/test_optimizer_unittest.py
+
+import unittest
+import subprocess
+import sys
+import os
+import tempfile
+
+from lexer import Lexer
+from parser import Parser
+from semantic_analyzer import SemanticAnalyzer
+from optimizer import Optimizer
+from interpreter import Interpreter
+from engine_support import ENGINES
+
+
+class TestOptimizer(unittest.TestCase):
+
+    def optimize(self, source):
+        ast = SemanticAnalyzer(Parser(Lexer(source).tokenize()).parse()).analyze()
+        return Optimizer(ast).optimize()
+
+    def run_source(self, source, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.lol', delete=False) as f:
+            f.write(source)
+        try:
+            result = subprocess.run(
+                [sys.executable, "main.py", "--no-cache", *args, f.name],
+                input="5\n",
+                capture_output=True,
+                text=True
+            )
+            return result.stdout
+        finally:
+            os.unlink(f.name)
+
+    def test_folds_nested_arithmetic(self):
+        ast = self.optimize("HAI\nI HAS A x ITZ SUM OF 2 AN PRODUKT OF 3 AN 4\nKTHXBYE")
+        expr = ast.children[0].children[0]
+        self.assertEqual(expr.type, 'FOLDED')
+        self.assertEqual(expr.value, 14)
+
+    def test_folds_smoosh_of_literals(self):
+        ast = self.optimize('HAI\nVISIBLE SMOOSH "HAI " AN 1 AN " " AN WIN\nKTHXBYE')
+        expr = ast.children[0].children[0]
+        self.assertEqual(expr.type, 'FOLDED')
+        self.assertEqual(expr.value, "HAI 1 WIN")
+
+    def test_folded_expression_still_sets_it(self):
+        ast = self.optimize("HAI\nI HAS A x ITZ SUM OF 2 AN 3\nKTHXBYE")
+        interpreter = Interpreter(ast)
+        interpreter.interpret()
+        self.assertEqual(interpreter.variables, {'IT': 5, 'x': 5})
+
+    def test_leaves_variables_and_runtime_errors_alone(self):
+        ast = self.optimize("HAI\nI HAS A x ITZ 1\nVISIBLE SUM OF x AN 1\nVISIBLE QUOSHUNT OF 1 AN 0\nKTHXBYE")
+        self.assertEqual(ast.children[1].children[0].type, 'OP_ADD')
+        self.assertEqual(ast.children[2].children[0].type, 'OP_DIV')
+
+    def test_removes_dead_branches(self):
+        ast = self.optimize(
+            'HAI\nBOTH SAEM 1 AN 2\nO RLY?\nYA RLY\nVISIBLE "yes"\nNO WAI\nVISIBLE "no"\nOIC\nKTHXBYE'
+        )
+        self.assertEqual([node.type for node in ast.children], ['VAR_ASSIGNMENT', 'OUTPUT'])
+        self.assertEqual(ast.children[1].children[0].value, "no")
+
+    def test_keeps_branches_when_it_is_unknown(self):
+        ast = self.optimize(
+            'HAI\nI HAS A n\nGIMMEH n\nO RLY?\nYA RLY\nVISIBLE "yes"\nOIC\nKTHXBYE'
+        )
+        self.assertEqual(ast.children[-1].type, 'CONDITIONAL')
+
+    def test_marks_dead_it_stores(self):
+        ast = self.optimize(
+            "HAI\nI HAS A x ITZ 1\nI HAS A y\n"
+            "y R SUM OF PRODUKT OF x AN 2 AN x\n"
+            "y R SUM OF PRODUKT OF x AN 2 AN IT\n"
+            "VISIBLE y\nKTHXBYE"
+        )
+        first, second = ast.children[2], ast.children[3]
+        # The first assignment's IT is overwritten by the second one unread
+        self.assertFalse(first.stores_it)
+        self.assertFalse(first.children[0].stores_it)
+        self.assertFalse(first.children[0].children[0].stores_it)
+        # IT is read by the outer operator and observable at program end
+        self.assertTrue(second.children[0].children[0].stores_it)
+        self.assertTrue(second.stores_it)
+
+        interpreter = Interpreter(ast)
+        interpreter.interpret()
+        self.assertEqual(interpreter.variables, {'IT': 4, 'x': 1, 'y': 4})
+
+    def test_it_stays_live_before_conditional(self):
+        ast = self.optimize(
+            'HAI\nI HAS A n\nGIMMEH n\nBOTH SAEM n AN SUM OF n AN 1\n'
+            'O RLY?\nYA RLY\nVISIBLE "yes"\nOIC\nKTHXBYE'
+        )
+        # The comparison statement assigns IT, which the conditional reads
+        statement = ast.children[2]
+        self.assertTrue(statement.stores_it)
+        self.assertFalse(statement.children[0].stores_it)
+        self.assertFalse(statement.children[0].children[1].stores_it)
+
+    def test_engines_agree_on_optimized_programs(self):
+        source = (
+            'HAI\n'
+            'I HAS A x ITZ SUM OF 2 AN PRODUKT OF 3 AN 4\n'
+            'VISIBLE SMOOSH PRODUKT OF 3 AN 4 AN IT\n'
+            'VISIBLE x\n'
+            'O RLY?\nYA RLY\nVISIBLE "yes"\nNO WAI\nVISIBLE "no"\nOIC\n'
+            'NOT WIN\n'
+            'O RLY?\nYA RLY\nVISIBLE "dead"\nOIC\n'
+            'VISIBLE IT\n'
+            'I HAS A y ITZ SUM OF PRODUKT OF 2 AN x AN 1\n'
+            'y R SUM OF PRODUKT OF y AN 2 AN y\n'
+            'y R SUM OF PRODUKT OF y AN 2 AN IT\n'
+            'VISIBLE SMOOSH y AN " " AN IT\n'
+            'KTHXBYE\n'
+        )
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(self.run_source(source, f"--engine={engine}"), "1212\n14\nyes\nFAIL\n348 348\n")
+
+    def test_dump_optimized_ast(self):
+        output = self.run_source("HAI\nVISIBLE SUM OF 2 AN PRODUKT OF 3 AN 4\nKTHXBYE\n", "--dump-optimized-ast")
+        self.assertEqual(output, "PROGRAM ('IT',)\n  OUTPUT\n    FOLDED 14\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# test/test_output_unittest.py
+
+import io
+import unittest
+import subprocess
+import sys
+
+from output import BufferedSink, MemorySink, StreamSink, as_sink
+from lolcode import run_source
+from engine_support import ENGINES
+
+
+def text_stream():
+    return io.TextIOWrapper(io.BytesIO(), encoding='utf-8')
+
+
+class TestOutputSinks(unittest.TestCase):
+
+    def written(self, stream):
+        return stream.buffer.getvalue().decode('utf-8')
+
+    def test_buffered_sink_flushes_on_size(self):
+        stream = text_stream()
+        sink = BufferedSink(stream, flush_size=8)
+        sink.write("1234\n")
+        self.assertEqual(self.written(stream), "")
+        sink.write("5678\n")
+        self.assertEqual(self.written(stream), "1234\n5678\n")
+
+    def test_buffered_sink_flushes_on_input_and_exit(self):
+        stream = text_stream()
+        sink = BufferedSink(stream, flush_size=None)
+        sink.write("prompt\n")
+        sink.input_requested()
+        self.assertEqual(self.written(stream), "prompt\n")
+
+        sink = BufferedSink(stream, flush_size=None, flush_on_input=False)
+        sink.write("more\n")
+        sink.input_requested()
+        self.assertEqual(self.written(stream), "prompt\n")
+        sink.flush()
+        self.assertEqual(self.written(stream), "prompt\nmore\n")
+
+    def test_buffered_sink_keeps_text_layer_order(self):
+        stream = text_stream()
+        stream.write("before\n")
+        sink = BufferedSink(stream)
+        sink.write("after ✓\n")
+        sink.flush()
+        self.assertEqual(self.written(stream), "before\nafter ✓\n")
+
+    def test_as_sink(self):
+        memory = MemorySink()
+        self.assertIs(as_sink(memory), memory)
+        self.assertIsInstance(as_sink(io.StringIO()), StreamSink)
+        self.assertIsInstance(as_sink(text_stream()), BufferedSink)
+
+    def test_engines_write_to_sink_and_flush_on_error(self):
+        source = 'HAI\nVISIBLE "a"\nVISIBLE 1\nVISIBLE QUOSHUNT OF 1 AN 0\nKTHXBYE\n'
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                stream = text_stream()
+                result = run_source(source, stdout=BufferedSink(stream, flush_size=None), engine=engine)
+                self.assertEqual(self.written(stream), "a\n1\n")
+                self.assertEqual(str(result.errors[0]), "Error: Division by zero")
+
+    def test_cli_output_precedes_errors(self):
+        result = subprocess.run(
+            [sys.executable, "main.py", "--no-cache", "/dev/stdin"],
+            input='HAI\nVISIBLE "a"\nVISIBLE QUOSHUNT OF 1 AN 0\nKTHXBYE\n',
+            capture_output=True,
+            text=True
+        )
+        self.assertEqual(result.stdout, "a\nError: Division by zero\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
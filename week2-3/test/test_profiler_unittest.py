@@ -0,0 +1,62 @@
+# test/test_profiler_unittest.py
+
+import io
+import unittest
+
+from lolcode import run_source
+from lexer import Lexer
+from parser import Parser
+
+SOURCE = """HAI
+I HAS A x ITZ 2
+VISIBLE SUM OF x AN 1
+x R PRODUKT OF x AN 3
+BOTH SAEM x AN 6
+O RLY?
+  YA RLY
+    VISIBLE "six"
+OIC
+KTHXBYE
+"""
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_nodes_carry_source_lines(self):
+        ast = Parser(Lexer(SOURCE).tokenize()).parse()
+        self.assertEqual([statement.line for statement in ast.children], [2, 3, 4, 5, 6])
+        self.assertEqual(ast.children[1].children[0].line, 3)
+
+    def test_profile_counts(self):
+        result = run_source(SOURCE, profile=True)
+        self.assertEqual(result.output, "3\nsix\n")
+        profile = result.profile
+        self.assertEqual(profile.node_types['OUTPUT'][0], 2)
+        self.assertEqual(profile.node_types['VARIABLE'][0], 3)
+        self.assertEqual(profile.lines[8][0], 1)
+        for count, total, self_time in profile.node_types.values():
+            self.assertGreaterEqual(total, self_time)
+        self.assertIn('run', result.cpu_timings)
+
+    def test_collapsed_stacks(self):
+        source = 'HAI\nI HAS A x ITZ 1\n' + 'x R SUM OF x AN 1\n' * 200 + 'KTHXBYE\n'
+        result = run_source(source, profile=True)
+        collapsed = io.StringIO()
+        result.profile.write_collapsed(collapsed)
+        lines = collapsed.getvalue().splitlines()
+        self.assertTrue(lines)
+        for line in lines:
+            stack, weight = line.rsplit(' ', 1)
+            self.assertTrue(stack.startswith('PROGRAM;'))
+            self.assertGreater(int(weight), 0)
+        self.assertIn('PROGRAM;VAR_ASSIGNMENT:3;OP_ADD:3;VARIABLE:3', result.profile.stacks)
+
+    def test_disabled_by_default(self):
+        for engine in ['tree', 'vm']:
+            with self.subTest(engine=engine):
+                self.assertIsNone(run_source(SOURCE, engine=engine).profile)
+        self.assertIsNone(run_source(SOURCE, engine='vm', profile=True).profile)
+
+
+if __name__ == '__main__':
+    unittest.main()
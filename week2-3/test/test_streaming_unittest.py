@@ -0,0 +1,126 @@
+# test/test_streaming_unittest.py
+
+import glob
+import io
+import unittest
+from unittest import mock
+
+import lexer
+from lexer import Lexer
+from lolcode import run_source, run_stream
+from output import OutputSink
+from parser import Parser
+from limits import ResourceLimits
+
+SOURCE = """HAI
+I HAS A x ITZ 1
+OBTW a block comment
+  spanning lines TLDR VISIBLE "after comment"
+VISIBLE SUM OF x AN 2
+BOTH SAEM x AN 1
+O RLY?
+  YA RLY
+    VISIBLE "one"
+  NO WAI
+    VISIBLE "other"
+OIC
+x R PRODUKT OF x AN 5
+VISIBLE x BTW done
+KTHXBYE
+"""
+
+
+def token_summary(tokens):
+    return [(token.type, token.value, token.line, token.position) for token in tokens]
+
+
+class ReadCounter(io.StringIO):
+    """Text stream that remembers how many characters have been read."""
+
+    def __init__(self, text):
+        super().__init__(text)
+        self.chars_read = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.chars_read += len(data)
+        return data
+
+
+class RecordingSink(OutputSink):
+    """Notes how much of the source had been read when each line was printed."""
+
+    def __init__(self, source):
+        self.source = source
+        self.reads = []
+
+    def write(self, text):
+        self.reads.append(self.source.chars_read)
+
+
+class TestStreaming(unittest.TestCase):
+
+    def test_stream_tokens_match_whole_source(self):
+        for chunk_size in (1, 5, 64, 4096):
+            with self.subTest(chunk_size=chunk_size), mock.patch.object(lexer, 'STREAM_CHUNK_SIZE', chunk_size):
+                for source in (SOURCE, SOURCE.rstrip('\n'), "HAI\nOBTW never closed\nKTHXBYE\n"):
+                    expected = token_summary(Lexer(source).iter_tokens())
+                    self.assertEqual(token_summary(Lexer(io.StringIO(source)).iter_tokens()), expected)
+
+    def test_parser_releases_consumed_tokens(self):
+        source = "HAI\n" + "VISIBLE SUM OF 1 AN 2\n" * 1000 + "KTHXBYE\n"
+        parser = Parser(Lexer(io.StringIO(source)).iter_tokens())
+        for statement in parser.iter_statements():
+            self.assertLess(len(parser.tokens), 10)
+        self.assertEqual(statement.type, 'OUTPUT')
+
+    def test_same_results_as_run_source(self):
+        sources = [SOURCE] + [open(path).read() for path in sorted(glob.glob("test/*.lol"))]
+        for source in sources:
+            expected = run_source(source, stdin="5\n3\n")
+            if expected.errors:
+                continue
+            with self.subTest(source=source[:40]):
+                result = run_stream(io.StringIO(source), stdin="5\n3\n")
+                self.assertEqual(result.errors, [])
+                self.assertEqual(result.output, expected.output)
+                self.assertEqual(result.variables, expected.variables)
+                self.assertIn('stream', result.timings)
+
+    def test_output_starts_before_the_source_is_read(self):
+        source = ReadCounter("HAI\n" + 'VISIBLE "line"\n' * 200000 + "KTHXBYE\n")
+        sink = RecordingSink(source)
+        run_stream(source, stdout=sink)
+        self.assertEqual(len(sink.reads), 200000)
+        self.assertLess(sink.reads[0], len(source.getvalue()) // 4)
+
+    def test_comment_end_split_across_chunks(self):
+        # With two-character chunks the TLDR arrives as "\nT", "LD", "R\n"
+        source = ReadCounter("HAI\nOBTW c\nTLDR\n" + 'VISIBLE "line"\n' * 2000 + "KTHXBYE\n")
+        sink = RecordingSink(source)
+        with mock.patch.object(lexer, 'STREAM_CHUNK_SIZE', 2):
+            run_stream(source, stdout=sink)
+        self.assertEqual(len(sink.reads), 2000)
+        self.assertLess(sink.reads[0], len(source.getvalue()) // 4)
+
+    def test_errors_stop_the_stream(self):
+        result = run_stream(io.StringIO('HAI\nVISIBLE "before"\nVISIBLE SUM OF 1\nVISIBLE "after"\nKTHXBYE\n'))
+        self.assertEqual(result.output, "before\n")
+        self.assertEqual([(error.phase, error.line) for error in result.errors], [('syntax', 4)])
+
+        result = run_stream(io.StringIO('HAI\nVISIBLE "before"\nVISIBLE y\nVISIBLE "after"\nKTHXBYE\n'))
+        self.assertEqual(result.output, "before\n")
+        self.assertEqual([error.phase for error in result.errors], ['semantic'])
+
+        result = run_stream(io.StringIO('HAI\nVISIBLE "before"\n'))
+        self.assertEqual(result.output, "before\n")
+        self.assertEqual(result.errors[0].message, "Program must end with 'KTHXBYE'")
+
+    def test_limits(self):
+        result = run_stream(io.StringIO(SOURCE), limits=ResourceLimits(statements=3))
+        self.assertEqual(result.output, "after comment\n3\n")
+        self.assertEqual([(error.phase, error.line) for error in result.errors], [('limit', 6)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,129 @@
+# test/test_switch_unittest.py
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from cache import ProgramCache
+from lolcode import run_source, build_program
+from lexer import Lexer
+from parser import Parser
+from limits import ResourceLimits
+from engine_support import ENGINES, EngineTestCase
+
+SAMPLE_OUTPUT = ["FISH HAS A FLAVOR", "other 0", "one", "two", "two", "other 3", "other 4", ""]
+
+
+def switch(subject, cases):
+    return f"HAI\n{subject}\nWTF?\n{cases}\nOIC\nKTHXBYE\n"
+
+
+class TestSwitch(EngineTestCase):
+
+    def parse(self, source):
+        return Parser(Lexer(source).tokenize()).parse()
+
+    def test_sample_program(self):
+        result = self.run_everywhere(open("test/switch.lol").read())
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.output.split('\n'), SAMPLE_OUTPUT)
+
+    def test_dispatch_and_fall_through(self):
+        cases = 'OMG 1\nVISIBLE "a"\nOMG 2\nVISIBLE "b"\nGTFO\nOMG 3\nVISIBLE "c"\nOMGWTF\nVISIBLE "d"'
+        expected = {'1': "a\nb\n", '2': "b\n", '3': "c\nd\n", '4': "d\n"}
+        for subject, output in expected.items():
+            with self.subTest(subject=subject):
+                self.assertEqual(self.run_everywhere(switch(subject, cases)).output, output)
+
+    def test_no_match_without_a_default_runs_nothing(self):
+        source = switch('7', 'OMG 1\nVISIBLE "one"').replace('KTHXBYE', 'VISIBLE "after"\nKTHXBYE')
+        self.assertEqual(self.run_everywhere(source).output, "after\n")
+
+    def test_literals_match_like_both_saem(self):
+        cases = 'OMG 1\nVISIBLE "one"\nGTFO\nOMG "x"\nVISIBLE "x"\nGTFO\nOMGWTF\nVISIBLE "none"'
+        expected = {'1.0': "one\n", 'WIN': "one\n", '"1"': "none\n", '"x"': "x\n", 'FAIL': "none\n"}
+        for subject, output in expected.items():
+            with self.subTest(subject=subject):
+                self.assertEqual(self.run_everywhere(switch(subject, cases)).output, output)
+
+    def test_a_bukkit_matches_no_literal(self):
+        source = switch('A BUKKIT', 'OMG 0\nVISIBLE "zero"\nOMGWTF\nVISIBLE "bukkit"')
+        self.assertEqual(self.run_everywhere(source).output, "bukkit\n")
+
+    def test_bare_expressions_set_it(self):
+        source = "HAI\nI HAS A x ITZ 5\nx\nVISIBLE IT\n\"text\"\nVISIBLE IT\nKTHXBYE\n"
+        self.assertEqual(self.run_everywhere(source).output, "5\ntext\n")
+
+    def test_gtfo_leaves_the_switch_not_the_loop(self):
+        source = ("HAI\nIM IN YR lup UPPIN YR i TIL BOTH SAEM i AN 3\n  i\n  WTF?\n    OMG 1\n      GTFO\n"
+                  "    OMGWTF\n      VISIBLE i\n  OIC\nIM OUTTA YR lup\nKTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source).output, "0\n2\n")
+
+    def test_switch_in_a_function(self):
+        source = ("HAI\nHOW IZ I name YR n\n  n\n  WTF?\n    OMG 1\n      GTFO\n    OMGWTF\n"
+                  "      FOUND YR \"many\"\n  OIC\n  FOUND YR \"one\"\nIF U SAY SO\n"
+                  "VISIBLE I IZ name YR 1 MKAY\nVISIBLE I IZ name YR 5 MKAY\nKTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source).output, "one\nmany\n")
+
+    def test_nested_switches(self):
+        inner = 'WTF?\n  OMG 2\n    VISIBLE "inner"\n    GTFO\nOIC\nVISIBLE "after inner"'
+        source = switch('1', f'OMG 1\n2\n{inner}\nOMG 9\nVISIBLE "fell"')
+        self.assertEqual(self.run_everywhere(source).output, "inner\nafter inner\nfell\n")
+
+    def test_jump_table(self):
+        ast = self.parse(switch('1', 'OMG 1\nOMG "a"\nVISIBLE 1\nOMGWTF\nVISIBLE 2'))
+        node = ast.children[-1]
+        self.assertEqual(node.type, 'SWITCH')
+        self.assertEqual(node.value, {1: 0, "a": 1})
+        self.assertEqual([case.type for case in node.children], ['CASE', 'CASE', 'DEFAULT_CASE'])
+
+    def test_syntax_errors(self):
+        cases = [
+            (switch('1', 'OMG 1\nOMG 1.0'), "Duplicate OMG literal"),
+            (switch('1', 'OMG 1\nOMG WIN'), "Duplicate OMG literal"),
+            (switch('1', 'OMG x'), "Expected a literal after 'OMG'"),
+            (switch('1', 'VISIBLE 1'), "Expected 'OMG' after 'WTF?'"),
+            (switch('1', 'OMG 1\nOMGWTF\nOMG 2'), "Expected 'OIC' to end 'WTF?'"),
+            ("HAI\n1\nWTF?\nOMG 1\nKTHXBYE\n", "Expected 'OIC' to end 'WTF?'"),
+        ]
+        for source, message in cases:
+            with self.subTest(source=source):
+                result = run_source(source)
+                self.assertEqual(result.errors[0].phase, 'syntax')
+                self.assertIn(message, result.errors[0].message)
+
+    def test_gtfo_needs_a_loop_or_switch(self):
+        result = run_source("HAI\nGTFO\nKTHXBYE\n")
+        self.assertIn("GTFO outside of a loop or WTF?", result.errors[0].message)
+        self.assertEqual(run_source(switch('1', 'OMG 1\nGTFO')).errors, [])
+
+    def test_vm_dispatches_with_one_instruction(self):
+        program = build_program(switch('1', 'OMG 1\nVISIBLE 1\nOMG 2\nVISIBLE 2'), 'vm')
+        self.assertIn("SWITCH", program.disassemble())
+        self.assertIn("2 cases", program.disassemble())
+
+    def test_cached_programs(self):
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir)
+        source = open("test/switch.lol").read()
+        for engine in ENGINES:
+            with self.subTest(engine=engine):
+                for _ in range(2):
+                    result = run_source(source, engine=engine, cache=ProgramCache(cache_dir))
+                    self.assertEqual(result.output.split('\n'), SAMPLE_OUTPUT)
+        self.assertTrue(os.listdir(cache_dir))
+
+    def test_limited_and_profiled_runs(self):
+        source = open("test/switch.lol").read()
+        result = run_source(source, limits=ResourceLimits(statements=10000))
+        self.assertEqual(result.output.split('\n'), SAMPLE_OUTPUT)
+        result = run_source(source, limits=ResourceLimits(statements=5))
+        self.assertEqual(result.errors[0].phase, 'limit')
+        result = run_source(source, profile=True)
+        self.assertEqual(result.output.split('\n'), SAMPLE_OUTPUT)
+        self.assertEqual(result.profile.node_types['SWITCH'][0], 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+# test/test_vm_unittest.py
+
+import unittest
+
+from lolcode import build_program, run_source
+from engine_support import EngineTestCase
+
+
+def looping(body, passes=5, before=''):
+    """A program running body on every pass of a loop, so its statements run
+    both through the handler table and threaded."""
+    return (f'HAI\nI HAS A x ITZ 1\nI HAS A y ITZ 2\n{before}'
+            f'IM IN YR loop UPPIN YR i TIL BOTH SAEM i AN {passes}\n{body}\nIM OUTTA YR loop\n'
+            'VISIBLE x AN " " AN y AN " " AN IT\nKTHXBYE\n')
+
+
+class TestVirtualMachine(EngineTestCase):
+
+    def test_binary_statements_are_fused(self):
+        program = build_program('HAI\nI HAS A x ITZ 1\nx R SUM OF x AN 2\nVISIBLE PRODUKT OF x AN 3\n'
+                                'I HAS A y ITZ SUM OF x AN 1\nKTHXBYE\n', 'vm')
+        listing = program.disassemble()
+        self.assertIn("STORE_BINARY_OP", listing)
+        self.assertIn("LOAD_BINARY_OP", listing)
+        self.assertNotIn("DECLARE", listing)
+
+    def test_threaded_statements_agree(self):
+        bodies = [
+            'x R SUM OF x AN y\ny R DIFF OF 100 AN x',
+            'IT R 3\nx R SUM OF IT AN PRODUKT OF x AN 2',
+            'x R QUOSHUNT OF SUM OF x AN 1 AN 2\nVISIBLE SMOOSH x AN ":" AN y MKAY',
+            'BOTH SAEM MOD OF i AN 2 AN 0\nO RLY?\n  YA RLY\n    x R SUM OF x AN i\n  NO WAI\n    y R SUM OF y AN i\nOIC',
+            'i\nWTF?\n  OMG 3\n    VISIBLE "three"\n    GTFO\n  OMGWTF\n    y R PRODUKT OF y AN 2\nOIC',
+            'BOTH SAEM i AN 3\nO RLY?\n  YA RLY\n    GTFO\nOIC\nx R BIGGR OF x AN i',
+        ]
+        for body in bodies:
+            with self.subTest(body=body):
+                result = self.run_everywhere(looping(body))
+                self.assertEqual(result.errors, [])
+
+    def test_threaded_calls_agree(self):
+        functions = ('HOW IZ I twice YR n\n  FOUND YR PRODUKT OF n AN 2\nIF U SAY SO\n'
+                     'HOW IZ I count YR n\n  BOTH SAEM n AN 0\n  O RLY?\n    YA RLY\n      FOUND YR 0\n  OIC\n'
+                     '  FOUND YR SUM OF 1 AN I IZ count YR DIFF OF n AN 1 MKAY\nIF U SAY SO\n')
+        for memo_size in (None, 4):
+            with self.subTest(memo_size=memo_size):
+                result = self.run_everywhere(looping(
+                    'x R SUM OF I IZ twice YR x MKAY AN IT\ny R I IZ count YR i MKAY\nI IZ twice YR y MKAY',
+                    before=functions), memo_size=memo_size)
+                self.assertEqual(result.errors, [])
+
+    def test_deep_expression_in_a_loop(self):
+        expr = "x"
+        for _ in range(300):
+            expr = f"SUM OF {expr} AN 1"
+        self.assertEqual(self.run_everywhere(looping(f'y R {expr}')).errors, [])
+
+    def test_recursion_depth(self):
+        source = ("HAI\nHOW IZ I count YR n\n  BOTH SAEM n AN 0\n  O RLY?\n    YA RLY\n      FOUND YR 0\n  OIC\n"
+                  "  FOUND YR SUM OF 1 AN I IZ count YR DIFF OF n AN 1 MKAY\nIF U SAY SO\n"
+                  "VISIBLE I IZ count YR 200 MKAY\nKTHXBYE\n")
+        self.assertEqual(run_source(source, engine='vm').output, "200\n")
+
+
+if __name__ == '__main__':
+    unittest.main()
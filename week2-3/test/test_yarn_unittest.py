@@ -0,0 +1,134 @@
+# test/test_yarn_unittest.py
+
+import unittest
+
+import runtime
+from yarn import Yarn, YarnBuilder, MIN_ROPE_LENGTH, PIECES_PER_CHUNK, concat
+from lolcode import run_source, build_ast
+from limits import ResourceLimits
+from engine_support import EngineTestCase
+
+LONG = 'x' * MIN_ROPE_LENGTH
+
+
+def building(lines, piece='"line " AN i AN ":)"', after=''):
+    return (f'HAI\nI HAS A out ITZ ""\nIM IN YR building UPPIN YR i TIL BOTH SAEM i AN {lines}\n'
+            f'  out R SMOOSH out AN {piece} MKAY\nIM OUTTA YR building\n{after}KTHXBYE\n')
+
+
+class TestYarn(unittest.TestCase):
+
+    def test_short_concatenations_stay_strings(self):
+        self.assertIs(type(concat("ab", "cd")), str)
+        self.assertIs(type(runtime.smoosh(["a", 1, True])), str)
+        self.assertIs(type(concat(LONG[1:], "y")), Yarn)
+        self.assertIs(type(runtime.smoosh([LONG])), Yarn)
+
+    def test_extending_the_latest_yarn_shares_its_builder(self):
+        first = Yarn.of(LONG)
+        second = first.extend("a")
+        third = second.extend("b")
+        self.assertIs(third.builder, first.builder)
+        self.assertEqual(str(first), LONG)
+        self.assertEqual(str(third), LONG + "ab")
+
+    def test_extending_an_older_yarn_copies_it(self):
+        first = Yarn.of(LONG)
+        second = first.extend("a")
+        branch = first.extend("b")
+        self.assertIsNot(branch.builder, first.builder)
+        self.assertEqual(str(second), LONG + "a")
+        self.assertEqual(str(branch), LONG + "b")
+        self.assertEqual(str(second.extend("c")), LONG + "ac")
+
+    def test_pieces_are_joined_into_chunks(self):
+        builder = YarnBuilder("")
+        for _ in range(PIECES_PER_CHUNK * 3 + 1):
+            builder.append("ab")
+        self.assertEqual(len(builder.chunks), 4)
+        self.assertEqual(len(builder.pieces), 1)
+        self.assertEqual(builder.text(), "ab" * (PIECES_PER_CHUNK * 3 + 1))
+        self.assertEqual(builder.chunks, [builder.text()])
+
+    def test_a_yarn_equals_its_text(self):
+        yarn = Yarn.of(LONG).extend("!")
+        self.assertEqual(yarn, LONG + "!")
+        self.assertEqual(LONG + "!", yarn)
+        self.assertEqual(yarn, Yarn.of(LONG + "!"))
+        self.assertNotEqual(yarn, LONG)
+        self.assertNotEqual(yarn, 1)
+        self.assertEqual(hash(yarn), hash(LONG + "!"))
+        self.assertEqual({LONG + "!": 1}.get(yarn), 1)
+        self.assertEqual(len(yarn), MIN_ROPE_LENGTH + 1)
+
+    def test_runtime_reads_yarns_like_strings(self):
+        digits = Yarn.of("1" * MIN_ROPE_LENGTH)
+        self.assertEqual(runtime.to_number(digits), runtime.to_number("1" * MIN_ROPE_LENGTH))
+        self.assertFalse(Yarn.of(LONG).extend("1").could_be_number())
+        self.assertTrue(digits.extend("2").could_be_number())
+        with self.assertRaises(ValueError):
+            runtime.to_number(Yarn.of(LONG))
+        self.assertFalse(runtime.is_truthy(Yarn.of(" " * MIN_ROPE_LENGTH)))
+        self.assertFalse(runtime.is_truthy(Yarn.of("0" * MIN_ROPE_LENGTH)))
+        self.assertTrue(runtime.is_truthy(Yarn.of(LONG)))
+        self.assertEqual(runtime.add(Yarn.of(LONG), 1), LONG + "1")
+        self.assertEqual(runtime.to_string(runtime.smoosh([Yarn.of(LONG), True])), LONG + "WIN")
+        self.assertEqual(runtime.switch_entry({LONG: 3}, Yarn.of(LONG), 0), 3)
+
+
+class TestYarnPrograms(EngineTestCase):
+
+    def test_building_a_report(self):
+        expected = ''.join(f"line {i}:)" for i in range(3000))
+        result = self.run_everywhere(building(3000, after='VISIBLE out\n'))
+        self.assertEqual(result.errors, [])
+        self.assertEqual(result.output, expected + "\n")
+        self.assertIs(type(result.variables['out']), str)
+        self.assertEqual(result.variables['out'], expected)
+
+    def test_sum_of_builds_yarns_too(self):
+        source = building(3000, piece='""').replace('SMOOSH out AN "" MKAY', 'SUM OF out AN "ab"')
+        result = self.run_everywhere(source.replace('KTHXBYE', 'VISIBLE SUM OF out AN 1\nKTHXBYE'))
+        self.assertEqual(result.output, "ab" * 3000 + "1\n")
+
+    def test_yarns_compare_and_dispatch_like_strings(self):
+        source = building(300, piece='"ab"', after=(
+            f'I HAS A copy ITZ SMOOSH "{"ab" * 299}" AN "ab" MKAY\n'
+            'VISIBLE BOTH SAEM out AN copy\nVISIBLE DIFFRINT out AN SMOOSH out AN "!" MKAY\n'
+            f'out\nWTF?\n  OMG "{"ab" * 300}"\n    VISIBLE "matched"\n    GTFO\n  OMGWTF\n    VISIBLE "missed"\nOIC\n'))
+        self.assertEqual(self.run_everywhere(source).output, "WIN\nWIN\nmatched\n")
+
+    def test_copies_keep_their_own_text(self):
+        source = building(600, piece='"ab"', after=(
+            'I HAS A before ITZ out\nout R SMOOSH out AN "!" MKAY\nbefore R SMOOSH before AN "?" MKAY\n'
+            'out R SMOOSH out AN "!" MKAY\nVISIBLE before\nVISIBLE out\n'))
+        result = self.run_everywhere(source)
+        self.assertEqual(result.output, "ab" * 600 + "?\n" + "ab" * 600 + "!!\n")
+
+    def test_numeric_yarns_still_add(self):
+        source = building(600, piece='1', after='VISIBLE DIFF OF out AN SUM OF out AN 1\n')
+        self.assertEqual(self.run_everywhere(source).output, "-1\n")
+
+    def test_memoized_functions_take_yarns(self):
+        source = ("HAI\nHOW IZ I twice YR s\n  FOUND YR SMOOSH s AN s MKAY\nIF U SAY SO\n"
+                  f"I HAS A s ITZ SMOOSH \"{LONG}\" AN 1 MKAY\n"
+                  "VISIBLE BOTH SAEM I IZ twice YR s MKAY AN I IZ twice YR s MKAY\nKTHXBYE\n")
+        self.assertEqual(self.run_everywhere(source, memo_size=8).output, "WIN\n")
+
+    def test_string_length_limit_covers_yarns(self):
+        for update in ('SMOOSH out AN "ab" MKAY', 'SUM OF out AN "ab"'):
+            with self.subTest(update=update):
+                source = building(5000, piece='"ab"').replace('SMOOSH out AN "ab" MKAY', update)
+                result = run_source(source, limits=ResourceLimits(string_length=3000))
+                self.assertEqual(result.errors[0].phase, 'limit')
+                self.assertIn("string", result.errors[0].message.lower())
+
+    def test_folded_yarns_are_plain_strings(self):
+        ast = build_ast(f'HAI\nVISIBLE SMOOSH "{LONG}" AN "{LONG}" MKAY\nKTHXBYE\n')
+        folded = ast.children[0].children[0]
+        self.assertEqual(folded.type, 'FOLDED')
+        self.assertIs(type(folded.value), str)
+
+
+if __name__ == '__main__':
+    unittest.main()
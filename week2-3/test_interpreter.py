@@ -4,8 +4,8 @@ Looks for .lol test files in the ./test/ directory
 """
 
 import os
-import sys
-import subprocess
+
+from lolcode import run_source
 
 def run_test(test_file):
     """Run a test file through the interpreter"""
@@ -13,24 +13,23 @@ def run_test(test_file):
     print("-" * 40)
     
     try:
-        result = subprocess.run(
-            [sys.executable, "main.py", test_file], 
-            capture_output=True, 
-            text=True
-        )
-        
+        with open(test_file, 'r', encoding='utf-8') as f:
+            source_code = f.read()
+
+        # GIMMEH reads from this script's own stdin
+        result = run_source(source_code)
+
         print("STDOUT:")
-        print(result.stdout)
-        
-        if result.stderr:
-            print("\nSTDERR:")
-            print(result.stderr)
-        
-        if result.returncode != 0:
-            print(f"\nTest failed with return code {result.returncode}")
+        print(result.output)
+
+        if result.errors:
+            print("\nERRORS:")
+            for error in result.errors:
+                print(error)
+            print(f"\nTest failed with {len(result.errors)} error(s)")
         else:
             print("\nTest completed successfully!")
-        
+
     except Exception as e:
         print(f"Error running test: {e}")
     
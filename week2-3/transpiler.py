@@ -0,0 +1,543 @@
+"""
+LOLCODE Transpiler Module
+Translates the semantically analyzed AST into Python source and runs it
+"""
+
+import bukkit
+import runtime
+from bukkit import BUKKIT_OPERATIONS
+from inputs import as_source
+from output import as_sink
+from parser import function_parts, loop_parts, postorder
+from runtime import MAX_CALL_DEPTH
+
+# Helpers the generated code calls, bound as default arguments so that every
+# lookup inside the generated function is a fast local access.
+HELPERS = {
+    '_add': runtime.add,
+    '_sub': runtime.sub,
+    '_mul': runtime.mul,
+    '_div': runtime.div,
+    '_mod': runtime.mod,
+    '_biggr': runtime.biggr,
+    '_smallr': runtime.smallr,
+    '_add_int': runtime.add_int,
+    '_sub_int': runtime.sub_int,
+    '_mul_int': runtime.mul_int,
+    '_div_int': runtime.div_int,
+    '_mod_int': runtime.mod_int,
+    '_biggr_int': runtime.biggr_int,
+    '_smallr_int': runtime.smallr_int,
+    '_add_float': runtime.add_float,
+    '_sub_float': runtime.sub_float,
+    '_mul_float': runtime.mul_float,
+    '_div_float': runtime.div_float,
+    '_mod_float': runtime.mod,
+    '_biggr_float': runtime.biggr_float,
+    '_smallr_float': runtime.smallr_float,
+    '_type': type,
+    '_int': int,
+    '_truthy': runtime.is_truthy,
+    '_str': runtime.to_string,
+    '_smoosh': runtime.smoosh,
+    '_parse_input': runtime.parse_input,
+    '_uppin': runtime.uppin,
+    '_nerfin': runtime.nerfin,
+    '_switch_entry': runtime.switch_entry,
+    '_append': bukkit.append,
+    '_put': bukkit.put,
+}
+
+# Helpers running each BUKKIT operation, which like the other operators
+# stores its result in IT
+BUKKIT_HELPERS = {
+    'NEW_BUKKIT': '_new_bukkit',
+    'OP_ITEM': '_item',
+    'OP_LENGTH': '_length',
+    'OP_TOTAL': '_total',
+    'OP_BIGGEST': '_biggest',
+    'OP_SMALLEST': '_smallest',
+    'EACH_ADD': '_each_add',
+    'EACH_SUB': '_each_sub',
+    'EACH_MUL': '_each_mul',
+    'EACH_DIV': '_each_div',
+    'EACH_MOD': '_each_mod',
+    'EACH_MAX': '_each_max',
+    'EACH_MIN': '_each_min',
+}
+HELPERS.update((helper, BUKKIT_OPERATIONS[op_type][0]) for op_type, helper in BUKKIT_HELPERS.items())
+
+ARITHMETIC_HELPERS = {
+    'OP_ADD': '_add',
+    'OP_SUB': '_sub',
+    'OP_MUL': '_mul',
+    'OP_DIV': '_div',
+    'OP_MOD': '_mod',
+    'OP_MAX': '_biggr',
+    'OP_MIN': '_smallr',
+}
+
+# Helper name suffixes for the operand types the SemanticAnalyzer inferred
+SPECIALIZED_SUFFIXES = {
+    None: '',
+    'NUMBR': '_int',
+    'NUMBAR': '_float',
+}
+
+# NUMBR operators written as native Python operators behind an exact int check
+INLINE_INT_OPERATORS = {
+    'OP_ADD': '+',
+    'OP_SUB': '-',
+    'OP_MUL': '*',
+}
+
+# Logical operators are written with non-short-circuiting operators so both
+# operands are always evaluated, exactly like the tree-walking interpreter.
+LOGICAL_TEMPLATES = {
+    'OP_EQUAL': '({0} == {1})',
+    'OP_NOT_EQUAL': '({0} != {1})',
+    'OP_AND': '(_truthy({0}) & _truthy({1}))',
+    'OP_OR': '(_truthy({0}) | _truthy({1}))',
+    'OP_XOR': '(_truthy({0}) != _truthy({1}))',
+}
+
+# Loop steps written as native Python arithmetic behind an exact int check
+LOOP_STEPS = {
+    'LOOP_UPPIN': ('+', '_uppin'),
+    'LOOP_NERFIN': ('-', '_nerfin'),
+}
+
+# Expressions nested deeper than this are emitted one operator per statement
+# so the generated source stays within CPython's parser nesting limits.
+MAX_INLINE_DEPTH = 40
+
+FUNCTION_NAME = 'lol_program'
+
+
+def mangle(name):
+    if name == 'IT':
+        return 'IT'
+    return 'v_' + name
+
+
+def function_name(name):
+    return 'f_' + name
+
+
+class Transpiler:
+    def __init__(self, ast):
+        self.ast = ast
+        self.lines = []
+        self.indent = 1
+        self.temp_count = 0
+        # Loops and WTF? blocks enclosing the statement being compiled in the
+        # current function or program, so GTFO knows whether to break or return
+        self.loop_depth = 0
+        # Module-level assignments of the WTF? case tables, built once when
+        # the compiled program is loaded
+        self.tables = []
+
+    def transpile(self):
+        if not self.ast or self.ast.type != 'PROGRAM':
+            raise ValueError("Invalid AST: Root node must be a PROGRAM")
+        if self.ast.value is None:
+            raise ValueError("Invalid AST: run SemanticAnalyzer first to assign variable slots")
+
+        params = ', '.join(f"{name}={name}" for name in HELPERS)
+        # _memoize wraps every pure function; it is chosen when the program
+        # runs, so the compiled code is the same with or without --memoize
+        self.lines = [f"def {FUNCTION_NAME}(_write, _read, _memoize, {params}):"]
+        # Every slot starts out as NOOB, matching the other engines
+        self.emit(' = '.join(mangle(name) for name in self.ast.value) + " = None")
+        # Function calls running now, up to MAX_CALL_DEPTH
+        self.emit("_calls = [0]")
+        self.compile_block(self.ast.children)
+        self.emit("return locals()")
+        return '\n'.join(self.tables + self.lines) + '\n'
+
+    def compile(self):
+        return compile(self.transpile(), '<lolcode>', 'exec')
+
+    def emit(self, line):
+        self.lines.append('    ' * self.indent + line)
+
+    def new_temp(self):
+        self.temp_count += 1
+        return f"_t{self.temp_count}"
+
+    def compile_block(self, statements):
+        start = len(self.lines)
+        for statement in statements:
+            self.compile_statement(statement)
+        if len(self.lines) == start:
+            self.emit("pass")
+
+    def compile_statement(self, node):
+        if not node:
+            return
+
+        if node.type == 'VAR_DECLARATION':
+            target = mangle(node.value)
+            if not node.children:
+                self.emit(f"{target} = None")
+                return
+            if self.reads_variable(node.children[0], node.value):
+                # The initializer sees the freshly declared NOOB value
+                self.emit(f"{target} = None")
+            self.emit(f"{target} = {self.compile_expression(node.children[0])}")
+
+        elif node.type == 'VAR_ASSIGNMENT':
+            target = mangle(node.value)
+            value = self.compile_expression(node.children[0])
+            if target == 'IT' or not node.stores_it:
+                self.emit(f"{target} = {value}")
+            else:
+                self.emit(f"{target} = IT = {value}")
+
+        elif node.type == 'OUTPUT':
+            self.emit(f"_write(_str({self.compile_expression(node.children[0])}) + '\\n')")
+
+        elif node.type == 'INPUT':
+            target = mangle(node.value)
+            if target == 'IT':
+                self.emit("IT = _parse_input(_read())")
+            else:
+                self.emit(f"{target} = IT = _parse_input(_read())")
+
+        elif node.type == 'APPEND':
+            target = mangle(node.value)
+            value = node.children[0]
+            if self.is_flat(value):
+                # Read the BUKKIT before the value's statements can change IT
+                temp = self.new_temp()
+                self.emit(f"{temp} = {target}")
+                target = temp
+            self.emit(f"_append({target}, {self.compile_expression(value)})")
+
+        elif node.type == 'ITEM_ASSIGNMENT':
+            self.emit(f"_put({', '.join(self.compile_operands(node.children))})")
+
+        elif node.type == 'CONDITIONAL':
+            self.compile_conditional(node)
+
+        elif node.type == 'SWITCH':
+            self.compile_switch(node)
+
+        elif node.type == 'LOOP':
+            self.compile_loop(node)
+
+        elif node.type == 'BREAK':
+            # GTFO outside any loop returns NOOB from the function
+            self.emit("break" if self.loop_depth else "return None")
+
+        elif node.type == 'RETURN':
+            self.emit(f"return {self.compile_expression(node.children[0])}")
+
+        elif node.type == 'FUNCTION':
+            self.compile_function(node)
+
+    def compile_conditional(self, node):
+        true_branch = None
+        false_branch = None
+        for branch in node.children:
+            if branch.type == 'TRUE_BRANCH' and true_branch is None:
+                true_branch = branch
+            elif branch.type == 'FALSE_BRANCH' and false_branch is None:
+                false_branch = branch
+
+        self.emit("if _truthy(IT):")
+        self.indent += 1
+        self.compile_block(true_branch.children if true_branch else [])
+        self.indent -= 1
+        if false_branch:
+            self.emit("else:")
+            self.indent += 1
+            self.compile_block(false_branch.children)
+            self.indent -= 1
+
+    def compile_switch(self, node):
+        """Look the case up in a dict built once when the program loads, then
+        branch on its index through a binary tree of ifs, so reaching any of
+        n cases takes about log2(n) comparisons. Every case appears once and
+        runs on into the next, and the cases sit in a one-pass loop that
+        GTFO breaks out of."""
+        cases = node.children
+        table = f"_cases{len(self.tables)}"
+        self.tables.append(f"{table} = {node.value!r}")
+        default = len(cases) - 1 if cases[-1].type == 'DEFAULT_CASE' else len(cases)
+        entry = self.new_temp()
+        self.emit(f"{entry} = _switch_entry({table}, IT, {default})")
+        self.emit("while True:")
+        self.indent += 1
+        self.loop_depth += 1
+        self.emit(f"if {entry} < {len(cases)}:")
+        self.indent += 1
+        self.compile_cases(cases, entry, 0, len(cases))
+        self.indent -= 1
+        self.emit("break")
+        self.loop_depth -= 1
+        self.indent -= 1
+
+    def compile_cases(self, cases, entry, low, high):
+        """Run the cases from index max(entry, low) up to high, given that
+        entry is below high."""
+        if high - low == 1:
+            self.compile_block(cases[low].children)
+            return
+        middle = (low + high) // 2
+        self.emit(f"if {entry} < {middle}:")
+        self.indent += 1
+        self.compile_cases(cases, entry, low, middle)
+        self.indent -= 1
+        self.compile_cases(cases, entry, middle, high)
+
+    def compile_loop(self, node):
+        update, condition, body = loop_parts(node)
+        if update is not None and update.children:
+            # The loop declared its own variable
+            self.emit(f"{mangle(update.value)} = {update.children[0].value!r}")
+
+        self.emit("while True:")
+        self.indent += 1
+        if condition is not None:
+            # Emitted inside the loop, since a deep condition compiles to
+            # statements that must run on every pass
+            test = condition.children[0]
+            value = self.compile_expression(test)
+            if test.type not in LOGICAL_TEMPLATES and test.type != 'OP_NOT':
+                value = f"_truthy({value})"
+            self.emit(f"if {'' if condition.type == 'LOOP_TIL' else 'not '}{value}:")
+            self.emit("    break")
+        self.loop_depth += 1
+        self.compile_block(body.children)
+        self.loop_depth -= 1
+        if update is not None:
+            target = mangle(update.value)
+            operator, helper = LOOP_STEPS[update.type]
+            self.emit(f"{target} = {target} {operator} 1 if _type({target}) is _int else {helper}({target})")
+        self.indent -= 1
+
+    def compile_function(self, node):
+        """Define the function as a nested Python function. Its parameters
+        come first, then the helpers as default arguments like those of the
+        program function, and its IT and locals start out as NOOB. Each call
+        counts itself in the program's _calls while it runs."""
+        parameters, body = function_parts(node)
+        name = function_name(node.value)
+        arguments = [mangle(parameter.value) for parameter in parameters]
+        arguments.append("_write=_write, _read=_read")
+        arguments.extend(f"{helper}={helper}" for helper in HELPERS)
+        self.emit(f"def {name}({', '.join(arguments)}):")
+        self.indent += 1
+        self.emit(f"if _calls[0] == {MAX_CALL_DEPTH}:")
+        self.emit("    raise RecursionError()")
+        self.emit("_calls[0] += 1")
+        self.emit("try:")
+        self.indent += 1
+        # Slot 0 is IT and the parameters follow it
+        local_names = (body.value[0],) + body.value[len(parameters) + 1:]
+        self.emit(' = '.join(mangle(local_name) for local_name in local_names) + " = None")
+        self.compile_block(body.children)
+        # Running off the end returns the function's IT
+        self.emit("return IT")
+        self.indent -= 1
+        self.emit("finally:")
+        self.emit("    _calls[0] -= 1")
+        self.indent -= 1
+        if node.static_type == 'PURE':
+            self.emit(f"{name} = _memoize({name})")
+
+    def compile_expression(self, node):
+        if self.is_flat(node):
+            return self.compile_flat(node)
+        return self.compile_inline(node)
+
+    def is_flat(self, node):
+        """Whether node compiles to statements of its own, see compile_flat."""
+        return bool(node) and (node.deep or self.depth(node) > MAX_INLINE_DEPTH)
+
+    def compile_operands(self, nodes):
+        """Sources for the values of nodes, evaluated left to right when
+        used in that order. Flat operands are stored in temporaries first."""
+        if not any(self.is_flat(node) for node in nodes):
+            return [self.compile_inline(node) for node in nodes]
+        operands = []
+        for node in nodes:
+            temp = self.new_temp()
+            self.emit(f"{temp} = {self.compile_expression(node)}")
+            operands.append(temp)
+        return operands
+
+    def compile_inline(self, node):
+        if not node:
+            return "None"
+
+        if node.type == 'LITERAL':
+            return repr(node.value)
+
+        elif node.type == 'VARIABLE':
+            return mangle(node.value)
+
+        elif node.type == 'FOLDED':
+            return self.store_it(node, repr(node.value))
+
+        elif node.type in ARITHMETIC_HELPERS:
+            left = self.compile_inline(node.children[0])
+            right = self.compile_inline(node.children[1])
+            if node.operand_type == 'NUMBR' and node.type in INLINE_INT_OPERATORS:
+                return self.store_it(node, self.compile_inline_int(node, left, right))
+            return self.store_it(node, f"{self.arithmetic_helper(node)}({left}, {right})")
+
+        elif node.type in LOGICAL_TEMPLATES:
+            left = self.compile_inline(node.children[0])
+            right = self.compile_inline(node.children[1])
+            return self.store_it(node, LOGICAL_TEMPLATES[node.type].format(left, right))
+
+        elif node.type == 'OP_NOT':
+            return self.store_it(node, f"(not _truthy({self.compile_inline(node.children[0])}))")
+
+        elif node.type == 'OP_SMOOSH':
+            parts = [self.compile_inline(child) for child in node.children]
+            return self.store_it(node, f"_smoosh(({', '.join(parts)},))")
+
+        elif node.type == 'CALL':
+            arguments = [self.compile_inline(child) for child in node.children]
+            return self.store_it(node, f"{function_name(node.value)}({', '.join(arguments)})")
+
+        elif node.type in BUKKIT_HELPERS:
+            operands = [self.compile_inline(child) for child in node.children]
+            return self.store_it(node, f"{BUKKIT_HELPERS[node.type]}({', '.join(operands)})")
+
+        return "None"
+
+    def store_it(self, node, value):
+        # Only IT stores the Optimizer found observable are written out
+        if node.stores_it:
+            return f"(IT := {value})"
+        return value
+
+    def arithmetic_helper(self, node):
+        return ARITHMETIC_HELPERS[node.type] + SPECIALIZED_SUFFIXES[node.operand_type]
+
+    def compile_inline_int(self, node, left, right):
+        """Let CPython do NUMBR arithmetic natively, guarded by exact int
+        checks that fall back to the generic helper on a misprediction."""
+        operands = []
+        guards = []
+        for child, source in zip(node.children, (left, right)):
+            if child.type == 'LITERAL' and type(child.value) is int:
+                operands.append(source)
+            else:
+                temp = self.new_temp()
+                guards.append(f"(_type({temp} := {source}) is _int)")
+                operands.append(temp)
+
+        native = f"{operands[0]} {INLINE_INT_OPERATORS[node.type]} {operands[1]}"
+        if not guards:
+            return f"({native})"
+        fallback = f"{ARITHMETIC_HELPERS[node.type]}({operands[0]}, {operands[1]})"
+        return f"({native} if {' & '.join(guards)} else {fallback})"
+
+    def compile_flat(self, node):
+        """Emit one statement per operator, in evaluation order, and return
+        the name of the temporary holding the result.
+
+        Works from an explicit postorder list so any depth compiles, and
+        reuses temporaries once their operator has consumed them."""
+        if not node:
+            return "None"
+
+        # (source, is_temp) for every value computed but not yet consumed
+        operands = []
+        free_temps = []
+        for expr in postorder(node):
+            if expr.type == 'LITERAL':
+                operands.append((repr(expr.value), False))
+                continue
+
+            if expr.type == 'VARIABLE':
+                if expr.value != 'IT':
+                    operands.append((mangle(expr.value), False))
+                    continue
+                # IT may be overwritten by a later sibling, so read it now
+                temp = free_temps.pop() if free_temps else self.new_temp()
+                self.emit(f"{temp} = IT")
+                operands.append((temp, True))
+                continue
+
+            if expr.type == 'FOLDED':
+                if expr.stores_it:
+                    self.emit(f"IT = {expr.value!r}")
+                operands.append((repr(expr.value), False))
+                continue
+
+            start = len(operands) - len(expr.children)
+            args = [source for source, _ in operands[start:]]
+            free_temps.extend(source for source, is_temp in operands[start:] if is_temp)
+            del operands[start:]
+            if expr.type in ARITHMETIC_HELPERS:
+                value = f"{self.arithmetic_helper(expr)}({args[0]}, {args[1]})"
+            elif expr.type in LOGICAL_TEMPLATES:
+                value = LOGICAL_TEMPLATES[expr.type].format(*args)
+            elif expr.type == 'OP_NOT':
+                value = f"not _truthy({args[0]})"
+            elif expr.type == 'OP_SMOOSH':
+                value = f"_smoosh(({', '.join(args)},))"
+            elif expr.type == 'CALL':
+                value = f"{function_name(expr.value)}({', '.join(args)})"
+            elif expr.type in BUKKIT_HELPERS:
+                value = f"{BUKKIT_HELPERS[expr.type]}({', '.join(args)})"
+            else:
+                value = "None"
+
+            temp = free_temps.pop() if free_temps else self.new_temp()
+            if expr.stores_it:
+                self.emit(f"IT = {temp} = {value}")
+            else:
+                self.emit(f"{temp} = {value}")
+            operands.append((temp, True))
+        return operands[0][0]
+
+    def depth(self, node):
+        if not node or not node.children:
+            return 0
+        return 1 + max(self.depth(child) for child in node.children)
+
+    def reads_variable(self, node, name):
+        return any(expr.type == 'VARIABLE' and expr.value == name for expr in postorder(node))
+
+
+class PythonProgram:
+    def __init__(self, code, stdout=None, stdin=None, memo_size=None):
+        self.code = code
+        self.variables = {}
+        self.stdout = stdout
+        self.stdin = stdin
+        # Results kept per pure function, or None to call every time
+        self.memo_size = memo_size
+
+    def run(self):
+        output_sink = as_sink(self.stdout)
+        input_source = as_source(self.stdin)
+
+        def read():
+            output_sink.input_requested()
+            return input_source.read_line()
+
+        def memoize(function):
+            if self.memo_size is None:
+                return function
+            return runtime.memoize(function, self.memo_size)
+
+        namespace = dict(HELPERS)
+        exec(self.code, namespace)
+        try:
+            frame_locals = namespace[FUNCTION_NAME](output_sink.write, read, memoize)
+        finally:
+            output_sink.flush()
+
+        self.variables = {
+            ('IT' if name == 'IT' else name[2:]): value
+            for name, value in frame_locals.items()
+            if name == 'IT' or name.startswith('v_')
+        }
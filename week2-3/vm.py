@@ -0,0 +1,629 @@
+"""
+LOLCODE Virtual Machine Module
+Executes bytecode produced by the compiler, threading hot statements into closures
+"""
+
+import sys
+from operator import itemgetter
+
+import bukkit
+import runtime
+from bukkit import BUKKIT_OPERATIONS
+from inputs import as_source
+from output import as_sink
+from parser import MAX_RECURSION_DEPTH
+from compiler import (
+    LOAD_CONST, LOAD_NAME, STORE_NAME, ASSIGN, DECLARE, BINARY_OP, NOT,
+    SMOOSH, PRINT, INPUT, JUMP, JUMP_IF_IT_FALSE, LOAD_FOLDED,
+    BINARY_OP_NO_IT, POP_JUMP_IF_TRUE, POP_JUMP_IF_FALSE, UPPIN, NERFIN,
+    COUNT_START, COUNT_NEXT, DEFINE, CALL, CALL_NO_IT, RETURN, BUKKIT_OP,
+    BUKKIT_OP_NO_IT, APPEND, PUT_ITEM, SWITCH, LOAD_BINARY_OP, STORE_BINARY_OP,
+    OPCODE_NAMES, BINARY_OP_KEYS, BUKKIT_OP_KEYS, FROM_STACK, FROM_SLOT, FROM_CONST
+)
+from runtime import MAX_CALL_DEPTH, OPERATOR_TABLES
+
+BINARY_FUNCTIONS = tuple(
+    OPERATOR_TABLES[operand_type][op_type] for operand_type, op_type in BINARY_OP_KEYS
+)
+# (implementation, operand count) of every BUKKIT_OP argument
+BUKKIT_FUNCTIONS = tuple(BUKKIT_OPERATIONS[op_type] for op_type in BUKKIT_OP_KEYS)
+
+# Opcodes that push one value computed from the values they pop. Every other
+# instruction ends a statement, popping whatever the statement pushed.
+EXPRESSION_OPCODES = frozenset({
+    LOAD_CONST, LOAD_NAME, LOAD_FOLDED, BINARY_OP, BINARY_OP_NO_IT, NOT,
+    SMOOSH, CALL, CALL_NO_IT, BUKKIT_OP, BUKKIT_OP_NO_IT, LOAD_BINARY_OP,
+})
+
+# The pc a RETURN jumps to, past the end of any code, after leaving the
+# value it returns in the slot after the last one
+RETURN_PC = sys.maxsize
+
+# Marks a statement that has run once. It is threaded when it runs again.
+RAN_ONCE = object()
+
+# Kinds of the operands tracked while threading: a variable slot or a
+# constant, as in a LOAD_BINARY_OP, or a closure taking the slots and
+# returning the value of instructions that would have left it on the stack
+NAME, CONST, EVALUATOR = FROM_SLOT, FROM_CONST, FROM_STACK
+
+
+def evaluator(operand):
+    """A closure taking the slots and returning the operand's value."""
+    kind, value = operand[0], operand[1]
+    if kind == NAME:
+        return itemgetter(value)
+    if kind == CONST:
+        return lambda env: value
+    return value
+
+
+def storing_it(evaluate):
+    """The closure running evaluate and storing its result in IT."""
+    def store(env):
+        env[0] = result = evaluate(env)
+        return result
+    return store
+
+
+def binary_evaluator(function, left, right):
+    """The closure applying function to two operands, reading variables and
+    constants directly rather than through closures of their own."""
+    left_kind, a = left[0], left[1]
+    right_kind, b = right[0], right[1]
+    if left_kind == NAME and right_kind == NAME:
+        return lambda env: function(env[a], env[b])
+    if left_kind == NAME and right_kind == CONST:
+        return lambda env: function(env[a], b)
+    if left_kind == CONST and right_kind == NAME:
+        return lambda env: function(a, env[b])
+    if right_kind == NAME:
+        evaluate_left = evaluator(left)
+        return lambda env: function(evaluate_left(env), env[b])
+    if right_kind == CONST:
+        evaluate_left = evaluator(left)
+        return lambda env: function(evaluate_left(env), b)
+    if left_kind == NAME:
+        evaluate_right = evaluator(right)
+        return lambda env: function(env[a], evaluate_right(env))
+    if left_kind == CONST:
+        evaluate_right = evaluator(right)
+        return lambda env: function(a, evaluate_right(env))
+    evaluate_left, evaluate_right = evaluator(left), evaluator(right)
+    return lambda env: function(evaluate_left(env), evaluate_right(env))
+
+
+def fused_binary_evaluator(binary, operands):
+    """The closure running the constant of a LOAD_BINARY_OP, given as
+    operands the operand it pops when one of its own is from the stack."""
+    key, stores_it, left_kind, left, right_kind, right = binary
+    left = operands[0] if left_kind == FROM_STACK else (left_kind, left)
+    right = operands[0] if right_kind == FROM_STACK else (right_kind, right)
+    evaluate = binary_evaluator(BINARY_FUNCTIONS[key], left, right)
+    return storing_it(evaluate) if stores_it else evaluate
+
+
+class Routine:
+    """The code of the program or of one function, with the handlers
+    running each of its opcodes and its threaded statements by start pc."""
+
+    def __init__(self, code, consts, handlers):
+        self.code = code
+        self.consts = consts
+        self.handlers = handlers
+        self.steps = [None] * len(code)
+
+
+class VirtualMachine:
+    def __init__(self, code_object, stdout=None, stdin=None, memo_size=None):
+        self.code_object = code_object
+        self.env = []
+        self.stdout = stdout
+        self.stdin = stdin
+        self.output_sink = None
+        self.input_source = None
+        # Every function defined so far, by number, as its parameter count,
+        # a Python callable taking the argument values, and its routine and
+        # frame size, or None and None when the callable memoizes it
+        self.functions = {}
+        # Results kept per pure function, or None to call every time
+        self.memo_size = memo_size
+        # Routines running now: the program's and those of function calls,
+        # of which there may be MAX_CALL_DEPTH
+        self.routines_running = 0
+
+    @property
+    def variables(self):
+        return dict(zip(self.code_object.names, self.env))
+
+    def run(self):
+        output_sink = as_sink(self.stdout)
+        input_source = as_source(self.stdin)
+        try:
+            self.execute(output_sink, input_source)
+        finally:
+            output_sink.flush()
+
+    def execute(self, output_sink, input_source):
+        self.output_sink = output_sink
+        self.input_source = input_source
+        code, consts = self.code_object.code, self.code_object.consts
+        self.env = [None] * len(self.code_object.names)
+        self.run_code(Routine(code, consts, self.build_handlers(consts)), self.env)
+
+    def define_function(self, function):
+        _, number, parameter_count, pure, code, consts, names = function
+        frame_size = len(names)
+        routine = Routine(code, consts, self.build_handlers(consts))
+        run_code = self.run_code
+
+        def call(*arguments):
+            # Slot 0 is the call's own IT, then come the arguments
+            env = [None, *arguments]
+            env.extend([None] * (frame_size - len(env)))
+            return run_code(routine, env)
+
+        if pure and self.memo_size is not None:
+            self.functions[number] = (parameter_count, runtime.memoize(call, self.memo_size), None, None)
+        else:
+            self.functions[number] = (parameter_count, call, routine, frame_size)
+
+    def run_code(self, routine, env):
+        """Run a routine against the slots in env until it ends or RETURN,
+        and return the value RETURN pops.
+
+        A statement runs one instruction at a time through the handler table
+        the first time, and is threaded into a closure when it runs again,
+        which is what every later run calls. Statements start wherever the
+        value stack is empty."""
+        if self.routines_running > MAX_CALL_DEPTH:
+            raise RecursionError()
+        self.routines_running += 1
+        code, consts, steps, handlers = routine.code, routine.consts, routine.steps, routine.handlers
+        stack = []
+        push = stack.append
+        end = len(code)
+        pc = 0
+        while pc < end:
+            if not stack:
+                step = steps[pc]
+                if step is not None:
+                    if step is RAN_ONCE:
+                        step = steps[pc] = self.thread(routine, pc)
+                    pc = step(env)
+                    continue
+                steps[pc] = RAN_ONCE
+            op = code[pc]
+            # Loads are half of what runs here, so they skip the handler call
+            if op == LOAD_NAME:
+                push(env[code[pc + 1]])
+                pc += 2
+            elif op == LOAD_CONST:
+                push(consts[code[pc + 1]])
+                pc += 2
+            else:
+                pc = handlers[op](code[pc + 1], pc + 2, env, stack)
+        # An error ends the whole run, so only a routine that ends is uncounted
+        self.routines_running -= 1
+        return env.pop() if pc == RETURN_PC else None
+
+    def build_handlers(self, consts):
+        """The table of handlers run by opcode, each taking the instruction's
+        argument, the pc after it, the slots and the value stack, and
+        returning the pc to run next."""
+        functions = self.functions
+        binary = BINARY_FUNCTIONS
+        is_truthy = runtime.is_truthy
+        output_sink = self.output_sink
+        input_source = self.input_source
+
+        def load_const(arg, following, env, stack):
+            stack.append(consts[arg])
+            return following
+
+        def load_name(arg, following, env, stack):
+            stack.append(env[arg])
+            return following
+
+        def store_name(arg, following, env, stack):
+            env[arg] = stack.pop()
+            return following
+
+        def assign(arg, following, env, stack):
+            env[arg] = env[0] = stack.pop()
+            return following
+
+        def declare(arg, following, env, stack):
+            env[arg] = None
+            return following
+
+        def binary_op(arg, following, env, stack):
+            right = stack.pop()
+            env[0] = stack[-1] = binary[arg](stack[-1], right)
+            return following
+
+        def binary_op_no_it(arg, following, env, stack):
+            right = stack.pop()
+            stack[-1] = binary[arg](stack[-1], right)
+            return following
+
+        def negate(arg, following, env, stack):
+            env[0] = stack[-1] = runtime.negate(stack[-1])
+            return following
+
+        def smoosh(arg, following, env, stack):
+            parts = stack[-arg:]
+            del stack[-arg:]
+            env[0] = result = runtime.smoosh(parts)
+            stack.append(result)
+            return following
+
+        def output(arg, following, env, stack):
+            output_sink.write(runtime.to_string(stack.pop()) + '\n')
+            return following
+
+        def read_input(arg, following, env, stack):
+            output_sink.input_requested()
+            env[arg] = env[0] = runtime.parse_input(input_source.read_line())
+            return following
+
+        def jump(arg, following, env, stack):
+            return arg
+
+        def jump_if_it_false(arg, following, env, stack):
+            return following if is_truthy(env[0]) else arg
+
+        def load_folded(arg, following, env, stack):
+            env[0] = value = consts[arg]
+            stack.append(value)
+            return following
+
+        def pop_jump_if_true(arg, following, env, stack):
+            return arg if is_truthy(stack.pop()) else following
+
+        def pop_jump_if_false(arg, following, env, stack):
+            return following if is_truthy(stack.pop()) else arg
+
+        def uppin(arg, following, env, stack):
+            value = env[arg]
+            env[arg] = value + 1 if type(value) is int else runtime.uppin(value)
+            return following
+
+        def nerfin(arg, following, env, stack):
+            value = env[arg]
+            env[arg] = value - 1 if type(value) is int else runtime.nerfin(value)
+            return following
+
+        def count_start(arg, following, env, stack):
+            slot, _, bound, equal, until, stores_it, _, end_pc = consts[arg]
+            value = env[slot]
+            result = (value == bound) if equal else (value != bound)
+            if stores_it:
+                env[0] = result
+            return end_pc if result is until else following
+
+        def count_next(arg, following, env, stack):
+            slot, delta, bound, equal, until, stores_it, body, _ = consts[arg]
+            value = env[slot]
+            if type(value) is int:
+                value += delta
+            else:
+                value = runtime.uppin(value) if delta > 0 else runtime.nerfin(value)
+            env[slot] = value
+            result = (value == bound) if equal else (value != bound)
+            if stores_it:
+                env[0] = result
+            return following if result is until else body
+
+        def define(arg, following, env, stack):
+            self.define_function(consts[arg])
+            return following
+
+        def call(arg, following, env, stack):
+            parameter_count, function, _, _ = functions[arg]
+            start = len(stack) - parameter_count
+            result = function(*stack[start:])
+            del stack[start:]
+            env[0] = result
+            stack.append(result)
+            return following
+
+        def call_no_it(arg, following, env, stack):
+            parameter_count, function, _, _ = functions[arg]
+            start = len(stack) - parameter_count
+            result = function(*stack[start:])
+            del stack[start:]
+            stack.append(result)
+            return following
+
+        def return_value(arg, following, env, stack):
+            env.append(stack.pop())
+            return RETURN_PC
+
+        def bukkit_op(arg, following, env, stack):
+            bukkit_op_no_it(arg, following, env, stack)
+            env[0] = stack[-1]
+            return following
+
+        def bukkit_op_no_it(arg, following, env, stack):
+            function, operand_count = BUKKIT_FUNCTIONS[arg]
+            start = len(stack) - operand_count
+            result = function(*stack[start:])
+            del stack[start:]
+            stack.append(result)
+            return following
+
+        def append(arg, following, env, stack):
+            value = stack.pop()
+            bukkit.append(stack.pop(), value)
+            return following
+
+        def put_item(arg, following, env, stack):
+            value = stack.pop()
+            index = stack.pop()
+            bukkit.put(stack.pop(), index, value)
+            return following
+
+        def load_binary_op(arg, following, env, stack):
+            key, stores_it, left_kind, left, right_kind, right = consts[arg]
+            if right_kind == FROM_SLOT:
+                right = env[right]
+            elif right_kind == FROM_STACK:
+                right = stack.pop()
+            if left_kind == FROM_SLOT:
+                left = env[left]
+            elif left_kind == FROM_STACK:
+                left = stack.pop()
+            result = binary[key](left, right)
+            if stores_it:
+                env[0] = result
+            stack.append(result)
+            return following
+
+        def store_binary_op(arg, following, env, stack):
+            slot, assigns_it, key, stores_it, left_kind, left, right_kind, right = consts[arg]
+            if right_kind == FROM_SLOT:
+                right = env[right]
+            elif right_kind == FROM_STACK:
+                right = stack.pop()
+            if left_kind == FROM_SLOT:
+                left = env[left]
+            elif left_kind == FROM_STACK:
+                left = stack.pop()
+            result = binary[key](left, right)
+            if stores_it or assigns_it:
+                env[0] = result
+            env[slot] = result
+            return following
+
+        def switch(arg, following, env, stack):
+            table, default = consts[arg]
+            return runtime.switch_entry(table, env[0], default)
+
+        handlers = [None] * len(OPCODE_NAMES)
+        handlers[LOAD_CONST] = load_const
+        handlers[LOAD_NAME] = load_name
+        handlers[STORE_NAME] = store_name
+        handlers[ASSIGN] = assign
+        handlers[DECLARE] = declare
+        handlers[BINARY_OP] = binary_op
+        handlers[NOT] = negate
+        handlers[SMOOSH] = smoosh
+        handlers[PRINT] = output
+        handlers[INPUT] = read_input
+        handlers[JUMP] = jump
+        handlers[JUMP_IF_IT_FALSE] = jump_if_it_false
+        handlers[LOAD_FOLDED] = load_folded
+        handlers[BINARY_OP_NO_IT] = binary_op_no_it
+        handlers[POP_JUMP_IF_TRUE] = pop_jump_if_true
+        handlers[POP_JUMP_IF_FALSE] = pop_jump_if_false
+        handlers[UPPIN] = uppin
+        handlers[NERFIN] = nerfin
+        handlers[COUNT_START] = count_start
+        handlers[COUNT_NEXT] = count_next
+        handlers[DEFINE] = define
+        handlers[CALL] = call
+        handlers[CALL_NO_IT] = call_no_it
+        handlers[RETURN] = return_value
+        handlers[BUKKIT_OP] = bukkit_op
+        handlers[BUKKIT_OP_NO_IT] = bukkit_op_no_it
+        handlers[APPEND] = append
+        handlers[PUT_ITEM] = put_item
+        handlers[SWITCH] = switch
+        handlers[LOAD_BINARY_OP] = load_binary_op
+        handlers[STORE_BINARY_OP] = store_binary_op
+        return handlers
+
+    def thread(self, routine, pc):
+        """Thread the statement starting at pc into one closure taking the
+        slots and returning the pc to run next.
+
+        The statement's operands are tracked on a stack of their own and
+        fused into the closure, so a statement such as LOAD_NAME,
+        LOAD_CONST, BINARY_OP, ASSIGN runs as one call with no value stack.
+        Statements the fusing does not cover call their handler."""
+        code, handlers = routine.code, routine.handlers
+        operands = []
+        while code[pc] in EXPRESSION_OPCODES:
+            operands.append(self.thread_operand(routine, pc, operands))
+            pc += 2
+        op, arg, following = code[pc], code[pc + 1], pc + 2
+        values = [evaluator(operand) for operand in operands]
+
+        if op == STORE_BINARY_OP:
+            slot, assigns_it, *binary = routine.consts[arg]
+            # Runs as the ASSIGN or STORE_NAME of a LOAD_BINARY_OP
+            op, arg, values = ASSIGN if assigns_it else STORE_NAME, slot, [fused_binary_evaluator(binary, operands)]
+
+        if op == ASSIGN:
+            (value,) = values
+
+            def step(env):
+                env[arg] = env[0] = value(env)
+                return following
+        elif op == STORE_NAME:
+            (value,) = values
+
+            def step(env):
+                env[arg] = value(env)
+                return following
+        elif op == COUNT_NEXT:
+            slot, delta, bound, equal, until, stores_it, body, _ = routine.consts[arg]
+            step_value = runtime.uppin if delta > 0 else runtime.nerfin
+
+            def step(env):
+                value = env[slot]
+                value = value + delta if type(value) is int else step_value(value)
+                env[slot] = value
+                result = (value == bound) if equal else (value != bound)
+                if stores_it:
+                    env[0] = result
+                return following if result is until else body
+        elif op == PRINT:
+            (value,) = values
+            write, to_string = self.output_sink.write, runtime.to_string
+
+            def step(env):
+                write(to_string(value(env)) + '\n')
+                return following
+        elif op == POP_JUMP_IF_TRUE:
+            (value,) = values
+            is_truthy = runtime.is_truthy
+
+            def step(env):
+                return arg if is_truthy(value(env)) else following
+        elif op == POP_JUMP_IF_FALSE:
+            (value,) = values
+            is_truthy = runtime.is_truthy
+
+            def step(env):
+                return following if is_truthy(value(env)) else arg
+        elif op == APPEND:
+            items, value = values
+            append = bukkit.append
+
+            def step(env):
+                append(items(env), value(env))
+                return following
+        elif op == JUMP:
+            def step(env):
+                return arg
+        elif op == RETURN:
+            (value,) = values
+
+            def step(env):
+                env.append(value(env))
+                return RETURN_PC
+        else:
+            handler = handlers[op]
+            if values:
+                def step(env):
+                    return handler(arg, following, env, [value(env) for value in values])
+            else:
+                def step(env):
+                    return handler(arg, following, env, None)
+        return step
+
+    def thread_operand(self, routine, pc, operands):
+        """The operand pushed by the expression instruction at pc, as (kind,
+        value, depth, pc of its first instruction), after popping its own
+        operands from operands."""
+        code, consts = routine.code, routine.consts
+        op, arg = code[pc], code[pc + 1]
+        if op == LOAD_NAME:
+            return NAME, arg, 1, pc
+        if op == LOAD_CONST:
+            return CONST, consts[arg], 1, pc
+
+        count = self.operand_count(op, arg, consts)
+        popped = operands[len(operands) - count:]
+        del operands[len(operands) - count:]
+        start = popped[0][3] if popped else pc
+        depth = 1 + max((operand[2] for operand in popped), default=0)
+        if depth > MAX_RECURSION_DEPTH:
+            # Too deep to evaluate by recursion, so run the instructions
+            return EVALUATOR, self.stack_evaluator(routine, start, pc + 2), 1, start
+
+        if op == BINARY_OP or op == BINARY_OP_NO_IT:
+            evaluate = binary_evaluator(BINARY_FUNCTIONS[arg], *popped)
+            return EVALUATOR, storing_it(evaluate) if op == BINARY_OP else evaluate, depth, start
+        if op == LOAD_BINARY_OP:
+            return EVALUATOR, fused_binary_evaluator(consts[arg], popped), depth, start
+
+        evaluators = [evaluator(operand) for operand in popped]
+        if op == CALL or op == CALL_NO_IT:
+            return EVALUATOR, self.call_evaluator(arg, evaluators, op == CALL), depth, start
+        if op == SMOOSH:
+            smoosh = runtime.smoosh
+
+            def evaluate(env):
+                env[0] = result = smoosh([part(env) for part in evaluators])
+                return result
+            return EVALUATOR, evaluate, depth, start
+        if op == BUKKIT_OP or op == BUKKIT_OP_NO_IT:
+            function, _ = BUKKIT_FUNCTIONS[arg]
+
+            def evaluate(env):
+                return function(*[operand(env) for operand in evaluators])
+            return EVALUATOR, storing_it(evaluate) if op == BUKKIT_OP else evaluate, depth, start
+
+        handler = routine.handlers[op]
+
+        def evaluate(env):
+            stack = [operand(env) for operand in evaluators]
+            handler(arg, pc + 2, env, stack)
+            return stack[0]
+        return EVALUATOR, evaluate, depth, start
+
+    def call_evaluator(self, number, arguments, stores_it):
+        """The closure calling function number with the values of arguments,
+        storing the result in IT if stores_it.
+
+        A function that is not memoized has its routine run directly, which
+        keeps each level of recursion two Python frames shallower."""
+        _, function, routine, frame_size = self.functions[number]
+        if routine is None:
+            def call(env):
+                return function(*[argument(env) for argument in arguments])
+            return storing_it(call) if stores_it else call
+
+        run_code = self.run_code
+        # The callee's IT, then the arguments, then its locals
+        frame_locals = [None] * (frame_size - 1 - len(arguments))
+        if stores_it:
+            def call(env):
+                env[0] = result = run_code(routine, [None, *[argument(env) for argument in arguments], *frame_locals])
+                return result
+        else:
+            def call(env):
+                return run_code(routine, [None, *[argument(env) for argument in arguments], *frame_locals])
+        return call
+
+    def operand_count(self, op, arg, consts):
+        if op == BINARY_OP or op == BINARY_OP_NO_IT:
+            return 2
+        if op == LOAD_BINARY_OP:
+            _, _, left_kind, _, right_kind, _ = consts[arg]
+            return int(FROM_STACK in (left_kind, right_kind))
+        if op == NOT:
+            return 1
+        if op == SMOOSH:
+            return arg
+        if op == CALL or op == CALL_NO_IT:
+            parameter_count, _, _, _ = self.functions[arg]
+            return parameter_count
+        if op == BUKKIT_OP or op == BUKKIT_OP_NO_IT:
+            return BUKKIT_FUNCTIONS[arg][1]
+        return 0
+
+    def stack_evaluator(self, routine, start, stop):
+        """The closure running the expression instructions from start to
+        stop through the handler table and returning the value they leave."""
+        code, handlers = routine.code, routine.handlers
+
+        def evaluate(env):
+            stack = []
+            for pc in range(start, stop, 2):
+                handlers[code[pc]](code[pc + 1], pc + 2, env, stack)
+            return stack[0]
+        return evaluate
@@ -0,0 +1,123 @@
+"""
+LOLCODE Yarn Module
+YARNs built by concatenation, kept as appended pieces until they are read
+"""
+
+import re
+
+# Concatenations shorter than this stay plain strings: copying them is
+# cheaper than keeping their pieces
+MIN_ROPE_LENGTH = 1024
+
+# Pieces a builder collects before joining them into one chunk, so a YARN
+# built from many short pieces holds few string objects
+PIECES_PER_CHUNK = 256
+
+# A character that no text int() or float() accepts can contain: they take
+# whitespace, digits, underscores, signs, points, exponents, inf and nan
+NOT_NUMERIC = re.compile(r'[^\s\d_+\-.eEiInNfFtTyYaA]')
+
+
+class YarnBuilder:
+    """The text shared by a Yarn and every Yarn extended from it. Text is
+    only ever appended, so each of those Yarns is a prefix of it."""
+
+    __slots__ = ('chunks', 'pieces', 'size', 'wordy_at')
+
+    def __init__(self, text):
+        self.chunks = [text]
+        self.pieces = []
+        self.size = len(text)
+        match = NOT_NUMERIC.search(text)
+        # Where the first character that rules out a number is, if any
+        self.wordy_at = match.start() if match else None
+
+    def append(self, text):
+        if self.wordy_at is None:
+            match = NOT_NUMERIC.search(text)
+            if match:
+                self.wordy_at = self.size + match.start()
+        self.pieces.append(text)
+        self.size += len(text)
+        if len(self.pieces) == PIECES_PER_CHUNK:
+            self.chunks.append(''.join(self.pieces))
+            self.pieces = []
+
+    def text(self):
+        """All the text, joined once and kept as the only chunk."""
+        if self.pieces:
+            self.chunks.append(''.join(self.pieces))
+            self.pieces = []
+        if len(self.chunks) > 1:
+            self.chunks = [''.join(self.chunks)]
+        return self.chunks[0]
+
+
+class Yarn:
+    """A YARN made by concatenation: the first size characters of a
+    builder.
+
+    Appending to the Yarn that reaches the end of its builder appends to the
+    builder and the longer Yarn shares it, so a YARN built up piece by piece
+    costs time linear in its final length. Appending to any other Yarn starts
+    a new builder from its text. The text is joined when the YARN is printed,
+    compared, hashed or read as a number; a Yarn equals the str of its
+    text."""
+
+    __slots__ = ('builder', 'size')
+
+    def __init__(self, builder, size):
+        self.builder = builder
+        self.size = size
+
+    @classmethod
+    def of(cls, text):
+        builder = YarnBuilder(text)
+        return cls(builder, builder.size)
+
+    def __str__(self):
+        text = self.builder.text()
+        return text if len(text) == self.size else text[:self.size]
+
+    def __len__(self):
+        return self.size
+
+    def __eq__(self, other):
+        if type(other) is not Yarn and type(other) is not str:
+            return NotImplemented
+        return len(other) == self.size and str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+    def __repr__(self):
+        return f"Yarn({str(self)!r})"
+
+    def could_be_number(self):
+        """False when the text has a character no NUMBR or NUMBAR spelling
+        has, which is known without joining it."""
+        wordy_at = self.builder.wordy_at
+        return wordy_at is None or wordy_at >= self.size
+
+    def extend(self, text):
+        builder = self.builder
+        if builder.size != self.size:
+            # A longer YARN already extends this builder
+            builder = YarnBuilder(str(self))
+        builder.append(text)
+        return Yarn(builder, builder.size)
+
+
+def concat(head, tail):
+    """The YARN head followed by the str tail. head may be a str or a Yarn."""
+    if type(head) is Yarn:
+        return head.extend(tail)
+    text = head + tail
+    if len(text) < MIN_ROPE_LENGTH:
+        return text
+    return Yarn.of(text)
+
+
+def flatten(value):
+    """value with a Yarn replaced by its text."""
+    return str(value) if type(value) is Yarn else value